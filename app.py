@@ -34,6 +34,52 @@ app.config["JWT_SECRET_KEY"] = "fghsgdgfdsgf"  # Secret key for JWT
 app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=2)  # Set the expiration time for access tokens
 jwt = JWTManager(app)  # Initialize JWTManager
 
+# Search result cache ("memory" keeps one cache per worker, "redis" shares one via SEARCH_CACHE_REDIS_URL)
+app.config['SEARCH_CACHE_BACKEND'] = os.environ.get('SEARCH_CACHE_BACKEND', 'memory')
+app.config['SEARCH_CACHE_REDIS_URL'] = os.environ.get('REDIS_URL')
+app.config['SEARCH_CACHE_TTL'] = 300  # Seconds before a cached search is recomputed
+app.config['SEARCH_CACHE_MAX_ENTRIES'] = 1024  # Least recently used searches are evicted past this
+
+# Serialized single products and shops, read through by GET /products/<id>, /products?ids= and /shops/<id>
+app.config['RECORD_CACHE_BACKEND'] = os.environ.get('RECORD_CACHE_BACKEND', 'memory')
+app.config['RECORD_CACHE_REDIS_URL'] = os.environ.get('REDIS_URL')
+app.config['RECORD_CACHE_TTL'] = 60  # Seconds before a cached product or shop is reloaded
+app.config['RECORD_CACHE_MAX_ENTRIES'] = 10000  # Least recently used records are evicted past this
+
+# Logged-in users' search results are queued and written in batches by a background thread
+app.config['SEARCH_WRITE_BEHIND'] = True
+app.config['SEARCH_WRITE_BEHIND_QUEUE_SIZE'] = 10000  # Searches held before new ones are dropped
+app.config['SEARCH_WRITE_BEHIND_BATCH_SIZE'] = 500  # Rows per multi-row INSERT
+
+# Live search across the shops' own sites
+app.config['LIVE_SEARCH_TIMEOUT'] = 5.0  # Seconds to wait for each shop before returning without it
+app.config['LIVE_SEARCH_CONCURRENCY'] = 4  # Shops queried at the same time
+app.config['LIVE_SEARCH_POOL_SIZE'] = 20  # Pooled HTTP connections kept open to the shops
+
+# Cross-shop product matching (services/matching.py)
+app.config['PRODUCT_MATCH_THRESHOLD'] = 0.5  # Minimum estimated title similarity for two listings to be the same item
+app.config['PRODUCT_MATCH_PRICE_BAND'] = 3.0  # ...and the most one price may be a multiple of the other
+# Written products are matched, compared and ranked by a background thread, not on the request
+app.config['CLUSTER_WRITE_BEHIND'] = True
+app.config['CLUSTER_WRITE_BEHIND_QUEUE_SIZE'] = 10000  # Product writes held before new ones are dropped (flask match-products catches up)
+app.config['CLUSTER_WRITE_BEHIND_BATCH_SIZE'] = 1000  # Products matched per batch
+
+# POST /products/bulk writes and announces products in batches of this many rows
+app.config['PRODUCT_INGEST_BATCH_SIZE'] = 1000
+
+# Shop deletion and archival work through a shop's products this many at a time
+app.config['SHOP_DELETE_BATCH_SIZE'] = 1000
+# flask tombstone-stale-products hides listings missing from their shop's last N crawls (bulk imports)
+app.config['TOMBSTONE_AFTER_CRAWLS'] = 3
+
+# Table exports (flask export-catalog, GET /admin/export/<table>) read and encode this many rows at a time
+app.config['EXPORT_CHUNK_SIZE'] = 5000
+
+# Price-drop notifications are queued and written in batches by a background thread
+app.config['ALERT_WRITE_BEHIND'] = True
+app.config['ALERT_WRITE_BEHIND_QUEUE_SIZE'] = 10000  # Batches of notifications held before new ones are dropped
+app.config['ALERT_WRITE_BEHIND_BATCH_SIZE'] = 500  # Rows per multi-row INSERT
+
 # Google OAuth2 configuration
 app.secret_key = secrets.token_hex(16)
 app.config['GOOGLE_CLIENT_ID'] = '414872029170-3u2c5nboldvniesjmkgm0fhtc54a0mld.apps.googleusercontent.com'
@@ -145,7 +191,7 @@ def get_user_info(credentials):
     }
 
 # Import and register blueprints (Ensure these views exist)
-from views import auth_bp, product_bp, search_bp, user_bp, shop_bp, search_history_bp
+from views import auth_bp, product_bp, search_bp, user_bp, shop_bp, search_history_bp, filter_bp, alerts_bp, export_bp
 
 # Register blueprints with the app
 app.register_blueprint(auth_bp)
@@ -154,6 +200,33 @@ app.register_blueprint(search_bp)
 app.register_blueprint(user_bp)
 app.register_blueprint(shop_bp)
 app.register_blueprint(search_history_bp)
+app.register_blueprint(filter_bp)
+app.register_blueprint(alerts_bp)
+app.register_blueprint(export_bp)
+
+# CLI commands
+from services.comparison import backfill_comparisons_command
+from services.matching import match_products_command
+from services.best_deals import backfill_best_deals_command
+from services.export import export_catalog_command
+from services.shop_stats import backfill_shop_stats_command
+from services.retention import tombstone_stale_products_command
+app.cli.add_command(backfill_comparisons_command)  # flask backfill-comparisons
+app.cli.add_command(match_products_command)  # flask match-products
+app.cli.add_command(backfill_best_deals_command)  # flask backfill-best-deals
+app.cli.add_command(export_catalog_command)  # flask export-catalog
+app.cli.add_command(backfill_shop_stats_command)  # flask backfill-shop-stats
+app.cli.add_command(tombstone_stale_products_command)  # flask tombstone-stale-products
+
+# Build the match and trigram indexes while the server starts rather than on the first
+# product write or fuzzy search; `flask` CLI commands (migrations, match-products) do without
+import click
+from services import trigram
+from services.matching import get_refresher
+if click.get_current_context(silent=True) is None:
+    with app.app_context():
+        get_refresher()
+        trigram.get_index()
 
 # Ensure the app runs only when executed directly
 if __name__ == "__main__":
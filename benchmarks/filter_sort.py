@@ -0,0 +1,85 @@
+"""Time GET /filter_sort against an in-memory catalog.
+
+    python -m benchmarks.filter_sort --products 5000 --shops 4
+"""
+import argparse
+import random
+import time
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from sqlalchemy import event
+from models import db, Product, Shop
+from services.comparison import refresh_comparisons
+from services.matching import assign_canonical_products
+
+def make_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'benchmark'
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.filtering_sorting import filter_bp
+    app.register_blueprint(filter_bp)
+    return app
+
+def seed(app, products, shops):
+    """Every product is sold by a random subset of at least two shops."""
+    with app.app_context():
+        db.create_all()
+        shop_rows = [Shop(name=f'Shop {i}', url=f'https://shop{i}.example') for i in range(shops)]
+        db.session.add_all(shop_rows)
+        db.session.commit()
+        rows = []
+        for i in range(products):
+            base_price = random.uniform(50, 1500)
+            for shop in random.sample(shop_rows, random.randint(2, shops)):
+                rows.append({
+                    "product_name": f'Phone {i}',
+                    "product_price": round(base_price * random.uniform(0.8, 1.2), 2),
+                    "product_rating": round(random.uniform(1, 5), 1),
+                    "delivery_cost": random.choice([0.0, 150.0, 300.0]),
+                    "shop_name": shop.name,
+                    "shop_id": shop.id
+                })
+        db.session.execute(db.insert(Product), rows)
+        db.session.commit()
+
+        started = time.perf_counter()
+        clusters = assign_canonical_products(db.session.scalars(db.select(Product.id)).all())
+        print(f"Matched {len(rows)} offers into {len(clusters)} canonical products in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        started = time.perf_counter()
+        written = refresh_comparisons(clusters)
+        print(f"Materialized {written} comparisons in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--shops', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(0)
+    app = make_app()
+    offers = seed(app, args.products, args.shops)
+    client = app.test_client()
+
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+
+    timings = []
+    for _ in range(args.repeat):
+        statements.clear()
+        started = time.perf_counter()
+        response = client.get('/filter_sort?q=phone&sort_by=cb')
+        timings.append(time.perf_counter() - started)
+    pairs = len(response.json['results'])
+
+    print(f"{offers} offers, {pairs} shop pairs, {len(statements)} SQL statements per request")
+    print(f"best {min(timings) * 1000:.1f} ms, median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
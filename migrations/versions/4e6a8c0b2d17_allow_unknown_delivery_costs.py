@@ -0,0 +1,39 @@
+"""Allow unknown delivery costs in comparison_results and best_deals
+
+Revision ID: 4e6a8c0b2d17
+Revises: b9e1d7c3a5f2
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e6a8c0b2d17'
+down_revision = 'b9e1d7c3a5f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Stored rows still count unknown delivery as free until
+    # `flask backfill-comparisons` and `flask backfill-best-deals` rewrite them
+    with op.batch_alter_table('comparison_results', schema=None) as batch_op:
+        batch_op.alter_column('shop_x_delivery_cost', existing_type=sa.Float(), nullable=True)
+        batch_op.alter_column('shop_y_delivery_cost', existing_type=sa.Float(), nullable=True)
+
+    with op.batch_alter_table('best_deals', schema=None) as batch_op:
+        batch_op.alter_column('cheapest_landed_cost', existing_type=sa.Float(), nullable=True)
+
+
+def downgrade():
+    op.execute("UPDATE comparison_results SET shop_x_delivery_cost = 0 WHERE shop_x_delivery_cost IS NULL")
+    op.execute("UPDATE comparison_results SET shop_y_delivery_cost = 0 WHERE shop_y_delivery_cost IS NULL")
+    op.execute("UPDATE best_deals SET cheapest_landed_cost = cheapest_price + COALESCE(cheapest_delivery_cost, 0) WHERE cheapest_landed_cost IS NULL")
+    with op.batch_alter_table('best_deals', schema=None) as batch_op:
+        batch_op.alter_column('cheapest_landed_cost', existing_type=sa.Float(), nullable=False)
+
+    with op.batch_alter_table('comparison_results', schema=None) as batch_op:
+        batch_op.alter_column('shop_y_delivery_cost', existing_type=sa.Float(), nullable=False)
+        batch_op.alter_column('shop_x_delivery_cost', existing_type=sa.Float(), nullable=False)
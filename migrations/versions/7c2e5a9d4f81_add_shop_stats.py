@@ -0,0 +1,41 @@
+"""Add the shop_stats table
+
+Revision ID: 7c2e5a9d4f81
+Revises: f48a2c6d1e93
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e5a9d4f81'
+down_revision = 'f48a2c6d1e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('shop_stats',
+    sa.Column('shop_id', sa.Integer(), nullable=False),
+    sa.Column('products_count', sa.Integer(), nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=True),
+    sa.Column('avg_price', sa.Float(), nullable=True),
+    sa.Column('avg_rating', sa.Float(), nullable=True),
+    sa.Column('last_updated', sa.DateTime(), nullable=True),
+    sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['shop_id'], ['shops.id'], name='fk_shop_stats_shop', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('shop_id')
+    )
+    # Same aggregates as services/shop_stats.py; `flask backfill-shop-stats` rebuilds them at any time
+    op.execute(
+        "INSERT INTO shop_stats (shop_id, products_count, min_price, avg_price, avg_rating, last_updated, refreshed_at) "
+        "SELECT shop_id, count(id), min(product_price), round(CAST(avg(product_price) AS numeric), 2), "
+        "round(CAST(avg(product_rating) AS numeric), 2), "
+        "max(updated_at), CURRENT_TIMESTAMP FROM products GROUP BY shop_id"
+    )
+
+
+def downgrade():
+    op.drop_table('shop_stats')
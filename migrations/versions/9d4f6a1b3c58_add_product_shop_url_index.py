@@ -0,0 +1,24 @@
+"""Index products on (shop_id, product_url) for bulk upserts
+
+Revision ID: 9d4f6a1b3c58
+Revises: 5b8f0d2e7c13
+Create Date: 2026-10-18 16:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f6a1b3c58'
+down_revision = '5b8f0d2e7c13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_products_shop_id_product_url', 'products', ['shop_id', 'product_url'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_products_shop_id_product_url', table_name='products')
@@ -0,0 +1,35 @@
+"""Add products.updated_at and table_versions for conditional GETs
+
+Revision ID: a61c3e8f0b27
+Revises: 9d4f6a1b3c58
+Create Date: 2026-10-18 17:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a61c3e8f0b27'
+down_revision = '9d4f6a1b3c58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain ADD COLUMN rather than batch mode, so SQLite keeps the full-text triggers on products
+    op.add_column('products', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE products SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP)")
+
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_versions, [{'name': 'products', 'version': 1}, {'name': 'shops', 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('table_versions')
+    op.drop_column('products', 'updated_at')
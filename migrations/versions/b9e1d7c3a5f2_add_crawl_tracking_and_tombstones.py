@@ -0,0 +1,29 @@
+"""Track shop crawls and tombstone products missing from them
+
+Revision ID: b9e1d7c3a5f2
+Revises: 7c2e5a9d4f81
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9e1d7c3a5f2'
+down_revision = '7c2e5a9d4f81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shops', sa.Column('crawl_count', sa.Integer(), nullable=False, server_default='0'))
+    # Plain ALTERs: a batch rebuild of products would drop the full-text triggers
+    op.add_column('products', sa.Column('last_seen_crawl', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('products', sa.Column('tombstoned_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('products', 'tombstoned_at')
+    op.drop_column('products', 'last_seen_crawl')
+    op.drop_column('shops', 'crawl_count')
@@ -0,0 +1,33 @@
+"""Index price_history on (product_id, recorded_at) and seed it with current prices
+
+Revision ID: d3b7f2a94c60
+Revises: a61c3e8f0b27
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b7f2a94c60'
+down_revision = 'a61c3e8f0b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_price_history_product_id_recorded_at', 'price_history', ['product_id', 'recorded_at'], unique=False)
+    # Give every priced product without history a starting point, so its first
+    # recorded change has a real old price to compare against
+    op.execute(
+        "INSERT INTO price_history (product_id, price, recorded_at) "
+        "SELECT id, product_price, COALESCE(updated_at, created_at, CURRENT_TIMESTAMP) FROM products "
+        "WHERE product_price IS NOT NULL "
+        "AND NOT EXISTS (SELECT 1 FROM price_history WHERE price_history.product_id = products.id)"
+    )
+
+
+def downgrade():
+    # Seeded points are left in place: they cannot be told apart from recorded ones
+    op.drop_index('ix_price_history_product_id_recorded_at', table_name='price_history')
@@ -0,0 +1,51 @@
+"""Add canonical products for cross-shop matching
+
+Revision ID: e2a9c4b61f37
+Revises: c7d3e1f0a9b2
+Create Date: 2026-10-18 13:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c4b61f37'
+down_revision = 'c7d3e1f0a9b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('canonical_products',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Plain ADD COLUMN rather than batch mode, so SQLite keeps the products table
+    # (and the full-text triggers attached to it) instead of copying it; SQLite
+    # cannot add the foreign key to an existing table, so it is left out there
+    op.add_column('products', sa.Column('canonical_product_id', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_foreign_key('fk_product_canonical', 'products', 'canonical_products', ['canonical_product_id'], ['id'])
+    op.create_index(op.f('ix_products_canonical_product_id'), 'products', ['canonical_product_id'], unique=False)
+
+    with op.batch_alter_table('comparison_results', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('canonical_product_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_comparison_results_canonical_product_id'), ['canonical_product_id'], unique=False)
+
+    # Existing products are clustered with `flask match-products`, then `flask backfill-comparisons`
+
+
+def downgrade():
+    with op.batch_alter_table('comparison_results', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_comparison_results_canonical_product_id'))
+        batch_op.drop_column('canonical_product_id')
+
+    op.drop_index(op.f('ix_products_canonical_product_id'), table_name='products')
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_product_canonical', 'products', type_='foreignkey')
+    op.drop_column('products', 'canonical_product_id')
+    op.drop_table('canonical_products')
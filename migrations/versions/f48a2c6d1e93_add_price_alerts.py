@@ -0,0 +1,54 @@
+"""Add price_alerts and alert_notifications tables
+
+Revision ID: f48a2c6d1e93
+Revises: d3b7f2a94c60
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f48a2c6d1e93'
+down_revision = 'd3b7f2a94c60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('price_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('target_price', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'product_id', name='uq_price_alert_user_product')
+    )
+    op.create_index('ix_price_alerts_product_id_target_price', 'price_alerts', ['product_id', 'target_price'], unique=False)
+
+    op.create_table('alert_notifications',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('product_name', sa.String(length=100), nullable=True),
+    sa.Column('old_price', sa.Float(), nullable=True),
+    sa.Column('new_price', sa.Float(), nullable=False),
+    sa.Column('target_price', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('read_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_alert_notifications_user_id'), 'alert_notifications', ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_alert_notifications_user_id'), table_name='alert_notifications')
+    op.drop_table('alert_notifications')
+    op.drop_index('ix_price_alerts_product_id_target_price', table_name='price_alerts')
+    op.drop_table('price_alerts')
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -29,6 +30,10 @@ class SearchHistory(db.Model):
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Bulk ingest upserts listings on (shop, url)
+        db.Index('ix_products_shop_id_product_url', 'shop_id', 'product_url'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     product_name = db.Column(db.String(100))
     product_price = db.Column(db.Float)
@@ -38,14 +43,85 @@ class Product(db.Model):
     shop_name = db.Column(db.String(100))
     payment_mode = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Row version for ETags
     navigate_link = db.Column(db.String(255))  # New field for the navigation link
+    # Crawl bookkeeping (see services/retention.py): the shop crawl that last listed
+    # this product, and when it was hidden for being missing from recent crawls
+    last_seen_crawl = db.Column(db.Integer, nullable=False, default=0)
+    tombstoned_at = db.Column(db.DateTime)
 
     shop_id = db.Column(db.Integer, db.ForeignKey('shops.id', name='fk_product_shop'), nullable=False)  # Specify constraint name
-    comparisons = db.relationship('ComparisonResult', backref='product', lazy=True)
+    # The same item across shops, assigned by services/matching.py
+    canonical_product_id = db.Column(db.Integer, db.ForeignKey('canonical_products.id', name='fk_product_canonical'), index=True)
+    comparisons = db.relationship('ComparisonResult', backref='product', lazy=True, cascade='all, delete-orphan')
     
     # Change backref to avoid conflict with the existing 'products' in the Shop model
     shop = db.relationship('Shop', backref='shop_products')
 
+# Full-text index over product names (see services/fulltext.py).
+# Postgres keeps a generated tsvector column with a GIN index; SQLite keeps an
+# FTS5 shadow table that triggers keep in sync with the products table.
+PRODUCT_FULLTEXT_DDL = {
+    'postgresql': [
+        "ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(product_name, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts "
+        "USING fts5(product_name, content='products', content_rowid='id')",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts(rowid, product_name) VALUES (new.id, new.product_name); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, product_name) VALUES ('delete', old.id, old.product_name); END",
+        "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF product_name ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, product_name) VALUES ('delete', old.id, old.product_name); "
+        "INSERT INTO products_fts(rowid, product_name) VALUES (new.id, new.product_name); END",
+        "INSERT INTO products_fts(products_fts) VALUES ('rebuild')",
+    ],
+}
+
+for dialect, statements in PRODUCT_FULLTEXT_DDL.items():
+    for statement in statements:
+        event.listen(Product.__table__, 'after_create', DDL(statement).execute_if(dialect=dialect))
+
+event.listen(Product.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect='sqlite'))
+
+class CanonicalProduct(db.Model):
+    __tablename__ = 'canonical_products'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100))  # Title of the first listing in the cluster
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    products = db.relationship('Product', backref='canonical_product', lazy=True)
+
+class BestDeal(db.Model):
+    __tablename__ = 'best_deals'
+    # Winning offers per canonical product, maintained by services/best_deals.py
+    canonical_product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100))
+    offer_count = db.Column(db.Integer, nullable=False)
+    shop_count = db.Column(db.Integer, nullable=False)
+
+    cheapest_product_id = db.Column(db.Integer, nullable=False)
+    cheapest_shop_id = db.Column(db.Integer, nullable=False)
+    cheapest_shop_name = db.Column(db.String(100))
+    cheapest_price = db.Column(db.Float, nullable=False)
+    cheapest_delivery_cost = db.Column(db.Float)
+    cheapest_landed_cost = db.Column(db.Float)  # NULL when no offer's delivery cost is known
+
+    top_rated_product_id = db.Column(db.Integer)
+    top_rated_shop_id = db.Column(db.Integer)
+    top_rated_shop_name = db.Column(db.String(100))
+    top_rating = db.Column(db.Float)
+
+    best_value_product_id = db.Column(db.Integer, nullable=False)
+    best_value_shop_id = db.Column(db.Integer, nullable=False)
+    best_value_shop_name = db.Column(db.String(100))
+    best_value_score = db.Column(db.Float, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class ProductSearch(db.Model):
     __tablename__ = 'product_searches'
     id = db.Column(db.Integer, primary_key=True)
@@ -53,6 +129,18 @@ class ProductSearch(db.Model):
     query_results = db.Column(db.JSON, nullable=False)  
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Snapshot of one result as the user saw it (no FKs to products/shops so history survives deletes)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', name='fk_product_search_user'), index=True)
+    product_id = db.Column(db.Integer)
+    product_name = db.Column(db.String(100))
+    product_price = db.Column(db.Float)
+    product_rating = db.Column(db.Float)
+    product_url = db.Column(db.String(255))
+    delivery_cost = db.Column(db.Float)
+    shop_name = db.Column(db.String(100))
+    payment_mode = db.Column(db.String(50))
+    shop_id = db.Column(db.Integer)
+
 
 class AuthToken(db.Model):
     __tablename__ = 'auth_tokens'
@@ -67,34 +155,44 @@ class AuthToken(db.Model):
 
 class PriceHistory(db.Model):
     __tablename__ = 'price_history'
+    # One point per real price change, recorded by services/price_history.py
+    __table_args__ = (
+        db.Index('ix_price_history_product_id_recorded_at', 'product_id', 'recorded_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
     price = db.Column(db.Float, nullable=False)
     recorded_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    product = db.relationship('Product', backref='price_history')
+    product = db.relationship('Product', backref=db.backref('price_history', cascade='all, delete-orphan'))
 
 
 class ComparisonResult(db.Model):
     __tablename__ = 'comparison_results'
+    # One maintained row per pair of shops selling a product (see services/comparison.py);
+    # product_id is shop x's offer, shop_y_product_id shop y's
+    __table_args__ = (db.UniqueConstraint('product_id', 'shop_x_id', 'shop_y_id', name='uq_comparison_pair'),)
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id', name='fk_comparison_product'), nullable=False)
     shop_x_id = db.Column(db.Integer, db.ForeignKey('shops.id', name='fk_comparison_shop_x'), nullable=False)
     shop_y_id = db.Column(db.Integer, db.ForeignKey('shops.id', name='fk_comparison_shop_y'), nullable=False)
+    shop_y_product_id = db.Column(db.Integer, index=True)
+    canonical_product_id = db.Column(db.Integer, index=True)
     
-    product_name = db.Column(db.String, nullable=False)
+    product_name = db.Column(db.String, nullable=False, index=True)
     shop_x_cost = db.Column(db.Float, nullable=False)
     shop_x_rating = db.Column(db.Float)
-    shop_x_delivery_cost = db.Column(db.Float, nullable=False)
+    shop_x_delivery_cost = db.Column(db.Float)  # NULL when unknown
     shop_x_payment_mode = db.Column(db.String)
     
     shop_y_cost = db.Column(db.Float, nullable=False)
     shop_y_rating = db.Column(db.Float)
-    shop_y_delivery_cost = db.Column(db.Float, nullable=False)
+    shop_y_delivery_cost = db.Column(db.Float)
     shop_y_payment_mode = db.Column(db.String)
     
     marginal_benefit = db.Column(db.Float)
     cost_benefit = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships with foreign_keys argument to specify which columns are used for the join
     shop_x = db.relationship('Shop', foreign_keys=[shop_x_id], backref=db.backref('comparison_shop_x', lazy=True), lazy=True)
@@ -105,7 +203,58 @@ class Shop(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     url = db.Column(db.String, nullable=False)
+    crawl_count = db.Column(db.Integer, nullable=False, default=0)  # Full crawls imported so far
 
     # Relationships to avoid conflict with backref names
     comparisons_x = db.relationship('ComparisonResult', foreign_keys='ComparisonResult.shop_x_id', backref='shop_x_comparison', lazy=True)
     comparisons_y = db.relationship('ComparisonResult', foreign_keys='ComparisonResult.shop_y_id', backref='shop_y_comparison', lazy=True)
+
+class ShopStats(db.Model):
+    __tablename__ = 'shop_stats'
+    # Per-shop product aggregates, refreshed on product writes (see services/shop_stats.py)
+    shop_id = db.Column(db.Integer, db.ForeignKey('shops.id', name='fk_shop_stats_shop', ondelete='CASCADE'), primary_key=True)
+    products_count = db.Column(db.Integer, nullable=False, default=0)
+    min_price = db.Column(db.Float)
+    avg_price = db.Column(db.Float)
+    avg_rating = db.Column(db.Float)
+    last_updated = db.Column(db.DateTime)  # Latest product updated_at
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    # Bumped on every write to a table, for list ETags (see services/versions.py)
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PriceAlert(db.Model):
+    __tablename__ = 'price_alerts'
+    # Notify a user when a product's price drops to or below target_price (see services/alerts.py)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'product_id', name='uq_price_alert_user_product'),
+        db.Index('ix_price_alerts_product_id_target_price', 'product_id', 'target_price'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    target_price = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    user = db.relationship('User', backref=db.backref('price_alerts', cascade='all, delete-orphan'))
+    product = db.relationship('Product', backref=db.backref('price_alerts', cascade='all, delete-orphan'))
+
+class AlertNotification(db.Model):
+    __tablename__ = 'alert_notifications'
+    # One per triggered alert, written in batches by services/alerts.py
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    product_name = db.Column(db.String(100))
+    old_price = db.Column(db.Float)
+    new_price = db.Column(db.Float, nullable=False)
+    target_price = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref=db.backref('alert_notifications', cascade='all, delete-orphan'))
+    product = db.relationship('Product', backref=db.backref('alert_notifications', cascade='all, delete-orphan'))
@@ -0,0 +1,153 @@
+import json
+import math
+import re
+from html.parser import HTMLParser
+from urllib.parse import quote_plus, urljoin
+
+class _JsonLdExtractor(HTMLParser):
+    """Collects the bodies of <script type="application/ld+json"> blocks."""
+
+    def __init__(self):
+        super().__init__()
+        self.blocks = []
+        self._inside = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'script' and dict(attrs).get('type') == 'application/ld+json':
+            self._inside = True
+            self.blocks.append('')
+
+    def handle_endtag(self, tag):
+        if tag == 'script':
+            self._inside = False
+
+    def handle_data(self, data):
+        if self._inside:
+            self.blocks[-1] += data
+
+def parse_number(value):
+    """Turn '1,299.00', 'KSh 450' or 4.5 into a float, or None."""
+    if isinstance(value, bool):
+        return None
+    if value is None or isinstance(value, (int, float)):
+        return value if value is None or math.isfinite(value) else None
+    if not isinstance(value, str):
+        return None
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", str(value))
+    return float(match.group().replace(',', '')) if match else None
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+def _mapping(value):
+    # The first of a list of objects; anything that is not an object (a URL, a number) counts as missing
+    value = _first(value)
+    return value if isinstance(value, dict) else {}
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else None
+
+class ShopAdapter:
+    """Searches one shop and turns its result page into offer dicts.
+
+    Offers are read from the schema.org Product data (JSON-LD) the shops embed
+    in their listing pages; subclasses only say where the search page lives.
+    """
+
+    search_path = '/search?q={query}'
+
+    def __init__(self, shop):
+        self.shop_id = shop.id
+        self.shop_name = shop.name
+        self.base_url = shop.url
+
+    def search_url(self, query):
+        return urljoin(self.base_url.rstrip('/') + '/', self.search_path.lstrip('/').format(query=quote_plus(query)))
+
+    async def search(self, session, query):
+        async with session.get(self.search_url(query)) as response:
+            response.raise_for_status()
+            page = await response.text()
+        return self.parse(page)
+
+    def parse(self, page):
+        extractor = _JsonLdExtractor()
+        extractor.feed(page)
+        offers = []
+        for block in extractor.blocks:
+            try:
+                data = json.loads(block)
+            except ValueError:
+                continue
+            for item in self._products(data):
+                offer = self._offer(item)
+                if offer is not None:
+                    offers.append(offer)
+        return offers
+
+    def _products(self, data):
+        if isinstance(data, list):
+            for entry in data:
+                yield from self._products(entry)
+        elif isinstance(data, dict):
+            kind = data.get('@type')
+            if kind == 'Product':
+                yield data
+            elif kind == 'ItemList':
+                elements = data.get('itemListElement')
+                for element in elements if isinstance(elements, list) else []:
+                    yield from self._products(element.get('item', element) if isinstance(element, dict) else element)
+            elif '@graph' in data:
+                yield from self._products(data['@graph'])
+
+    def _offer(self, item):
+        """Turn one schema.org Product into an offer dict, or None if it has no usable name and price.
+
+        Shops' markup is not trusted: fields of the wrong type are treated as missing.
+        """
+        offer = _mapping(item.get('offers'))
+        shipping = _mapping(offer.get('shippingDetails'))
+        rating = _mapping(item.get('aggregateRating'))
+        payment = offer.get('acceptedPaymentMethod')
+        if isinstance(payment, list):
+            payment = ', '.join(method for method in payment if isinstance(method, str))
+        name = _text(item.get('name'))
+        price = parse_number(offer.get('price'))
+        url = _text(item.get('url')) or _text(offer.get('url'))
+        if not name or price is None:
+            return None
+        return {
+            "product_name": name[:100],
+            "product_price": price,
+            "product_rating": parse_number(rating.get('ratingValue')),
+            "product_url": urljoin(self.base_url, url)[:255] if url else None,
+            "delivery_cost": parse_number(_mapping(shipping.get('shippingRate')).get('value')),
+            "payment_mode": _text(payment)[:50] if _text(payment) else None
+        }
+
+class AmazonAdapter(ShopAdapter):
+    search_path = '/s?k={query}'
+
+class JumiaAdapter(ShopAdapter):
+    search_path = '/catalog/?q={query}'
+
+class KilimallAdapter(ShopAdapter):
+    search_path = '/search?q={query}'
+
+class AlibabaAdapter(ShopAdapter):
+    search_path = '/trade/search?SearchText={query}'
+
+ADAPTERS = {
+    'amazon': AmazonAdapter,
+    'jumia': JumiaAdapter,
+    'kilimall': KilimallAdapter,
+    'alibaba': AlibabaAdapter
+}
+
+def adapter_for(shop):
+    """Pick the adapter for a Shop row by its name, falling back to the generic one."""
+    name = shop.name.lower()
+    for key, adapter in ADAPTERS.items():
+        if key in name:
+            return adapter(shop)
+    return ShopAdapter(shop)
@@ -0,0 +1,147 @@
+import bisect
+import threading
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app
+from models import db, Product, PriceAlert, AlertNotification
+from services.signals import prices_changed
+from services.versions import bump, table_state
+from services.write_behind import WriteBehindWriter
+
+class AlertIndex:
+    """Price alerts grouped by product, each product's targets kept sorted.
+
+    A price moving from `old` down to `new` triggers exactly the alerts with
+    new <= target < old, so they are found by bisecting that product's
+    targets instead of scanning every alert. Alerts fire again each time the
+    price crosses below their target.
+    """
+
+    def __init__(self, version=0):
+        self.version = version
+        self._targets = defaultdict(list)  # product id -> sorted [(target, alert id, user id)]
+        self._alerts = {}                  # alert id -> (product id, target, user id)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def add(self, alert_id, user_id, product_id, target):
+        with self._lock:
+            self.remove(alert_id)
+            bisect.insort(self._targets[product_id], (target, alert_id, user_id))
+            self._alerts[alert_id] = (product_id, target, user_id)
+
+    def remove(self, alert_id):
+        with self._lock:
+            entry = self._alerts.pop(alert_id, None)
+            if entry is None:
+                return
+            product_id, target, user_id = entry
+            targets = self._targets[product_id]
+            del targets[bisect.bisect_left(targets, (target, alert_id, user_id))]
+            if not targets:
+                del self._targets[product_id]
+
+    def triggered(self, product_id, old, new):
+        """Return (alert id, user id, target) for every alert a move from `old` to `new` crosses."""
+        if new is None or (old is not None and new >= old):
+            return []
+        with self._lock:
+            targets = self._targets.get(product_id)
+            if not targets:
+                return []
+            start = bisect.bisect_left(targets, (new,))
+            end = len(targets) if old is None else bisect.bisect_left(targets, (old,))
+            return [(alert_id, user_id, target) for target, alert_id, user_id in targets[start:end]]
+
+_build_lock = threading.Lock()
+
+def get_index():
+    """Return the current app's alert index, reloading it when another request or worker changed alerts."""
+    extensions = current_app.extensions
+    versions, _ = table_state('price_alerts')
+    index = extensions.get('alert_index')
+    if index is None or index.version != versions['price_alerts']:
+        with _build_lock:
+            index = extensions.get('alert_index')
+            if index is None or index.version != versions['price_alerts']:
+                index = AlertIndex(versions['price_alerts'])
+                for alert_id, user_id, product_id, target in db.session.execute(
+                    db.select(PriceAlert.id, PriceAlert.user_id, PriceAlert.product_id, PriceAlert.target_price)
+                ):
+                    index.add(alert_id, user_id, product_id, target)
+                extensions['alert_index'] = index
+    return index
+
+def set_alert(user_id, product_id, target):
+    """Create or move the user's alert on a product, returning it."""
+    alert = PriceAlert.query.filter_by(user_id=user_id, product_id=product_id).first()
+    if alert is None:
+        alert = PriceAlert(user_id=user_id, product_id=product_id)
+        db.session.add(alert)
+    alert.target_price = target
+    db.session.flush()
+    bump('price_alerts')
+    db.session.commit()
+    return alert
+
+def delete_alert(alert):
+    db.session.delete(alert)
+    db.session.flush()
+    bump('price_alerts')
+    db.session.commit()
+
+class NotificationWriter(WriteBehindWriter):
+    """Write-behind queue for the AlertNotification rows triggered alerts produce."""
+
+    model = AlertNotification
+    name = 'alert-notification-writer'
+
+def get_notifier():
+    """Return the current app's notification writer, configured by the ALERT_WRITE_BEHIND_* settings."""
+    app = current_app._get_current_object()
+    writer = app.extensions.get('alert_notification_writer')
+    if writer is None:
+        writer = app.extensions.setdefault('alert_notification_writer', NotificationWriter(
+            app,
+            max_snapshots=app.config.get('ALERT_WRITE_BEHIND_QUEUE_SIZE', 10000),
+            batch_size=app.config.get('ALERT_WRITE_BEHIND_BATCH_SIZE', 500),
+            flush_interval=app.config.get('ALERT_WRITE_BEHIND_INTERVAL', 1.0)
+        ))
+        if app.config.get('ALERT_WRITE_BEHIND', True):
+            writer.start()
+    return writer
+
+def evaluate(changes):
+    """Queue a notification for every alert the price changes trigger, returning how many."""
+    index = get_index()
+    hits = [
+        (product_id, old, new, user_id, target)
+        for product_id, old, new in changes
+        for _, user_id, target in index.triggered(product_id, old, new)
+    ]
+    if not hits:
+        return 0
+
+    names = dict(db.session.execute(
+        db.select(Product.id, Product.product_name).where(Product.id.in_({hit[0] for hit in hits}))
+    ).all())
+    created_at = datetime.utcnow()
+    writer = get_notifier()
+    writer.enqueue([{
+        "user_id": user_id,
+        "product_id": product_id,
+        "product_name": names.get(product_id),
+        "old_price": old,
+        "new_price": new,
+        "target_price": target,
+        "created_at": created_at
+    } for product_id, old, new, user_id, target in hits])
+    if not current_app.config.get('ALERT_WRITE_BEHIND', True):
+        writer.flush_all()
+    return len(hits)
+
+@prices_changed.connect
+def _evaluate_price_changes(app, changes, **extra):
+    evaluate(changes)
@@ -0,0 +1,178 @@
+from datetime import datetime
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from models import db, Product, CanonicalProduct, BestDeal
+from services.comparison import fetch_offers
+from services.ranking import DEFAULT_WEIGHTS, score
+from services.signals import clusters_changed
+
+# Columns rewritten when a canonical product's winners change
+TRACKED_COLUMNS = tuple(
+    name for name in BestDeal.__table__.columns.keys() if name not in ('canonical_product_id', 'updated_at')
+)
+
+REFRESH_BATCH_SIZE = 500
+
+def _first_per_group(groups, *keys):
+    """Position of the first row of every group when rows are ordered by `keys` within groups."""
+    order = np.lexsort(keys[::-1] + (groups,))
+    firsts = np.r_[True, groups[order][1:] != groups[order][:-1]]
+    return order[firsts]
+
+def best_deals(offers, names):
+    """Pick the cheapest delivered, top rated and best value offer of every canonical product.
+
+    `offers` come from fetch_offers() (grouped by canonical product); all the
+    winners are found with array operations over the whole batch at once.
+    Returns a dict of best_deals rows keyed by canonical product id.
+    """
+    if not offers:
+        return {}
+    count = len(offers)
+    groups = np.fromiter((offer.canonical_product_id for offer in offers), dtype=np.int64, count=count)
+    shops = np.fromiter((offer.shop_id for offer in offers), dtype=np.int64, count=count)
+    ids = np.fromiter((offer.id for offer in offers), dtype=np.int64, count=count)
+    features = np.array(
+        [(offer.product_price, offer.product_rating, offer.delivery_cost, offer.payment_options) for offer in offers],
+        dtype=np.float64
+    ).T.copy()
+    price, rating, delivery = features[0], features[1], features[2]
+    landed = price + delivery  # NaN when the delivery cost is unknown
+
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    sizes = np.diff(np.r_[starts, count])
+    new_shop = np.r_[True, (groups[1:] != groups[:-1]) | (shops[1:] != shops[:-1])]
+    shop_counts = np.add.reduceat(new_shop.astype(np.int64), starts)
+    values = score(features, DEFAULT_WEIGHTS, starts)
+
+    # Ties go to the lower product id; unrated offers never win on rating, and an
+    # offer of unknown landed cost is only the cheapest when no offer's is known
+    cheapest = _first_per_group(groups, np.nan_to_num(landed, nan=np.inf), price, ids)
+    top_rated = _first_per_group(groups, -np.nan_to_num(rating, nan=-np.inf), ids)
+    best_value = _first_per_group(groups, -values, ids)
+
+    deals = {}
+    for group, size, shop_count, c, r, v in zip(
+        groups[starts].tolist(), sizes.tolist(), shop_counts.tolist(),
+        cheapest.tolist(), top_rated.tolist(), best_value.tolist()
+    ):
+        rated = offers[r].product_rating is not None
+        deals[group] = {
+            "canonical_product_id": group,
+            "name": names.get(group),
+            "offer_count": size,
+            "shop_count": shop_count,
+            "cheapest_product_id": offers[c].id,
+            "cheapest_shop_id": offers[c].shop_id,
+            "cheapest_shop_name": offers[c].shop_name,
+            "cheapest_price": offers[c].product_price,
+            "cheapest_delivery_cost": offers[c].delivery_cost,
+            "cheapest_landed_cost": float(landed[c]) if np.isfinite(landed[c]) else None,
+            "top_rated_product_id": offers[r].id if rated else None,
+            "top_rated_shop_id": offers[r].shop_id if rated else None,
+            "top_rated_shop_name": offers[r].shop_name if rated else None,
+            "top_rating": offers[r].product_rating,
+            "best_value_product_id": offers[v].id,
+            "best_value_shop_id": offers[v].shop_id,
+            "best_value_shop_name": offers[v].shop_name,
+            "best_value_score": round(float(values[v]), 6)
+        }
+    return deals
+
+def refresh_best_deals(canonical_product_ids):
+    """Recompute the best_deals rows of these canonical products, writing only rows that changed.
+
+    Returns the number of rows written.
+    """
+    canonical_ids = sorted({canonical_id for canonical_id in canonical_product_ids if canonical_id is not None})
+    written = 0
+    for start in range(0, len(canonical_ids), REFRESH_BATCH_SIZE):
+        batch = canonical_ids[start:start + REFRESH_BATCH_SIZE]
+        names = dict(db.session.execute(
+            db.select(CanonicalProduct.id, CanonicalProduct.name).where(CanonicalProduct.id.in_(batch))
+        ).all())
+        fresh = best_deals(fetch_offers(batch), names)
+        stored = {
+            row.canonical_product_id: row
+            for row in db.session.execute(
+                db.select(BestDeal.canonical_product_id, *[getattr(BestDeal, name) for name in TRACKED_COLUMNS])
+                .where(BestDeal.canonical_product_id.in_(batch))
+            )
+        }
+
+        now = datetime.utcnow()
+        inserts = [dict(row, updated_at=now) for key, row in fresh.items() if key not in stored]
+        updates = [
+            dict(row, updated_at=now) for key, row in fresh.items()
+            if key in stored and any(getattr(stored[key], name) != row[name] for name in TRACKED_COLUMNS)
+        ]
+        deletes = [key for key in stored if key not in fresh]
+
+        if deletes:
+            db.session.execute(db.delete(BestDeal).where(BestDeal.canonical_product_id.in_(deletes)))
+        if inserts:
+            db.session.execute(BestDeal.__table__.insert(), inserts)
+        if updates:
+            db.session.execute(db.update(BestDeal), updates)
+        written += len(inserts) + len(updates) + len(deletes)
+    db.session.commit()
+    return written
+
+@clusters_changed.connect
+def _refresh_changed_clusters(app, canonical_product_ids, **extra):
+    refresh_best_deals(canonical_product_ids)
+
+@click.command('backfill-best-deals')
+@click.option('--batch-size', default=REFRESH_BATCH_SIZE, show_default=True, help='Canonical products per batch.')
+@with_appcontext
+def backfill_best_deals_command(batch_size):
+    """Rebuild best_deals from the current offers."""
+    canonical_ids = db.session.scalars(
+        db.select(Product.canonical_product_id).where(Product.canonical_product_id.isnot(None))
+        .union(db.select(BestDeal.canonical_product_id))
+    ).all()
+    written = 0
+    for start in range(0, len(canonical_ids), batch_size):
+        written += refresh_best_deals(canonical_ids[start:start + batch_size])
+    click.echo(f"Refreshed best deals for {len(canonical_ids)} products ({written} rows written).")
+
+def deal_for_product(product_id):
+    """Return the best deals for the canonical product a product belongs to, or None.
+
+    The product's canonical id leads straight to the best_deals primary key, so
+    this is a single indexed lookup.
+    """
+    deal = db.session.execute(
+        db.select(BestDeal).join(Product, Product.canonical_product_id == BestDeal.canonical_product_id)
+        .where(Product.id == product_id)
+    ).scalar_one_or_none()
+    if deal is None:
+        return None
+    return {
+        "canonical_product_id": deal.canonical_product_id,
+        "name": deal.name,
+        "offer_count": deal.offer_count,
+        "shop_count": deal.shop_count,
+        "cheapest": {
+            "product_id": deal.cheapest_product_id,
+            "shop_id": deal.cheapest_shop_id,
+            "shop_name": deal.cheapest_shop_name,
+            "product_price": deal.cheapest_price,
+            "delivery_cost": deal.cheapest_delivery_cost,
+            "landed_cost": deal.cheapest_landed_cost
+        },
+        "top_rated": {
+            "product_id": deal.top_rated_product_id,
+            "shop_id": deal.top_rated_shop_id,
+            "shop_name": deal.top_rated_shop_name,
+            "product_rating": deal.top_rating
+        } if deal.top_rated_product_id is not None else None,
+        "best_value": {
+            "product_id": deal.best_value_product_id,
+            "shop_id": deal.best_value_shop_id,
+            "shop_name": deal.best_value_shop_name,
+            "score": deal.best_value_score
+        },
+        "updated_at": deal.updated_at.isoformat() if deal.updated_at else None
+    }
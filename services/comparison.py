@@ -0,0 +1,239 @@
+from collections import namedtuple
+from datetime import datetime
+import click
+import numpy as np
+from flask.cli import with_appcontext
+from sqlalchemy.orm import aliased
+from models import db, Product, Shop, ComparisonResult
+from services import matching  # noqa: F401 - assigns the canonical products comparisons are grouped by
+from services.ranking import payment_options
+from services.signals import clusters_changed
+
+# Every pairwise comparison for a set of offers, as parallel arrays.
+# `x` and `y` index into `offers`; shop x always has the lower shop id.
+Comparisons = namedtuple('Comparisons', ['offers', 'x', 'y', 'marginal_benefit', 'cost_benefit'])
+
+def fetch_offers(canonical_product_ids):
+    """Load every offer for the given canonical products (ids or a subquery) in one SELECT.
+
+    Offers come back grouped by canonical product and shop, cheapest landed
+    cost first, which is the order compare() relies on. An unknown delivery
+    cost stays NULL, so its landed cost is unknown and sorts after every known one.
+    """
+    landed_cost = Product.product_price + Product.delivery_cost
+    return db.session.execute(
+        db.select(
+            Product.id,
+            Product.canonical_product_id,
+            Product.product_name,
+            Product.shop_id,
+            Shop.name.label('shop_name'),
+            Product.product_price,
+            Product.product_rating,
+            Product.delivery_cost,
+            Product.payment_mode,
+            payment_options(Product.payment_mode).label('payment_options')
+        ).join(Shop, Shop.id == Product.shop_id).where(
+            Product.canonical_product_id.in_(canonical_product_ids),
+            Product.product_price.isnot(None),
+            Product.tombstoned_at.is_(None)
+        ).order_by(
+            Product.canonical_product_id, Product.shop_id, landed_cost.asc().nulls_last(), Product.product_price, Product.id
+        )
+    ).all()
+
+def compare(offers):
+    """Compute marginal benefit and cost benefit for every pair of shops selling the same product.
+
+    Offers are grouped by canonical product, each shop keeps only its cheapest offer, and
+    the pairs of every group are generated and scored with array operations
+    instead of per-pair queries. Returns a Comparisons of (pairs,) arrays.
+    """
+    if not offers:
+        empty = np.empty(0, dtype=np.int64)
+        return Comparisons([], empty, empty, np.empty(0), np.empty(0))
+
+    groups = np.fromiter((offer.canonical_product_id for offer in offers), dtype=np.int64, count=len(offers))
+    shop_ids = np.fromiter((offer.shop_id for offer in offers), dtype=np.int64, count=len(offers))
+
+    # One offer per (product, shop): the first of each run, offers being sorted by landed cost
+    new_group = np.r_[True, groups[1:] != groups[:-1]]
+    keep = np.flatnonzero(new_group | np.r_[True, shop_ids[1:] != shop_ids[:-1]])
+    offers = [offers[i] for i in keep]
+    new_group = new_group[keep]
+
+    price = np.array([offer.product_price for offer in offers], dtype=np.float64)
+    rating = np.array([offer.product_rating for offer in offers], dtype=np.float64)
+    delivery = np.array([offer.delivery_cost for offer in offers], dtype=np.float64)
+    landed = price + delivery
+
+    # Every group of n shops contributes the n*(n-1)/2 pairs above the diagonal;
+    # groups of the same size share one triu_indices
+    starts = np.flatnonzero(new_group)
+    sizes = np.diff(np.r_[starts, len(offers)])
+    xs, ys = [], []
+    for size in np.unique(sizes[sizes > 1]):
+        first, second = np.triu_indices(size, 1)
+        group_starts = starts[sizes == size][:, None]
+        xs.append((group_starts + first).ravel())
+        ys.append((group_starts + second).ravel())
+    x = np.concatenate(xs) if xs else np.empty(0, dtype=np.int64)
+    y = np.concatenate(ys) if ys else np.empty(0, dtype=np.int64)
+
+    return Comparisons(offers, x, y, rating[x] - rating[y], landed[x] - landed[y])
+
+def _number(value):
+    return None if np.isnan(value) else value
+
+def comparison_rows(comparisons):
+    """Yield one dict per comparison with the ComparisonResult columns plus shop names."""
+    offers = comparisons.offers
+    x, y = comparisons.x.tolist(), comparisons.y.tolist()
+    marginal_benefit = comparisons.marginal_benefit.tolist()
+    cost_benefit = comparisons.cost_benefit.tolist()
+    for position in range(len(x)):
+        shop_x, shop_y = offers[x[position]], offers[y[position]]
+        yield {
+            "product_id": shop_x.id,
+            "canonical_product_id": shop_x.canonical_product_id,
+            "product_name": shop_x.product_name,
+            "shop_x_id": shop_x.shop_id,
+            "shop_x_name": shop_x.shop_name,
+            "shop_x_cost": shop_x.product_price,
+            "shop_x_rating": shop_x.product_rating,
+            "shop_x_delivery_cost": shop_x.delivery_cost,
+            "shop_x_payment_mode": shop_x.payment_mode,
+            "shop_y_id": shop_y.shop_id,
+            "shop_y_product_id": shop_y.id,
+            "shop_y_name": shop_y.shop_name,
+            "shop_y_cost": shop_y.product_price,
+            "shop_y_rating": shop_y.product_rating,
+            "shop_y_delivery_cost": shop_y.delivery_cost,
+            "shop_y_payment_mode": shop_y.payment_mode,
+            "marginal_benefit": _number(marginal_benefit[position]),
+            "cost_benefit": _number(cost_benefit[position])
+        }
+
+# Columns that change when an underlying price, rating or delivery cost does,
+# or when an offer is renamed or matched to another canonical product
+TRACKED_COLUMNS = (
+    'canonical_product_id', 'product_name', 'shop_y_product_id',
+    'shop_x_cost', 'shop_x_rating', 'shop_x_delivery_cost', 'shop_x_payment_mode',
+    'shop_y_cost', 'shop_y_rating', 'shop_y_delivery_cost', 'shop_y_payment_mode',
+    'marginal_benefit', 'cost_benefit'
+)
+
+REFRESH_BATCH_SIZE = 500
+
+def refresh_comparisons(canonical_product_ids):
+    """Bring the comparison_results rows for these canonical products in line with the offers.
+
+    Pairs are recomputed from the current offers and diffed against the stored
+    rows, so only new pairs are inserted, only pairs whose figures moved are
+    updated and pairs that no longer exist are deleted. Returns the number of
+    rows written.
+    """
+    canonical_ids = sorted({canonical_id for canonical_id in canonical_product_ids if canonical_id is not None})
+    written = 0
+    for start in range(0, len(canonical_ids), REFRESH_BATCH_SIZE):
+        batch = canonical_ids[start:start + REFRESH_BATCH_SIZE]
+        fresh = {
+            (row["product_id"], row["shop_x_id"], row["shop_y_id"]): row
+            for row in comparison_rows(compare(fetch_offers(batch)))
+        }
+        # Rows of an offer that just joined one of these clusters may still carry its old one
+        offer_ids = {product_id for product_id, _, _ in fresh}
+        stored = {
+            (row.product_id, row.shop_x_id, row.shop_y_id): row
+            for row in db.session.execute(
+                db.select(ComparisonResult.id, ComparisonResult.product_id, ComparisonResult.shop_x_id,
+                          ComparisonResult.shop_y_id, *[getattr(ComparisonResult, name) for name in TRACKED_COLUMNS])
+                .where(ComparisonResult.canonical_product_id.in_(batch) | ComparisonResult.product_id.in_(offer_ids))
+            )
+        }
+
+        now = datetime.utcnow()
+        columns = ComparisonResult.__table__.columns.keys()
+        inserts = [
+            dict({name: value for name, value in row.items() if name in columns}, updated_at=now)
+            for key, row in fresh.items() if key not in stored
+        ]
+        updates = [
+            dict({name: row[name] for name in TRACKED_COLUMNS}, id=stored[key].id, updated_at=now)
+            for key, row in fresh.items()
+            if key in stored and any(getattr(stored[key], name) != row[name] for name in TRACKED_COLUMNS)
+        ]
+        in_batch = set(batch)
+        deletes = [row.id for key, row in stored.items() if key not in fresh and row.canonical_product_id in in_batch]
+
+        if deletes:
+            db.session.execute(db.delete(ComparisonResult).where(ComparisonResult.id.in_(deletes)))
+        if inserts:
+            db.session.execute(ComparisonResult.__table__.insert(), inserts)
+        if updates:
+            db.session.execute(db.update(ComparisonResult), updates)
+        written += len(inserts) + len(updates) + len(deletes)
+    db.session.commit()
+    return written
+
+def read_comparisons(canonical_product_ids, sort_by):
+    """Return the stored comparisons for these canonical products (a subquery), sorted in SQL."""
+    comparison = ComparisonResult
+    shop_x, shop_y = aliased(Shop), aliased(Shop)
+    if sort_by == 'mb':  # Marginal Benefit, descending
+        order = comparison.marginal_benefit.desc().nulls_last()
+    elif sort_by == 'cb':  # Cost-Benefit, ascending; unknown when either delivery cost is
+        order = comparison.cost_benefit.asc().nulls_last()
+    else:  # Total cost of shop x, ascending
+        order = (comparison.shop_x_cost + comparison.shop_x_delivery_cost).asc().nulls_last()
+
+    rows = db.session.execute(
+        db.select(
+            comparison.product_id,
+            comparison.canonical_product_id,
+            comparison.product_name,
+            comparison.shop_x_id,
+            shop_x.name.label('shop_x_name'),
+            comparison.shop_x_cost,
+            comparison.shop_x_rating,
+            comparison.shop_x_delivery_cost,
+            comparison.shop_x_payment_mode,
+            comparison.shop_y_id,
+            comparison.shop_y_product_id,
+            shop_y.name.label('shop_y_name'),
+            comparison.shop_y_cost,
+            comparison.shop_y_rating,
+            comparison.shop_y_delivery_cost,
+            comparison.shop_y_payment_mode,
+            comparison.marginal_benefit,
+            comparison.cost_benefit
+        ).join(shop_x, shop_x.id == comparison.shop_x_id).join(
+            shop_y, shop_y.id == comparison.shop_y_id
+        ).where(comparison.canonical_product_id.in_(canonical_product_ids)).order_by(
+            order, comparison.canonical_product_id, comparison.shop_x_id, comparison.shop_y_id
+        )
+    ).all()
+    return [row._asdict() for row in rows]
+
+@clusters_changed.connect
+def _refresh_changed_clusters(app, canonical_product_ids, **extra):
+    refresh_comparisons(canonical_product_ids)
+
+@click.command('backfill-comparisons')
+@click.option('--batch-size', default=REFRESH_BATCH_SIZE, show_default=True, help='Canonical products per batch.')
+@with_appcontext
+def backfill_comparisons_command(batch_size):
+    """Rebuild comparison_results from the current offers."""
+    canonical_ids = db.session.scalars(
+        db.select(Product.canonical_product_id).where(Product.canonical_product_id.isnot(None))
+        .union(db.select(ComparisonResult.canonical_product_id))
+    ).all()
+    written = 0
+    for start in range(0, len(canonical_ids), batch_size):
+        written += refresh_comparisons(canonical_ids[start:start + batch_size])
+    # Rows left over from before offers were matched into canonical products
+    written += db.session.execute(
+        db.delete(ComparisonResult).where(ComparisonResult.canonical_product_id.is_(None))
+    ).rowcount
+    db.session.commit()
+    click.echo(f"Refreshed comparisons for {len(canonical_ids)} products ({written} rows written).")
@@ -0,0 +1,188 @@
+import csv
+import gzip
+import io
+import logging
+import os
+import time
+import click
+from datetime import datetime
+from flask.cli import with_appcontext
+from models import db, Product, PriceHistory, ComparisonResult
+
+logger = logging.getLogger(__name__)
+
+# Tables the data team can export, exported in primary key order
+TABLES = {
+    'products': Product.__table__,
+    'price_history': PriceHistory.__table__,
+    'comparison_results': ComparisonResult.__table__,
+}
+FORMATS = ('csv', 'csv.gz', 'parquet')
+CONTENT_TYPES = {'csv': 'text/csv', 'csv.gz': 'application/gzip', 'parquet': 'application/vnd.apache.parquet'}
+CHUNK_SIZE = 5000
+
+class ExportStats:
+    """Rows and bytes written by an export, and how fast."""
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = self.bytes = 0
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        logger.info("Exported %d %s rows (%d bytes) in %.1fs, %.0f rows/s",
+                    self.rows, self.table, self.bytes, self.seconds, self.rows_per_second)
+
+def iter_chunks(table, chunk_size=CHUNK_SIZE):
+    """Yield the table's rows as lists of at most `chunk_size`, read through a server-side cursor."""
+    result = db.session.execute(
+        db.select(table).order_by(*table.primary_key.columns)
+        .execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    yield from result.partitions()
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _csv_chunks(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode(), len(rows)
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode(), 0
+
+def _gzip_chunks(chunks):
+    sink = _ChunkSink()
+    with gzip.GzipFile(fileobj=sink, mode='wb') as compressed:
+        for data, rows in chunks:
+            compressed.write(data)
+            yield sink.drain(), rows
+    yield sink.drain(), 0
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        self._pending = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._pending.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data, self._pending = b''.join(self._pending), []
+        return data
+
+def _arrow_type(pa, column):
+    python_type = column.type.python_type
+    if python_type is int:
+        return pa.int64()
+    if python_type is float:
+        return pa.float64()
+    if python_type is bool:
+        return pa.bool_()
+    if python_type is datetime:
+        return pa.timestamp('us')
+    return pa.string()
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The parquet export needs the 'pyarrow' package installed")
+    return pyarrow, pyarrow.parquet
+
+def _parquet_chunks(table, chunks):
+    pa, pq = _pyarrow()
+    schema = pa.schema([(column.name, _arrow_type(pa, column)) for column in table.columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for rows in chunks:
+            # One row group per chunk, built column by column
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array([row[position] for row in rows], type=field.type) for position, field in enumerate(schema)],
+                schema=schema
+            ))
+            yield sink.drain(), len(rows)
+    finally:
+        writer.close()
+    yield sink.drain(), 0
+
+def export_table(name, file_format, chunk_size=CHUNK_SIZE):
+    """Return a generator of the encoded export of a table; its last item is the ExportStats.
+
+    Only one chunk of rows (and its encoded bytes) is held at a time. Bad
+    arguments and a missing pyarrow raise here, before anything is streamed.
+    """
+    if name not in TABLES:
+        raise ValueError(f"table must be one of: {', '.join(TABLES)}")
+    if file_format not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if file_format == 'parquet':
+        _pyarrow()
+    return _export(name, file_format, chunk_size)
+
+def _export(name, file_format, chunk_size):
+    table = TABLES[name]
+    chunks = iter_chunks(table, chunk_size)
+    if file_format == 'parquet':
+        encoded = _parquet_chunks(table, chunks)
+    else:
+        encoded = _csv_chunks([column.name for column in table.columns], chunks)
+        if file_format == 'csv.gz':
+            encoded = _gzip_chunks(encoded)
+
+    stats = ExportStats(name)
+    for data, rows in encoded:
+        stats.rows += rows
+        stats.bytes += len(data)
+        if data:
+            yield data
+    stats.finish()
+    yield stats
+
+def stream_export(name, file_format, chunk_size=CHUNK_SIZE):
+    """Like export_table, but yielding only the bytes (for a streamed response)."""
+    pieces = export_table(name, file_format, chunk_size)
+    return (piece for piece in pieces if not isinstance(piece, ExportStats))
+
+@click.command('export-catalog')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(list(TABLES)), help='Table to export (repeatable; default all).')
+@click.option('--format', 'file_format', default='csv.gz', show_default=True, type=click.Choice(FORMATS))
+@click.option('--output-dir', default='exports', show_default=True, type=click.Path(file_okay=False))
+@click.option('--chunk-size', default=CHUNK_SIZE, show_default=True, help='Rows fetched and encoded at a time.')
+@with_appcontext
+def export_catalog_command(tables, file_format, output_dir, chunk_size):
+    """Dump catalog tables to files for analytics, one file per table."""
+    os.makedirs(output_dir, exist_ok=True)
+    for name in tables or TABLES:
+        path = os.path.join(output_dir, f"{name}.{file_format}")
+        with open(path, 'wb') as output:
+            for piece in export_table(name, file_format, chunk_size):
+                if isinstance(piece, ExportStats):
+                    stats = piece
+                else:
+                    output.write(piece)
+        click.echo(f"{name}: {stats.rows} rows, {stats.bytes} bytes in {stats.seconds:.1f}s "
+                   f"({stats.rows_per_second:.0f} rows/s) -> {path}")
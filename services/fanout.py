@@ -0,0 +1,146 @@
+import asyncio
+import atexit
+import threading
+import time
+from collections import namedtuple
+import aiohttp
+from flask import current_app
+from models import db, Product, Shop
+from services.adapters import adapter_for
+from services.price_history import record_prices
+from services.retention import mark_seen
+from services.signals import products_changed, prices_changed
+from services.versions import bump
+
+# Outcome of one shop's search: `status` is "ok", "timeout" or "error"
+ShopResult = namedtuple('ShopResult', ['shop_id', 'shop_name', 'status', 'offers', 'elapsed_ms', 'error'])
+
+class LiveSearchEngine:
+    """Queries every shop adapter concurrently from a dedicated event loop.
+
+    The loop and its aiohttp session live in a background thread for the life
+    of the worker, so connections to the shops are pooled across requests.
+    Each shop gets its own timeout and at most `concurrency` shops are queried
+    at once; a slow or failing shop only loses its own results.
+    """
+
+    def __init__(self, timeout=5.0, concurrency=4, pool_size=20):
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='live-search', daemon=True)
+        self._thread.start()
+        self._session = self._submit(self._open_session())
+        atexit.register(self.close)
+
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector, headers={"User-Agent": "ShopCrawl/1.0"})
+
+    def _submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def search(self, adapters, query):
+        """Search all `adapters` for `query` and return a ShopResult per adapter."""
+        return self._submit(self._search_all(adapters, query))
+
+    async def _search_all(self, adapters, query):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        return await asyncio.gather(*[self._search_shop(adapter, query, semaphore) for adapter in adapters])
+
+    async def _search_shop(self, adapter, query, semaphore):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                offers = await asyncio.wait_for(adapter.search(self._session, query), self.timeout)
+                status, error = 'ok', None
+            except asyncio.TimeoutError:
+                offers, status, error = [], 'timeout', f"No response within {self.timeout}s"
+            except Exception as e:
+                # Network errors and anything a shop's markup trips in its adapter: one shop's failure only
+                offers, status, error = [], 'error', str(e) or e.__class__.__name__
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+        return ShopResult(adapter.shop_id, adapter.shop_name, status, offers, elapsed_ms, error)
+
+    def close(self):
+        if self._loop.is_running():
+            self._submit(self._session.close())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the current app's engine, configured by the LIVE_SEARCH_* settings."""
+    engine = current_app.extensions.get('live_search')
+    if engine is None:
+        with _engine_lock:
+            engine = current_app.extensions.get('live_search')
+            if engine is None:
+                engine = LiveSearchEngine(
+                    timeout=current_app.config.get('LIVE_SEARCH_TIMEOUT', 5.0),
+                    concurrency=current_app.config.get('LIVE_SEARCH_CONCURRENCY', 4),
+                    pool_size=current_app.config.get('LIVE_SEARCH_POOL_SIZE', 20)
+                )
+                current_app.extensions['live_search'] = engine
+    return engine
+
+def save_offers(results):
+    """Write fresh offers back into products, matching existing rows on (shop_id, product_url).
+
+    Every listing found is marked seen (a live search is not a full crawl, so
+    no crawl is counted) and tombstoned ones come back. Returns the ids of the
+    products that were inserted, updated or revived.
+    """
+    offers = {
+        (result.shop_id, offer['product_url']): dict(offer, shop_id=result.shop_id, shop_name=result.shop_name)
+        for result in results for offer in result.offers if offer['product_url']
+    }
+    if not offers:
+        return []
+
+    shop_ids = {shop_id for shop_id, _ in offers}
+    urls = {url for _, url in offers}
+    existing = {
+        (product.shop_id, product.product_url): product
+        for product in Product.query.filter(Product.shop_id.in_(shop_ids), Product.product_url.in_(urls))
+    }
+
+    changed = []
+    revived = [product for product in existing.values() if product.tombstoned_at is not None]
+    for key, offer in offers.items():
+        product = existing.get(key)
+        if product is None:
+            product = Product(navigate_link=offer['product_url'], **offer)
+            db.session.add(product)
+            changed.append(product)
+            continue
+        updated = False
+        for field, value in offer.items():
+            if value is not None and getattr(product, field) != value:
+                setattr(product, field, value)
+                updated = True
+        if updated:
+            changed.append(product)
+
+    db.session.flush()
+    mark_seen(sorted({product.id for product in [*existing.values(), *changed]}))
+    changed += [product for product in revived if product not in changed]
+    product_ids = [product.id for product in changed]
+    changes = record_prices(product_ids) if product_ids else []
+    if changed:
+        bump('products')
+    db.session.commit()
+    if product_ids:
+        products_changed.send(current_app._get_current_object(), product_ids=product_ids)
+    if changes:
+        prices_changed.send(current_app._get_current_object(), changes=changes)
+    return product_ids
+
+def live_search(query):
+    """Fan out `query` to every shop, save what came back and return the ShopResults."""
+    adapters = [adapter_for(shop) for shop in Shop.query.order_by(Shop.id)]
+    results = get_engine().search(adapters, query)
+    save_offers(results)
+    return results
@@ -0,0 +1,50 @@
+import re
+from sqlalchemy import select, func, literal, literal_column, table, column, and_, false
+from models import db, Product
+
+# Search terms are runs of word characters, so they are always safe to embed in
+# tsquery / FTS5 query syntax.
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(query):
+    """Split a free-text query into lowercase search terms."""
+    return TERM_PATTERN.findall(query.lower())
+
+def ranked_matches(query):
+    """Return a subquery of (id, rank) for live products whose name matches `query`.
+
+    Tombstoned products never match. Every term must match (as a prefix) and a
+    higher rank means a better match, so callers join on `id` and order by
+    `rank.desc()`.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return select(Product.id.label('id'), literal(0.0).label('rank')).where(false()).subquery()
+
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        vector = literal_column('products.search_vector')
+        tsquery = func.to_tsquery('simple', ' & '.join(f"{term}:*" for term in terms))
+        return select(
+            Product.id.label('id'),
+            func.ts_rank(vector, tsquery).label('rank')
+        ).where(vector.op('@@')(tsquery), Product.tombstoned_at.is_(None)).subquery()
+
+    if dialect == 'sqlite':
+        fts = table('products_fts', column('rowid'))
+        fts_table = literal_column('products_fts')
+        return select(
+            fts.c.rowid.label('id'),
+            # bm25() is lower-is-better, flip it so every backend ranks the same way
+            (-func.bm25(fts_table)).label('rank')
+        ).select_from(fts).join(Product, Product.id == fts.c.rowid).where(
+            fts_table.op('MATCH')(' '.join(f'"{term}"*' for term in terms)),
+            Product.tombstoned_at.is_(None)
+        ).subquery()
+
+    # No full-text support on this backend: fall back to substring matching
+    return select(Product.id.label('id'), literal(1.0).label('rank')).where(
+        and_(*[Product.product_name.ilike(f"%{term}%") for term in terms]),
+        Product.tombstoned_at.is_(None)
+    ).subquery()
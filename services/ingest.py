@@ -0,0 +1,234 @@
+import io
+import json
+import math
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import tuple_
+from models import db, Product, Shop
+from services.price_history import record_prices
+from services.retention import mark_seen, start_crawl
+from services.signals import products_changed, prices_changed
+from services.versions import bump
+
+# Accepted fields and how to coerce them; anything else in a row is ignored
+FIELDS = {
+    'product_name': str,
+    'product_price': float,
+    'product_rating': float,
+    'product_url': str,
+    'delivery_cost': float,
+    'shop_name': str,
+    'payment_mode': str,
+    'navigate_link': str,
+    'shop_id': int,
+}
+REQUIRED = ('product_name', 'product_price', 'shop_id')
+LENGTHS = {name: column.type.length for name, column in Product.__table__.columns.items() if name in FIELDS and getattr(column.type, 'length', None)}
+
+# Columns compared against the stored row to tell a real update from a re-crawl of the same data
+TRACKED_COLUMNS = tuple(name for name in FIELDS if name not in ('shop_id', 'product_url'))
+
+def parse_ndjson(lines):
+    """Yield (line number, object or None, error or None) for each non-blank line."""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line), None
+        except ValueError as error:
+            yield number, None, f"Invalid JSON: {error}"
+
+def validate(raw, shop_ids):
+    """Return (row, None) for a valid product dict, or (None, error message)."""
+    if not isinstance(raw, dict):
+        return None, "Expected a JSON object"
+    missing = [name for name in REQUIRED if raw.get(name) in (None, '')]
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+
+    row = {}
+    for name, kind in FIELDS.items():
+        value = raw.get(name)
+        if value is None:
+            row[name] = None
+            continue
+        if kind is not str and isinstance(value, bool):
+            return None, f"Invalid {name}: {value!r}"
+        try:
+            row[name] = kind(value)
+        except (TypeError, ValueError):
+            return None, f"Invalid {name}: {value!r}"
+        if kind is float and not math.isfinite(row[name]):
+            # float() accepts 'nan' and 'inf', and JSON parsers accept NaN and Infinity
+            return None, f"Invalid {name}: {value!r}"
+        if kind is str and name in LENGTHS and len(row[name]) > LENGTHS[name]:
+            return None, f"{name} is longer than {LENGTHS[name]} characters"
+
+    if row['product_price'] < 0:
+        return None, "product_price must not be negative"
+    if row['shop_id'] not in shop_ids:
+        return None, f"Unknown shop_id: {row['shop_id']}"
+    return row, None
+
+def _copy_value(value):
+    # Postgres COPY text format: tab separated, \N for NULL, backslash escapes
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+class ProductIngest:
+    """Upserts products in batches keyed on (shop_id, product_url).
+
+    Each batch looks up the listings it already has with one SELECT, inserts
+    the new ones and updates only those whose fields changed: on Postgres the
+    batch is streamed into a temporary table with COPY and applied with one
+    INSERT ... SELECT and one UPDATE ... FROM, elsewhere with batched
+    multi-row statements. Rows without a product_url cannot be matched and are
+    always inserted. Within a batch the last row for a key wins. Each
+    written batch is announced with products_changed.
+
+    Unless `crawl` is false (a partial feed), an import counts as one full
+    crawl of every shop in it: each listing it carries is marked seen in that
+    crawl, and tombstoned ones come back.
+    """
+
+    def __init__(self, batch_size=1000, crawl=True):
+        self.batch_size = batch_size
+        self.crawl = crawl
+        self._crawled = set()
+        self.received = self.inserted = self.updated = self.unchanged = self.duplicates = 0
+        self.errors = []
+        self._pending = []
+        self._shop_ids = set(db.session.scalars(db.select(Shop.id)))
+        self._started = time.perf_counter()
+
+    def add(self, position, raw, error=None):
+        """Validate one incoming row, writing a batch once enough have accumulated."""
+        self.received += 1
+        if error is None:
+            row, error = validate(raw, self._shop_ids)
+        if error is not None:
+            self.errors.append({"row": position, "error": error})
+            return
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        keyed, unkeyed = {}, []
+        for row in rows:
+            if row['product_url']:
+                keyed[(row['shop_id'], row['product_url'])] = row
+            else:
+                unkeyed.append(row)
+
+        stored = {}
+        if keyed:
+            for existing in db.session.execute(
+                db.select(
+                    Product.id, Product.shop_id, Product.product_url, Product.tombstoned_at,
+                    *[getattr(Product, name) for name in TRACKED_COLUMNS]
+                )
+                .where(tuple_(Product.shop_id, Product.product_url).in_(list(keyed)))
+                .order_by(Product.id.desc())  # The oldest listing wins if a shop has duplicates
+            ):
+                stored[(existing.shop_id, existing.product_url)] = existing
+
+        now = datetime.utcnow()
+        inserts = [dict(row, created_at=now) for key, row in keyed.items() if key not in stored] + [
+            dict(row, created_at=now) for row in unkeyed
+        ]
+        updates = [
+            dict({name: row[name] for name in TRACKED_COLUMNS}, id=stored[key].id)
+            for key, row in keyed.items()
+            if key in stored and any(getattr(stored[key], name) != row[name] for name in TRACKED_COLUMNS)
+        ]
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            inserted_ids = self._copy(inserts, updates)
+        else:
+            inserted_ids = self._execute(inserts, updates)
+        if self.crawl:
+            start_crawl({row['shop_id'] for row in rows} - self._crawled)
+            self._crawled.update(row['shop_id'] for row in rows)
+        mark_seen(inserted_ids + [existing.id for existing in stored.values()])
+        updated_ids = {row['id'] for row in updates}
+        revived = [
+            existing.id for existing in stored.values()
+            if existing.tombstoned_at is not None and existing.id not in updated_ids
+        ]
+        changed = inserted_ids + list(updated_ids) + revived
+        changes = record_prices(changed) if changed else []
+        if changed:
+            bump('products')
+        db.session.commit()
+
+        self.inserted += len(inserts)
+        self.updated += len(updates)
+        self.unchanged += len(stored) - len(updates)
+        self.duplicates += len(rows) - len(keyed) - len(unkeyed)
+        if changed:
+            # Per batch, so matching and the maintained tables catch up in bounded chunks
+            products_changed.send(current_app._get_current_object(), product_ids=changed)
+        if changes:
+            prices_changed.send(current_app._get_current_object(), changes=changes)
+
+    def _execute(self, inserts, updates):
+        inserted_ids = []
+        if inserts:
+            inserted_ids = db.session.scalars(db.insert(Product).returning(Product.id), inserts).all()
+        if updates:
+            db.session.execute(db.update(Product), updates)
+        return inserted_ids
+
+    def _copy(self, inserts, updates):
+        columns = ['id', 'created_at', *FIELDS]
+        table = Product.__table__
+        dialect = db.session.get_bind().dialect
+        db.session.execute(db.text(
+            "CREATE TEMP TABLE IF NOT EXISTS product_ingest ("
+            + ", ".join(f"{name} {table.c[name].type.compile(dialect)}" for name in columns)
+            + ") ON COMMIT DROP"
+        ))
+
+        buffer = io.StringIO()
+        for row in inserts + updates:
+            buffer.write('\t'.join(_copy_value(row.get(name)) for name in columns) + '\n')
+        buffer.seek(0)
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(f"COPY product_ingest ({', '.join(columns)}) FROM STDIN", buffer)
+
+        inserted = ', '.join(['created_at', *FIELDS])
+        inserted_ids = db.session.scalars(db.text(
+            f"INSERT INTO products ({inserted}, updated_at) SELECT {inserted}, now() AT TIME ZONE 'utc'"
+            " FROM product_ingest WHERE id IS NULL RETURNING id"
+        )).all()
+        db.session.execute(db.text(
+            "UPDATE products SET " + ", ".join(f"{name} = i.{name}" for name in TRACKED_COLUMNS)
+            + ", updated_at = now() AT TIME ZONE 'utc' FROM product_ingest i WHERE products.id = i.id"
+        ))
+        return inserted_ids
+
+    def finish(self):
+        """Write what is left and return the per-row errors and throughput figures."""
+        self.flush()
+        seconds = time.perf_counter() - self._started
+        accepted = self.received - len(self.errors)
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "duplicates": self.duplicates,
+            "failed": len(self.errors),
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(accepted / seconds, 1) if seconds else None,
+        }
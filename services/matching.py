@@ -0,0 +1,382 @@
+import logging
+import re
+import threading
+import zlib
+from collections import defaultdict, namedtuple
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db, Product, CanonicalProduct, ComparisonResult
+from services.signals import products_changed, products_deleted, clusters_changed
+from services.versions import bump, table_state
+from services.write_behind import WriteBehindWriter
+
+logger = logging.getLogger(__name__)
+
+# Listing noise that says nothing about which item it is
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'the', 'for', 'with', 'of', 'in', 'on', 'by', 'to', 'new', 'original', 'genuine',
+    'official', 'brand', 'free', 'shipping', 'delivery', 'sale', 'offer', 'best', 'latest', 'edition'
+])
+
+# "128 GB" and "128GB" are the same token
+UNIT_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s+(gb|tb|mb|mah|w|mp|hz|inch|inches|cm|mm|kg|g|l|ml)\b")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+# Large prime for the (a*x + b) mod p hash family; hashes, a and b all fit in
+# 32 bits so a*x + b cannot overflow a uint64
+PRIME = np.uint64(4294967291)
+
+def title_tokens(name):
+    """Normalize a listing title to its set of meaningful lowercase tokens."""
+    text = UNIT_PATTERN.sub(r"\1\2", (name or '').lower())
+    return frozenset(token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS)
+
+def model_tokens(tokens):
+    """Tokens with digits in them (model numbers, capacities), which must agree for a match."""
+    return frozenset(token for token in tokens if any(ch.isdigit() for ch in token))
+
+# What the index keeps per product to check a candidate without going back to the database
+Entry = namedtuple('Entry', ['signature', 'models', 'price', 'canonical_id'])
+
+class MatchIndex:
+    """Groups listings of the same item from different shops into canonical products.
+
+    Titles are reduced to token sets and summarized by a MinHash signature;
+    locality-sensitive hashing over bands of the signature finds the few
+    listings likely to share most tokens, so a new product is checked against
+    those candidates instead of the whole catalog. A candidate only counts if
+    its estimated similarity reaches `threshold`, its model numbers agree and
+    its price is within a factor of `price_band`.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.5, price_band=3.0, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.price_band = price_band
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, 2 ** 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = generator.integers(0, 2 ** 31, size=(num_perm, 1), dtype=np.uint64)
+        self._entries = {}                # product id -> Entry
+        self._buckets = defaultdict(set)  # (band, band hash) -> product ids
+        self._members = defaultdict(set)  # canonical id -> product ids
+        self._lock = threading.RLock()
+        self.version = 0                  # canonical_products table version the index reflects
+
+    def __len__(self):
+        return len(self._entries)
+
+    def signature(self, tokens):
+        """MinHash signature of a token set, or None for an empty one."""
+        if not tokens:
+            return None
+        hashes = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+        return ((self._a * hashes + self._b) % PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [(band, hash(signature[band * self.rows:(band + 1) * self.rows].tobytes())) for band in range(self.bands)]
+
+    def add(self, product_id, name, price, canonical_id):
+        """Index a product (replacing any previous entry for it)."""
+        tokens = title_tokens(name)
+        signature = self.signature(tokens)
+        with self._lock:
+            self.remove(product_id)
+            self._entries[product_id] = Entry(signature, model_tokens(tokens), price, canonical_id)
+            self._members[canonical_id].add(product_id)
+            if signature is not None:
+                for key in self._band_keys(signature):
+                    self._buckets[key].add(product_id)
+
+    def remove(self, product_id):
+        """Drop a product from the index, returning its entry (or None)."""
+        with self._lock:
+            entry = self._entries.pop(product_id, None)
+            if entry is not None:
+                self._release(product_id, entry.canonical_id)
+            if entry is not None and entry.signature is not None:
+                for key in self._band_keys(entry.signature):
+                    bucket = self._buckets.get(key)
+                    if bucket is not None:
+                        bucket.discard(product_id)
+                        if not bucket:
+                            del self._buckets[key]
+            return entry
+
+    def _release(self, product_id, canonical_id):
+        members = self._members.get(canonical_id)
+        if members is not None:
+            members.discard(product_id)
+            if not members:
+                del self._members[canonical_id]
+
+    def members(self, canonical_id):
+        """Ids of the indexed products in a canonical product."""
+        return set(self._members.get(canonical_id, ()))
+
+    def relabel(self, product_id, canonical_id):
+        """Move an indexed product to another canonical product."""
+        with self._lock:
+            entry = self._entries[product_id]
+            self._release(product_id, entry.canonical_id)
+            self._entries[product_id] = entry._replace(canonical_id=canonical_id)
+            self._members[canonical_id].add(product_id)
+
+    def match(self, name, price, exclude=None):
+        """Return (canonical_id, similarity) of the closest indexed listing, or None."""
+        tokens = title_tokens(name)
+        signature = self.signature(tokens)
+        if signature is None:
+            return None
+        models = model_tokens(tokens)
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates |= self._buckets.get(key, set())
+            candidates.discard(exclude)
+            candidates = [
+                product_id for product_id in candidates
+                if self._compatible(self._entries[product_id], models, price)
+            ]
+            if not candidates:
+                return None
+            signatures = np.stack([self._entries[product_id].signature for product_id in candidates])
+            similarity = (signatures == signature).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] < self.threshold:
+                return None
+            return self._entries[candidates[best]].canonical_id, float(similarity[best])
+
+    def _compatible(self, entry, models, price):
+        if entry.canonical_id is None:
+            return False
+        # Every model number of the less specific title must appear in the other
+        if not (entry.models <= models or models <= entry.models):
+            return False
+        if price and entry.price:
+            return max(price, entry.price) <= self.price_band * min(price, entry.price)
+        return True
+
+_build_lock = threading.Lock()
+
+def get_index():
+    """Return the current app's match index, reloading it when another process changed the clusters."""
+    versions, _ = table_state('canonical_products')
+    return _current_index(versions['canonical_products'])
+
+def _current_index(version):
+    extensions = current_app.extensions
+    index = extensions.get('match_index')
+    if index is None or index.version != version:
+        with _build_lock:
+            index = extensions.get('match_index')
+            if index is None or index.version != version:
+                index = _new_index()
+                rows = db.session.execute(
+                    db.select(Product.id, Product.product_name, Product.product_price, Product.canonical_product_id)
+                    .where(Product.tombstoned_at.is_(None)).execution_options(yield_per=5000)
+                )
+                for product_id, name, price, canonical_id in rows:
+                    index.add(product_id, name, price, canonical_id)
+                index.version = version
+                extensions['match_index'] = index
+    return index
+
+def _claim_index():
+    """Start a cluster write and return a match index that is current with every other one.
+
+    Bumping canonical_products first holds its version row until the caller
+    commits, so writers in other processes take turns. If one of them got in
+    since this process last wrote, the index is reloaded before it is used.
+    The index is left holding this write's version; the caller must commit or
+    drop the index.
+    """
+    bump('canonical_products')
+    versions, _ = table_state('canonical_products')
+    index = _current_index(versions['canonical_products'] - 1)
+    index.version = versions['canonical_products']
+    return index
+
+def _commit(index):
+    try:
+        db.session.commit()
+    except Exception:
+        # The index already holds the failed write: rebuild it on next use
+        current_app.extensions.pop('match_index', None)
+        raise
+
+def _new_index():
+    return MatchIndex(
+        threshold=current_app.config.get('PRODUCT_MATCH_THRESHOLD', 0.5),
+        price_band=current_app.config.get('PRODUCT_MATCH_PRICE_BAND', 3.0)
+    )
+
+def _id(canonical):
+    return canonical.id if isinstance(canonical, CanonicalProduct) else canonical
+
+def _drop_empty_clusters(canonical_ids):
+    # Canonical products whose last listing moved elsewhere or was deleted
+    if canonical_ids:
+        db.session.execute(
+            db.delete(CanonicalProduct).where(
+                CanonicalProduct.id.in_(canonical_ids),
+                ~db.exists().where(Product.canonical_product_id == CanonicalProduct.id)
+            ).execution_options(synchronize_session=False)
+        )
+
+def assign_canonical_products(product_ids):
+    """Match products to canonical products, creating new ones for unmatched listings.
+
+    Products are handled in id order against everything indexed so far, so a
+    batch of new listings can match each other as well as older ones. Returns
+    the ids of every canonical product whose offers changed.
+    """
+    index = _claim_index()
+    rows = db.session.execute(
+        db.select(Product.id, Product.product_name, Product.product_price, Product.canonical_product_id)
+        .where(Product.id.in_(product_ids)).order_by(Product.id)
+    ).all()
+
+    affected = set()
+    assignments = {}  # product id -> canonical id, or a CanonicalProduct still to be inserted
+    for product_id, name, price, current_id in rows:
+        match = index.match(name, price, exclude=product_id)
+        if match is not None:
+            canonical = match[0]
+        elif current_id is not None and not index.members(current_id) - {product_id}:
+            canonical = current_id  # Matches nothing else and is alone in its cluster already
+        else:
+            canonical = CanonicalProduct(name=name)
+        index.add(product_id, name, price, canonical)
+        affected.add(canonical)
+        if canonical != current_id:
+            assignments[product_id] = canonical
+            if current_id is not None:
+                affected.add(current_id)
+
+    created = {canonical for canonical in assignments.values() if isinstance(canonical, CanonicalProduct)}
+    if created:
+        db.session.add_all(created)
+        db.session.flush()  # One multi-row INSERT for every new cluster
+        for product_id, canonical in assignments.items():
+            if canonical in created:
+                index.relabel(product_id, canonical.id)
+    if assignments:
+        db.session.execute(db.update(Product), [
+            {"id": product_id, "canonical_product_id": _id(canonical)} for product_id, canonical in assignments.items()
+        ])
+
+    affected = {_id(canonical) for canonical in affected}
+    _drop_empty_clusters(affected)
+    _commit(index)
+    return affected
+
+def unmatch_products(product_ids):
+    """Take deleted or hidden products out of their canonical products.
+
+    Returns the ids of the canonical products they left, including any whose
+    stored comparisons still point at them.
+    """
+    if not product_ids:
+        return set()
+    index = _claim_index()
+    affected = set()
+    for product_id in product_ids:
+        entry = index.remove(product_id)
+        if entry is not None and entry.canonical_id is not None:
+            affected.add(entry.canonical_id)
+    # Shop y's side of a comparison is not cascaded when its product goes
+    affected.update(db.session.scalars(
+        db.select(ComparisonResult.canonical_product_id).where(
+            ComparisonResult.canonical_product_id.isnot(None),
+            ComparisonResult.product_id.in_(product_ids) | ComparisonResult.shop_y_product_id.in_(product_ids)
+        ).distinct()
+    ).all())
+    _drop_empty_clusters(affected)
+    _commit(index)
+    return affected
+
+class ClusterRefresher(WriteBehindWriter):
+    """Write-behind queue of written products still to be matched into canonical products.
+
+    Requests queue the ids they changed or deleted and return; a background
+    thread re-matches a batch at a time and announces the clusters that moved,
+    so comparisons and best deals are refreshed off the request path as well.
+    The thread builds the match index before it takes its first batch. Changes
+    dropped from a full queue wait for `flask match-products`.
+    """
+
+    name = 'cluster-refresher'
+
+    def persist(self, rows):
+        # A product's last event wins: a tombstoned listing may be seen again in the same batch
+        deleted = {}
+        for row in rows:
+            deleted[row["product_id"]] = row["deleted"]
+        affected = unmatch_products([product_id for product_id, gone in deleted.items() if gone])
+        changed = [product_id for product_id, gone in deleted.items() if not gone]
+        if changed:
+            affected |= assign_canonical_products(changed)
+        if affected:
+            clusters_changed.send(self.app, canonical_product_ids=sorted(affected))
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                get_index()
+            except Exception:
+                logger.exception("Could not build the match index")
+        super()._run()
+
+def get_refresher():
+    """Return the current app's cluster refresher, configured by the CLUSTER_WRITE_BEHIND_* settings."""
+    app = current_app._get_current_object()
+    refresher = app.extensions.get('cluster_refresher')
+    if refresher is None:
+        refresher = app.extensions.setdefault('cluster_refresher', ClusterRefresher(
+            app,
+            max_snapshots=app.config.get('CLUSTER_WRITE_BEHIND_QUEUE_SIZE', 10000),
+            batch_size=app.config.get('CLUSTER_WRITE_BEHIND_BATCH_SIZE', 1000),
+            flush_interval=app.config.get('CLUSTER_WRITE_BEHIND_INTERVAL', 1.0)
+        ))
+        if app.config.get('CLUSTER_WRITE_BEHIND', False):
+            refresher.start()
+    return refresher
+
+def queue_products(product_ids, deleted=False):
+    """Queue products to be re-matched, in the background when CLUSTER_WRITE_BEHIND is on."""
+    refresher = get_refresher()
+    refresher.enqueue([{"product_id": product_id, "deleted": deleted} for product_id in product_ids])
+    if not current_app.config.get('CLUSTER_WRITE_BEHIND', False):
+        refresher.flush_all()
+
+@products_changed.connect
+def _match_changed_products(app, product_ids, **extra):
+    queue_products(product_ids)
+
+@products_deleted.connect
+def _unmatch_deleted_products(app, product_ids, **extra):
+    queue_products(product_ids, deleted=True)
+
+@click.command('match-products')
+@click.option('--batch-size', default=1000, show_default=True, help='Products matched per batch.')
+@with_appcontext
+def match_products_command(batch_size):
+    """Re-cluster every product into canonical products from scratch."""
+    db.session.execute(db.update(Product).values(canonical_product_id=None))
+    db.session.execute(db.delete(CanonicalProduct))
+    bump('canonical_products')  # Every process reloads its index
+    db.session.commit()
+
+    product_ids = db.session.scalars(db.select(Product.id).where(Product.tombstoned_at.is_(None)).order_by(Product.id)).all()
+    for start in range(0, len(product_ids), batch_size):
+        affected = assign_canonical_products(product_ids[start:start + batch_size])
+        clusters_changed.send(current_app._get_current_object(), canonical_product_ids=sorted(affected))
+
+    clusters = db.session.scalar(db.select(db.func.count()).select_from(CanonicalProduct))
+    click.echo(f"Matched {len(product_ids)} products into {clusters} canonical products.")
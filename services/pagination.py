@@ -0,0 +1,72 @@
+import base64
+import json
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+def encode_cursor(sort_value, row_id):
+    """Pack the last row's (sort value, id) into an opaque, URL-safe cursor."""
+    raw = json.dumps([sort_value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Unpack a cursor made by encode_cursor, raising ValueError if it is malformed."""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(row_id, int) or isinstance(sort_value, (list, dict)):
+        raise ValueError("Invalid cursor")
+    return sort_value, row_id
+
+def parse_page_args(args):
+    """Read `cursor` and `limit` from the query string, raising ValueError on bad input."""
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    cursor = args.get('cursor')
+    return (decode_cursor(cursor) if cursor else None), min(limit, MAX_LIMIT)
+
+def parse_ids(args):
+    """Read `ids=1,2,3` from the query string (None if absent), raising ValueError on bad input."""
+    raw = args.get('ids')
+    if raw is None:
+        return None
+    try:
+        ids = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        raise ValueError("ids must be a comma-separated list of integers")
+    if not ids:
+        raise ValueError("ids must name at least one id")
+    if len(ids) > MAX_LIMIT:
+        raise ValueError(f"at most {MAX_LIMIT} ids can be fetched at once")
+    return ids
+
+def keyset_page(query, sort_column, id_column, cursor, limit, cursor_key, descending=False):
+    """Return (rows, next_cursor) for the page after `cursor`.
+
+    Rows are ordered by (sort_column, id_column) with NULL sort values last, and
+    the page is selected with a WHERE on that key rather than an OFFSET, so every
+    page costs the same. `cursor_key(row)` returns a row's (sort value, id).
+    """
+    if cursor is not None:
+        sort_value, last_id = cursor
+        if sort_value is None:
+            after = and_(sort_column.is_(None), id_column > last_id)
+        else:
+            beyond = sort_column < sort_value if descending else sort_column > sort_value
+            after = or_(beyond, and_(sort_column == sort_value, id_column > last_id), sort_column.is_(None))
+        query = query.filter(after)
+
+    direction = sort_column.desc() if descending else sort_column.asc()
+    rows = query.order_by(direction.nulls_last(), id_column.asc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*cursor_key(rows[-1]))
+    return rows, next_cursor
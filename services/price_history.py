@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+from models import db, Product, PriceHistory
+
+RECORD_BATCH_SIZE = 500
+
+# Bucket widths a series can be downsampled to, and the most buckets an
+# automatically chosen resolution may produce
+RESOLUTIONS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+MAX_POINTS = 500
+DEFAULT_RANGE = timedelta(days=365)
+
+def last_recorded_prices(product_ids):
+    """Return {product id: most recently recorded price} for the products that have history."""
+    latest = db.select(db.func.max(PriceHistory.id)).where(
+        PriceHistory.product_id.in_(product_ids)
+    ).group_by(PriceHistory.product_id)
+    return dict(db.session.execute(
+        db.select(PriceHistory.product_id, PriceHistory.price).where(PriceHistory.id.in_(latest))
+    ).all())
+
+def record_prices(product_ids):
+    """Add a history point for each product whose price differs from its last recorded one.
+
+    Products are read and compared in batches, and each batch's new points go
+    in with one INSERT, so re-saving a product at the same price writes
+    nothing. A product's first point is its price when it is first seen.
+    Writers call it before their commit so the points land in the same
+    transaction as the prices, and send prices_changed with the returned
+    (product id, old price or None, new price) changes once it commits.
+    """
+    product_ids = sorted(set(product_ids))
+    changes = []
+    now = datetime.utcnow()
+    for start in range(0, len(product_ids), RECORD_BATCH_SIZE):
+        batch = product_ids[start:start + RECORD_BATCH_SIZE]
+        current = db.session.execute(
+            db.select(Product.id, Product.product_price).where(Product.id.in_(batch), Product.product_price.isnot(None))
+        ).all()
+        recorded = last_recorded_prices(batch)
+        points = [
+            (product_id, recorded.get(product_id), price)
+            for product_id, price in current if recorded.get(product_id) != price
+        ]
+        if points:
+            db.session.execute(db.insert(PriceHistory), [
+                {"product_id": product_id, "price": price, "recorded_at": now} for product_id, _, price in points
+            ])
+            changes.extend(points)
+    return changes
+
+def _parse_time(value, name):
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+    if moment.tzinfo is not None:  # Stored times are naive UTC
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def parse_series_args(args):
+    """Read `from`, `to` and `resolution` from the query string, raising ValueError on bad input.
+
+    `to` defaults to now and `from` to a year before it; without a resolution
+    the finest one that fits MAX_POINTS buckets is used.
+    """
+    end = _parse_time(args['to'], 'to') if args.get('to') else datetime.utcnow()
+    start = _parse_time(args['from'], 'from') if args.get('from') else end - DEFAULT_RANGE
+    if start >= end:
+        raise ValueError("from must be before to")
+    resolution = args.get('resolution') or choose_resolution(start, end)
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of: {', '.join(RESOLUTIONS)}")
+    return start, end, resolution
+
+def choose_resolution(start, end):
+    """The finest resolution that keeps [start, end) within MAX_POINTS buckets."""
+    for name, width in RESOLUTIONS.items():
+        if (end - start) / width <= MAX_POINTS:
+            return name
+    return 'week'
+
+def _bucket(column, seconds):
+    # Whole buckets since the Unix epoch (weeks therefore start on Thursdays)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return db.cast(db.func.strftime('%s', column), db.Integer) // seconds
+    return db.func.floor(db.extract('epoch', column) / seconds)
+
+def price_series(product_id, start, end, resolution):
+    """Downsample a product's price history in [start, end) to min/max/avg/last per bucket.
+
+    Aggregation happens in one SQL query over the (product_id, recorded_at)
+    index, so only one row per bucket leaves the database however many
+    points were recorded.
+    """
+    seconds = int(RESOLUTIONS[resolution].total_seconds())
+    points = db.select(
+        _bucket(PriceHistory.recorded_at, seconds).label('bucket'),
+        PriceHistory.price,
+        db.func.row_number().over(
+            partition_by=_bucket(PriceHistory.recorded_at, seconds),
+            order_by=(PriceHistory.recorded_at.desc(), PriceHistory.id.desc())
+        ).label('newest')
+    ).where(
+        PriceHistory.product_id == product_id,
+        PriceHistory.recorded_at >= start,
+        PriceHistory.recorded_at < end
+    ).subquery()
+
+    rows = db.session.execute(
+        db.select(
+            points.c.bucket,
+            db.func.min(points.c.price).label('min'),
+            db.func.max(points.c.price).label('max'),
+            db.func.avg(points.c.price).label('avg'),
+            db.func.max(db.case((points.c.newest == 1, points.c.price))).label('last'),
+            db.func.count().label('count')
+        ).group_by(points.c.bucket).order_by(points.c.bucket)
+    ).all()
+
+    epoch = datetime(1970, 1, 1)
+    return [{
+        "bucket": (epoch + timedelta(seconds=int(row.bucket) * seconds)).isoformat(),
+        "min": row.min,
+        "max": row.max,
+        "avg": row.avg,
+        "last": row.last,
+        "count": row.count
+    } for row in rows]
@@ -0,0 +1,99 @@
+import numpy as np
+from sqlalchemy import func
+
+# Criteria a candidate is scored on, in feature-matrix column order
+CRITERIA = ('price', 'rating', 'delivery', 'payment')
+
+# Lower is better for these, higher is better for the rest
+COST_CRITERIA = ('price', 'delivery')
+
+DEFAULT_WEIGHTS = {'price': 1.0, 'rating': 1.0, 'delivery': 0.5, 'payment': 0.0}
+
+def parse_weights(args):
+    """Read ?w_price=&w_rating=&w_delivery=&w_payment= from the query string.
+
+    Returns None when no weight was given (callers keep their usual ordering),
+    otherwise the defaults overridden by the given weights. Raises ValueError
+    on anything that is not a non-negative number.
+    """
+    given = {name: args.get(f'w_{name}') for name in CRITERIA if args.get(f'w_{name}') is not None}
+    if not given:
+        return None
+
+    weights = dict(DEFAULT_WEIGHTS)
+    for name, value in given.items():
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            raise ValueError(f"w_{name} must be a number")
+        if not np.isfinite(weights[name]) or weights[name] < 0:
+            raise ValueError(f"w_{name} must be a non-negative number")
+    if not any(weights.values()):
+        raise ValueError("At least one weight must be positive")
+    return weights
+
+def payment_options(column):
+    """SQL expression counting the comma-separated payment modes in `column` (NULL stays NULL)."""
+    return func.length(column) - func.length(func.replace(column, ',', '')) + 1
+
+def load_features(rows):
+    """Turn (id, price, rating, delivery_cost, payment_options) rows into (ids, features).
+
+    `features` has one row per criterion and one column per candidate, so each
+    criterion is a contiguous array; missing values are NaN.
+    """
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), len(CRITERIA) + 1)
+    return table[:, 0].astype(np.int64), np.ascontiguousarray(table[:, 1:].T)
+
+def normalize(features, starts=None):
+    """Scale every criterion to 0..1 where 1 is best, with missing values scored 0.
+
+    A criterion where every known value is equal scores 1 for all of them.
+    With `starts` (the first column of each group, for columns sorted by
+    group) every group is scaled on its own.
+    """
+    if starts is None:
+        low = np.fmin.reduce(features, axis=1)[:, None]   # fmin/fmax skip NaN
+        high = np.fmax.reduce(features, axis=1)[:, None]
+    else:
+        sizes = np.diff(np.r_[starts, features.shape[1]])
+        low = np.repeat(np.fmin.reduceat(features, starts, axis=1), sizes, axis=1)
+        high = np.repeat(np.fmax.reduceat(features, starts, axis=1), sizes, axis=1)
+    span = high - low
+    spread = span > 0
+
+    scaled = features - low
+    scaled /= np.where(spread, span, 1.0)
+    costs = np.array([name in COST_CRITERIA for name in CRITERIA])
+    # Equal values scale to 0 above; lift them to the top, cost criteria after the flip below
+    scaled += ~spread & ~costs[:, None]
+    scaled[costs] = 1.0 - scaled[costs]
+    return np.nan_to_num(scaled, copy=False, nan=0.0)
+
+def score(features, weights, starts=None):
+    """Weighted mean of the normalized criteria, one score per candidate in 0..1."""
+    vector = np.array([weights.get(name, 0.0) for name in CRITERIA], dtype=np.float64)
+    return (vector / vector.sum()) @ normalize(features, starts)
+
+def top_k(ids, scores, k):
+    """Return the positions of the k best scores, best first (ties broken by lower id).
+
+    argpartition picks the k winners in linear time, so only those k are sorted.
+    """
+    if k < len(scores):
+        cut = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        # Keep everything tied at the cut so the tie-break by id decides who makes it
+        candidates = np.flatnonzero(scores >= cut)
+    else:
+        candidates = np.arange(len(scores))
+    order = np.lexsort((ids[candidates], -scores[candidates]))
+    return candidates[order][:k]
+
+def rank(rows, weights, k):
+    """Score candidate rows (see load_features) and return the best k as (id, score) pairs."""
+    if not rows:
+        return []
+    ids, features = load_features(rows)
+    scores = score(features, weights)
+    best = top_k(ids, scores, k)
+    return list(zip(ids[best].tolist(), scores[best].round(6).tolist()))
@@ -0,0 +1,69 @@
+from flask import current_app
+from models import db, Product, Shop, TableVersion
+from services.cache import make_backend
+from services.serializers import PRODUCT_FIELDS, SHOP_FIELDS, columns, serialize
+from services.signals import products_changed, products_deleted
+from services.versions import table_state
+
+def get_cache():
+    """Return the current app's product/shop payload cache, configured by the RECORD_CACHE_* settings."""
+    cache = current_app.extensions.get('record_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('record_cache', make_backend(current_app.config, 'RECORD_CACHE'))
+    return cache
+
+def _read_through(kind, available, model, ids):
+    """Return {id: payload} for the ids that exist, loading every cache miss with one IN query.
+
+    The load also reads the table's version. A writer that commits between the
+    load and the fill may invalidate before the stale payloads are stored, so
+    once they are, the version is checked again and the fill is undone if it moved.
+    """
+    cache = get_cache()
+    found, missing = {}, []
+    for record_id in dict.fromkeys(ids):
+        payload = cache.get(f"{kind}:{record_id}")
+        if payload is None:
+            missing.append(record_id)
+        else:
+            found[record_id] = payload
+    if missing:
+        table = model.__tablename__
+        version = db.select(TableVersion.version).where(TableVersion.name == table).scalar_subquery()
+        rows = db.session.execute(
+            db.select(*columns(available, available), db.func.coalesce(version, 0).label('table_version'))
+            .where(model.id.in_(missing))
+        ).all()
+        for row in rows:
+            payload = serialize(row, available)
+            cache.set(f"{kind}:{row.id}", payload)
+            found[row.id] = payload
+        if rows and table_state(table)[0][table] != rows[0].table_version:
+            for row in rows:
+                cache.delete(f"{kind}:{row.id}")
+    return found
+
+def get_products(ids):
+    """Serialized products (every field) by id, from the cache where possible."""
+    return _read_through('product', PRODUCT_FIELDS, Product, ids)
+
+def get_product(product_id):
+    return get_products([product_id]).get(product_id)
+
+def get_shop(shop_id):
+    """A serialized shop by id, from the cache where possible."""
+    return _read_through('shop', SHOP_FIELDS, Shop, [shop_id]).get(shop_id)
+
+def invalidate_shop(shop_id):
+    cache = current_app.extensions.get('record_cache')
+    if cache is not None:
+        cache.delete(f"shop:{shop_id}")
+
+# Every product writer (routes, bulk ingest, crawls) sends these
+@products_changed.connect
+@products_deleted.connect
+def _invalidate_products(app, product_ids, **extra):
+    cache = app.extensions.get('record_cache')
+    if cache is not None:
+        for product_id in product_ids:
+            cache.delete(f"product:{product_id}")
@@ -0,0 +1,130 @@
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db, Product, Shop, ShopStats, PriceHistory, ComparisonResult, PriceAlert, AlertNotification
+from services.signals import products_deleted
+from services.versions import bump
+
+# Products handled per statement when deleting, archiving or tombstoning
+BATCH_SIZE = 1000
+
+# A listing is stale once its shop has been crawled this many times without it
+DEFAULT_STALE_CRAWLS = 3
+
+def _product_chunks(criteria, batch_size):
+    """Yield (ids, shop ids) of the products matching `criteria`, a chunk at a time in id order.
+
+    Each chunk is selected by keyset from where the last one ended, so chunks
+    stay cheap however many rows the previous ones deleted or updated.
+    """
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Product.id, Product.shop_id).join(Shop, Shop.id == Product.shop_id)
+            .where(Product.id > last_id, *criteria).order_by(Product.id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield [row.id for row in rows], sorted({row.shop_id for row in rows})
+        last_id = rows[-1].id
+
+def delete_products(product_ids):
+    """Delete products and every row that references them, one DELETE per table.
+
+    Nothing is loaded into the session and nothing is committed.
+    """
+    db.session.execute(db.delete(AlertNotification).where(AlertNotification.product_id.in_(product_ids)))
+    alerts = db.session.execute(db.delete(PriceAlert).where(PriceAlert.product_id.in_(product_ids))).rowcount
+    db.session.execute(db.delete(PriceHistory).where(PriceHistory.product_id.in_(product_ids)))
+    db.session.execute(db.delete(ComparisonResult).where(db.or_(
+        ComparisonResult.product_id.in_(product_ids), ComparisonResult.shop_y_product_id.in_(product_ids)
+    )))
+    db.session.execute(
+        db.delete(Product).where(Product.id.in_(product_ids)).execution_options(synchronize_session=False)
+    )
+    return alerts
+
+def delete_shop(shop_id, batch_size=BATCH_SIZE):
+    """Delete a shop with its products, their price history, alerts and comparisons.
+
+    Products go `batch_size` at a time, each chunk committed and announced
+    with products_deleted, so memory and lock time stay bounded. Returns the
+    number of products deleted.
+    """
+    app = current_app._get_current_object()
+    deleted = 0
+    for product_ids, shop_ids in _product_chunks([Product.shop_id == shop_id], batch_size):
+        alerts = delete_products(product_ids)
+        bump('products', *(['price_alerts'] if alerts else []))
+        db.session.commit()
+        products_deleted.send(app, product_ids=product_ids, shop_ids=shop_ids)
+        deleted += len(product_ids)
+
+    db.session.execute(db.delete(ComparisonResult).where(
+        db.or_(ComparisonResult.shop_x_id == shop_id, ComparisonResult.shop_y_id == shop_id)
+    ))
+    db.session.execute(db.delete(ShopStats).where(ShopStats.shop_id == shop_id))
+    db.session.execute(db.delete(Shop).where(Shop.id == shop_id).execution_options(synchronize_session=False))
+    bump('shops')
+    db.session.commit()
+    return deleted
+
+def tombstone(criteria, batch_size=BATCH_SIZE):
+    """Hide every live product matching `criteria`, `batch_size` rows per UPDATE.
+
+    Tombstoned products keep their rows and price history but drop out of
+    listings, search, comparisons and shop stats; to everything maintained
+    from products they are announced as deleted. Returns how many were hidden.
+    """
+    app = current_app._get_current_object()
+    hidden = 0
+    for product_ids, shop_ids in _product_chunks([Product.tombstoned_at.is_(None), *criteria], batch_size):
+        db.session.execute(
+            db.update(Product).where(Product.id.in_(product_ids))
+            .values(tombstoned_at=datetime.utcnow(), updated_at=Product.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        bump('products')
+        db.session.commit()
+        products_deleted.send(app, product_ids=product_ids, shop_ids=shop_ids)
+        hidden += len(product_ids)
+    return hidden
+
+def archive_shop(shop_id, batch_size=BATCH_SIZE):
+    """Tombstone all of a shop's products; the next crawl that sees them brings them back."""
+    return tombstone([Product.shop_id == shop_id], batch_size)
+
+def tombstone_stale_products(crawls=DEFAULT_STALE_CRAWLS, batch_size=BATCH_SIZE):
+    """Tombstone the products missing from their shop's last `crawls` crawls."""
+    return tombstone([Shop.crawl_count - Product.last_seen_crawl >= crawls], batch_size)
+
+def start_crawl(shop_ids):
+    """Count a new full crawl of each shop. The caller commits."""
+    if shop_ids:
+        db.session.execute(db.update(Shop).where(Shop.id.in_(shop_ids)).values(crawl_count=Shop.crawl_count + 1))
+
+def mark_seen(product_ids):
+    """Record that products were in their shop's latest crawl, reviving tombstoned ones. The caller commits.
+
+    Being seen is not an edit, so updated_at (and with it every ETag) is left alone.
+    """
+    if product_ids:
+        db.session.execute(
+            db.update(Product).where(Product.id.in_(product_ids)).values(
+                last_seen_crawl=db.select(Shop.crawl_count).where(Shop.id == Product.shop_id).scalar_subquery(),
+                tombstoned_at=None,
+                updated_at=Product.updated_at
+            ).execution_options(synchronize_session=False)
+        )
+
+@click.command('tombstone-stale-products')
+@click.option('--crawls', default=None, type=int, help='Crawls a product may be missing from (default TOMBSTONE_AFTER_CRAWLS).')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True, help='Products per UPDATE.')
+@with_appcontext
+def tombstone_stale_products_command(crawls, batch_size):
+    """Hide products their shop's recent crawls no longer list."""
+    if crawls is None:
+        crawls = current_app.config.get('TOMBSTONE_AFTER_CRAWLS', DEFAULT_STALE_CRAWLS)
+    hidden = tombstone_stale_products(crawls, batch_size)
+    click.echo(f"Tombstoned {hidden} products missing from the last {crawls} crawls.")
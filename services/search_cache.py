@@ -0,0 +1,73 @@
+from collections import namedtuple
+from flask import current_app
+from models import db, Product
+from services.cache import make_backend
+from services.fulltext import tokenize
+from services.signals import products_changed, products_deleted
+
+# What a search endpoint computes on a cache miss. `product_ids` are the products
+# the body depends on; `fuzzy` marks results that any new product name could change;
+# `shop_ids` are the shops whose own columns (e.g. the name) the body embeds.
+SearchResult = namedtuple('SearchResult', ['body', 'status', 'product_ids', 'fuzzy', 'shop_ids'], defaults=[False, ()])
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so equivalent queries share an entry."""
+    return ' '.join(query.lower().split())
+
+def make_key(namespace, query, **params):
+    extra = '&'.join(f"{name}={params[name]}" for name in sorted(params) if params[name] is not None)
+    return f"{namespace}:{normalize_query(query)}?{extra}"
+
+def get_cache():
+    """Return the current app's search cache, configured by the SEARCH_CACHE_* settings."""
+    cache = current_app.extensions.get('search_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault('search_cache', make_backend(current_app.config, 'SEARCH_CACHE'))
+    return cache
+
+def cached_search(namespace, query, compute, **params):
+    """Return (body, status) for a search, calling `compute()` only on a cache miss."""
+    cache = get_cache()
+    key = make_key(namespace, query, **params)
+    entry = cache.get(key)
+    if entry is None:
+        result = compute()
+        entry = {"body": result.body, "status": result.status}
+        tags = [f"product:{product_id}" for product_id in result.product_ids]
+        tags += [f"shop:{shop_id}" for shop_id in set(result.shop_ids)]
+        tags += [f"term:{term}" for term in tokenize(query)]
+        if result.fuzzy:
+            tags.append('fuzzy')
+        cache.set(key, entry, tags)
+    return entry["body"], entry["status"]
+
+def invalidate_shop(shop_id):
+    """Drop the searches that embed a shop's details, after it is renamed or moved."""
+    cache = current_app.extensions.get('search_cache')
+    if cache is not None:
+        cache.invalidate_tags([f"shop:{shop_id}"])
+
+def _name_tags(name):
+    # A new or renamed product can start matching any query whose terms are
+    # prefixes of its words, so drop every entry tagged with such a term
+    tags = set()
+    for word in tokenize(name or ''):
+        tags.update(f"term:{word[:end]}" for end in range(1, len(word) + 1))
+    return tags
+
+@products_changed.connect
+def _invalidate_changed_products(app, product_ids, **extra):
+    cache = app.extensions.get('search_cache')
+    if cache is None:
+        return
+    tags = {f"product:{product_id}" for product_id in product_ids}
+    tags.add('fuzzy')
+    for name in db.session.scalars(db.select(Product.product_name).where(Product.id.in_(product_ids))):
+        tags |= _name_tags(name)
+    cache.invalidate_tags(tags)
+
+@products_deleted.connect
+def _invalidate_deleted_products(app, product_ids, **extra):
+    cache = app.extensions.get('search_cache')
+    if cache is not None:
+        cache.invalidate_tags([f"product:{product_id}" for product_id in product_ids])
@@ -0,0 +1,95 @@
+import json
+from datetime import datetime
+from flask import Response
+from models import db, Product, Shop, User
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# What each resource exposes, in response order. Responses are built from
+# these columns alone, so list endpoints select plain row tuples instead of
+# hydrating ORM objects.
+PRODUCT_FIELDS = {
+    'id': Product.id,
+    'product_name': Product.product_name,
+    'product_price': Product.product_price,
+    'product_rating': Product.product_rating,
+    'product_url': Product.product_url,
+    'delivery_cost': Product.delivery_cost,
+    'shop_name': Product.shop_name,
+    'payment_mode': Product.payment_mode,
+    'navigate_link': Product.navigate_link,
+    'shop_id': Product.shop_id,
+    'created_at': Product.created_at,
+    'updated_at': Product.updated_at,
+}
+
+SHOP_FIELDS = {
+    'id': Shop.id,
+    'name': Shop.name,
+    'url': Shop.url,
+}
+
+USER_FIELDS = {
+    'id': User.id,
+    'username': User.username,
+    'email': User.email,
+    'phone_number': User.phone_number,
+    'profile_picture': User.profile_picture,
+    'is_admin': User.is_admin,
+    'created_at': User.created_at,
+}
+
+def parse_fields(args, available, default=None):
+    """Read `?fields=a,b,c`, returning the requested field names in order.
+
+    Falls back to `default` (every available field if None) when the parameter
+    is absent, and raises ValueError naming any field that does not exist.
+    """
+    raw = args.get('fields')
+    if not raw:
+        return tuple(default if default is not None else available)
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if not fields:
+        raise ValueError("fields must name at least one field")
+    return fields
+
+def columns(available, fields, *required):
+    """The columns to select for `fields`, plus any `required` ones (e.g. a sort key) not already among them."""
+    names = list(fields) + [name for name in required if name not in fields]
+    return [available[name].label(name) for name in names]
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def serialize(row, fields):
+    """Build the response dict for one row tuple (or model instance) from `fields`."""
+    return {name: _value(getattr(row, name)) for name in fields}
+
+def serialize_all(rows, fields):
+    return [serialize(row, fields) for row in rows]
+
+def fetch_one(available, fields, *criteria):
+    """Select `fields` of the single row matching `criteria`, or None."""
+    return db.session.execute(db.select(*columns(available, fields)).where(*criteria)).first()
+
+def _default(value):
+    # NumPy scalars (scores, computed costs) that orjson does not take as floats
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(body):
+    """Encode a response body as JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(body, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(body, default=_default, separators=(',', ':'))
+
+def json_response(body, status=200):
+    """A JSON Response like jsonify's, encoded by dumps()."""
+    return Response(dumps(body), status=status, mimetype='application/json')
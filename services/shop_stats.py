@@ -0,0 +1,112 @@
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+from models import db, Product, Shop, ShopStats
+from services.signals import products_changed, products_deleted
+from services.upsert import upsert
+from services.versions import bump
+
+# Columns rewritten when a shop's aggregates change
+TRACKED_COLUMNS = ('products_count', 'min_price', 'avg_price', 'avg_rating', 'last_updated')
+
+REFRESH_BATCH_SIZE = 500
+
+def aggregate(shop_ids):
+    """Compute the stats rows of these shops with one GROUP BY over their live products.
+
+    Shops without any are left out. Returns a dict of shop_stats rows keyed by shop id.
+    """
+    rows = db.session.execute(
+        db.select(
+            Product.shop_id,
+            db.func.count(Product.id).label('products_count'),
+            db.func.min(Product.product_price).label('min_price'),
+            db.func.avg(Product.product_price).label('avg_price'),
+            db.func.avg(Product.product_rating).label('avg_rating'),
+            db.func.max(Product.updated_at).label('last_updated')
+        ).where(Product.shop_id.in_(shop_ids), Product.tombstoned_at.is_(None)).group_by(Product.shop_id)
+    )
+    return {
+        row.shop_id: {
+            "shop_id": row.shop_id,
+            "products_count": row.products_count,
+            "min_price": row.min_price,
+            "avg_price": round(row.avg_price, 2) if row.avg_price is not None else None,
+            "avg_rating": round(row.avg_rating, 2) if row.avg_rating is not None else None,
+            "last_updated": row.last_updated
+        }
+        for row in rows
+    }
+
+def refresh_shop_stats(shop_ids):
+    """Recompute the shop_stats rows of these shops, writing only rows that changed.
+
+    New and changed rows are written with one upsert, so two writers refreshing
+    a shop that has no row yet cannot both try to insert it. Returns the
+    number of rows written.
+    """
+    shop_ids = sorted({shop_id for shop_id in shop_ids if shop_id is not None})
+    written = 0
+    for start in range(0, len(shop_ids), REFRESH_BATCH_SIZE):
+        batch = shop_ids[start:start + REFRESH_BATCH_SIZE]
+        fresh = aggregate(batch)
+        stored = {
+            row.shop_id: row
+            for row in db.session.execute(
+                db.select(ShopStats.shop_id, *[getattr(ShopStats, name) for name in TRACKED_COLUMNS])
+                .where(ShopStats.shop_id.in_(batch))
+            )
+        }
+
+        now = datetime.utcnow()
+        writes = [
+            dict(row, refreshed_at=now) for key, row in fresh.items()
+            if key not in stored or any(getattr(stored[key], name) != row[name] for name in TRACKED_COLUMNS)
+        ]
+        deletes = [key for key in stored if key not in fresh]
+
+        if deletes:
+            db.session.execute(db.delete(ShopStats).where(ShopStats.shop_id.in_(deletes)))
+        if writes:
+            upsert(ShopStats, writes, 'shop_id', (*TRACKED_COLUMNS, 'refreshed_at'))
+        written += len(writes) + len(deletes)
+    if written:
+        # Listings embed these stats, so their ETags must move with them
+        bump('shops')
+    db.session.commit()
+    return written
+
+def get_stats(shop_id):
+    """The stored stats of one shop, zeroed when it has no products."""
+    stats = db.session.get(ShopStats, shop_id)
+    return {
+        "products_count": stats.products_count if stats else 0,
+        "min_price": stats.min_price if stats else None,
+        "avg_price": stats.avg_price if stats else None,
+        "avg_rating": stats.avg_rating if stats else None,
+        "last_updated": stats.last_updated.isoformat() if stats and stats.last_updated else None
+    }
+
+@products_changed.connect
+def _refresh_changed_products(app, product_ids, **extra):
+    refresh_shop_stats(db.session.scalars(
+        db.select(Product.shop_id).where(Product.id.in_(product_ids)).distinct()
+    ).all())
+
+@products_deleted.connect
+def _refresh_deleted_products(app, product_ids, shop_ids=None, **extra):
+    # The rows are gone, so their shops come with the signal; without them every shop is recounted
+    if shop_ids is None:
+        shop_ids = db.session.scalars(db.select(ShopStats.shop_id)).all()
+    refresh_shop_stats(shop_ids)
+
+@click.command('backfill-shop-stats')
+@click.option('--batch-size', default=REFRESH_BATCH_SIZE, show_default=True, help='Shops per batch.')
+@with_appcontext
+def backfill_shop_stats_command(batch_size):
+    """Rebuild shop_stats from the current products."""
+    shop_ids = db.session.scalars(db.select(Shop.id).union(db.select(ShopStats.shop_id))).all()
+    written = 0
+    for start in range(0, len(shop_ids), batch_size):
+        written += refresh_shop_stats(shop_ids[start:start + batch_size])
+    click.echo(f"Refreshed stats for {len(shop_ids)} shops ({written} rows written).")
@@ -0,0 +1,20 @@
+from blinker import Namespace
+
+catalog_signals = Namespace()
+
+# Sent with the current app as sender after product rows are committed.
+# Receivers get the affected ids as `product_ids`; deletions may also pass the
+# deleted products' `shop_ids`.
+products_changed = catalog_signals.signal('products-changed')
+products_deleted = catalog_signals.signal('products-deleted')
+
+# Sent after search history rows are saved, with the raw queries as `queries`.
+searches_recorded = catalog_signals.signal('searches-recorded')
+
+# Sent after products join or leave canonical products (services/matching.py),
+# with the ids of every canonical product whose offers changed as `canonical_product_ids`.
+clusters_changed = catalog_signals.signal('clusters-changed')
+
+# Sent after price history points (services/price_history.py) are committed with their prices, with
+# `changes` as a list of (product id, previous price or None, new price).
+prices_changed = catalog_signals.signal('prices-changed')
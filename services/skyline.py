@@ -0,0 +1,37 @@
+import numpy as np
+
+BLOCK_SIZE = 64
+
+def _dominated(points, by):
+    """For each row of `points`, whether some row of `by` dominates it (all <=, one <)."""
+    if not len(by):
+        return np.zeros(len(points), dtype=bool)
+    at_most = (by[None, :, :] <= points[:, None, :]).all(axis=2)
+    below = (by[None, :, :] < points[:, None, :]).any(axis=2)
+    return (at_most & below).any(axis=1)
+
+def skyline(points, block_size=BLOCK_SIZE):
+    """Return the positions of the non-dominated rows of `points`, every column minimized.
+
+    Sort-filter-skyline over blocks: rows are sorted lexicographically, which
+    no row that dominates another can come after, so the skyline rows of the
+    first block are final. They are then used to discard every later row they
+    dominate in one broadcast comparison before the next block is taken,
+    which empties the candidate list quickly. Missing values should be passed
+    as +inf so they never win.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    order = np.lexsort(points.T[::-1]) if len(points) else np.empty(0, dtype=np.int64)
+    remaining, positions = points[order], order
+
+    keep = []
+    while len(remaining):
+        block, rest = remaining[:block_size], remaining[block_size:]
+        # Dominance is transitive, so a row beaten by any row of its block is out
+        survivors = ~_dominated(block, block)
+        block = block[survivors]
+        keep.append(positions[:block_size][survivors])
+
+        still_in = ~_dominated(rest, block)
+        remaining, positions = rest[still_in], positions[block_size:][still_in]
+    return np.concatenate(keep) if keep else np.empty(0, dtype=np.int64)
@@ -0,0 +1,161 @@
+import heapq
+import threading
+from itertools import groupby
+from bisect import bisect_left, insort
+from flask import current_app
+from sqlalchemy import func
+from models import db, Product, SearchHistory
+from services.signals import products_changed, products_deleted, searches_recorded
+
+def normalize_term(text):
+    return ' '.join((text or '').lower().split())
+
+class SuggestionIndex:
+    """Weighted prefix completion over product names and past search queries.
+
+    Terms live in one sorted list, so the completions for a prefix are a
+    contiguous range found with bisect. Ranges wider than `cache_threshold`
+    keep a ready-made top-k list that weight changes update in place.
+    """
+
+    def __init__(self, k=10, cache_threshold=256, warm_length=3):
+        self.k = k
+        self.cache_threshold = cache_threshold
+        self.warm_length = warm_length
+        self._terms = []          # sorted distinct terms
+        self._weights = {}        # term -> weight
+        self._top = {}            # prefix -> best terms, for wide prefixes only
+        self._product_terms = {}  # product id -> term it contributes to
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, weighted_terms, product_terms, **options):
+        """Build from (text, weight) pairs plus a {product_id: name} map, in one sort."""
+        index = cls(**options)
+        for text, weight in weighted_terms:
+            term = normalize_term(text)
+            if term:
+                index._weights[term] = index._weights.get(term, 0) + weight
+        index._terms = sorted(index._weights)
+        index._product_terms = {product_id: normalize_term(name) for product_id, name in product_terms.items()}
+
+        # Short prefixes are the widest ranges, answer them from a cached list from the start
+        for length in range(1, index.warm_length + 1):
+            for prefix, group in groupby(index._terms, key=lambda term: term[:length]):
+                group = list(group)
+                if len(prefix) == length and len(group) > index.cache_threshold:
+                    index._top[prefix] = heapq.nsmallest(index.k, group, key=index._rank)
+        return index
+
+    def adjust(self, text, delta):
+        """Change a term's weight by `delta`, adding or dropping the term as needed."""
+        term = normalize_term(text)
+        if not term or not delta:
+            return
+        with self._lock:
+            old = self._weights.get(term, 0)
+            new = old + delta
+            if new > 0:
+                self._weights[term] = new
+                if not old:
+                    insort(self._terms, term)
+            else:
+                self._weights.pop(term, None)
+                position = bisect_left(self._terms, term)
+                if position < len(self._terms) and self._terms[position] == term:
+                    del self._terms[position]
+
+            for end in range(1, len(term) + 1):
+                top = self._top.get(term[:end])
+                if top is None:
+                    continue
+                if new > old:
+                    if term not in top:
+                        top.append(term)
+                    top.sort(key=self._rank)
+                    del top[self.k:]
+                elif term in top:
+                    # A lower-weight term may now be beaten by one outside the list
+                    del self._top[term[:end]]
+
+    def set_product(self, product_id, name):
+        """Record a product's current name, moving its weight off any previous name."""
+        with self._lock:
+            previous = self._product_terms.get(product_id)
+            term = normalize_term(name)
+            if previous == term:
+                return
+            if previous:
+                self.adjust(previous, -1)
+            self._product_terms[product_id] = term
+            self.adjust(term, 1)
+
+    def remove_product(self, product_id):
+        with self._lock:
+            previous = self._product_terms.pop(product_id, None)
+            if previous:
+                self.adjust(previous, -1)
+
+    def complete(self, prefix, limit=10):
+        """Return up to `limit` (at most k) completions of `prefix`, heaviest first."""
+        prefix = normalize_term(prefix)
+        if not prefix:
+            return []
+        limit = max(0, min(limit, self.k))
+        with self._lock:
+            top = self._top.get(prefix)
+            if top is None:
+                lo = bisect_left(self._terms, prefix)
+                hi = bisect_left(self._terms, prefix + '\uffff', lo)
+                top = heapq.nsmallest(self.k, self._terms[lo:hi], key=self._rank)
+                if hi - lo > self.cache_threshold:
+                    self._top[prefix] = top
+            return [(term, self._weights[term]) for term in top[:limit]]
+
+    def _rank(self, term):
+        return (-self._weights[term], term)
+
+_build_lock = threading.Lock()
+
+def get_index():
+    """Return the current app's suggestion index, building it on first use."""
+    index = current_app.extensions.get('suggestion_index')
+    if index is None:
+        with _build_lock:
+            index = current_app.extensions.get('suggestion_index')
+            if index is None:
+                products = dict(db.session.execute(
+                    db.select(Product.id, Product.product_name).where(Product.tombstoned_at.is_(None))
+                ).all())
+                queries = db.session.execute(
+                    db.select(SearchHistory.search_query, func.count()).group_by(SearchHistory.search_query)
+                ).all()
+                weighted = [(name, 1) for name in products.values()] + queries
+                index = SuggestionIndex.build(weighted, products)
+                current_app.extensions['suggestion_index'] = index
+    return index
+
+@products_changed.connect
+def _track_changed_products(app, product_ids, **extra):
+    index = app.extensions.get('suggestion_index')
+    if index is None:
+        return
+    rows = db.session.execute(
+        db.select(Product.id, Product.product_name).where(Product.id.in_(product_ids), Product.tombstoned_at.is_(None))
+    )
+    for product_id, name in rows:
+        index.set_product(product_id, name)
+
+@products_deleted.connect
+def _track_deleted_products(app, product_ids, **extra):
+    index = app.extensions.get('suggestion_index')
+    if index is not None:
+        for product_id in product_ids:
+            index.remove_product(product_id)
+
+@searches_recorded.connect
+def _track_recorded_searches(app, queries, **extra):
+    index = app.extensions.get('suggestion_index')
+    if index is not None:
+        for query in queries:
+            index.adjust(query, 1)
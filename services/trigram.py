@@ -0,0 +1,145 @@
+import math
+import re
+import threading
+from collections import defaultdict
+import numpy as np
+from flask import current_app
+from models import db, Product
+from services.signals import products_changed, products_deleted
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def trigrams(text):
+    """Return the set of trigrams for `text`, padding each word like pg_trgm does."""
+    grams = set()
+    for word in WORD_PATTERN.findall((text or '').lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TrigramIndex:
+    """In-memory inverted index from name trigrams to product ids.
+
+    A product matches when it contains at least `threshold` of the query's
+    trigrams, which tolerates typos and missing letters ("samsng galxy").
+    Postings are sorted NumPy arrays so a search is a single vectorized count
+    and single-product updates are an in-place insert or delete.
+    """
+
+    def __init__(self):
+        self._postings = {}  # trigram -> sorted array of product ids
+        self._grams = {}     # product id -> frozenset of trigrams
+        self._sizes = np.zeros(1024, dtype=np.int32)  # product id -> number of trigrams
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._grams)
+
+    @classmethod
+    def build(cls, rows):
+        """Build an index from (product_id, name) rows in one pass."""
+        index = cls()
+        lists = defaultdict(list)
+        for product_id, name in rows:
+            grams = frozenset(trigrams(name))
+            index._grams[product_id] = grams
+            index._set_size(product_id, len(grams))
+            for gram in grams:
+                lists[gram].append(product_id)
+        index._postings = {gram: np.sort(np.array(ids, dtype=np.int64)) for gram, ids in lists.items()}
+        return index
+
+    def _set_size(self, product_id, size):
+        if product_id >= len(self._sizes):
+            self._sizes = np.resize(self._sizes, max(product_id + 1, 2 * len(self._sizes)))
+        self._sizes[product_id] = size
+
+    def add(self, product_id, name):
+        with self._lock:
+            self.remove(product_id)
+            grams = frozenset(trigrams(name))
+            self._grams[product_id] = grams
+            self._set_size(product_id, len(grams))
+            for gram in grams:
+                ids = self._postings.get(gram)
+                if ids is None:
+                    self._postings[gram] = np.array([product_id], dtype=np.int64)
+                else:
+                    self._postings[gram] = np.insert(ids, np.searchsorted(ids, product_id), product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            grams = self._grams.pop(product_id, ())
+            for gram in grams:
+                ids = self._postings[gram]
+                if len(ids) == 1:
+                    del self._postings[gram]
+                else:
+                    self._postings[gram] = np.delete(ids, np.searchsorted(ids, product_id))
+            if grams:
+                self._sizes[product_id] = 0
+
+    def search(self, query, limit=20, threshold=0.5):
+        """Return up to `limit` (product_id, score) pairs, best first."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        required = max(1, math.ceil(threshold * len(query_grams)))
+
+        with self._lock:
+            postings = [self._postings[gram] for gram in query_grams if gram in self._postings]
+            if not postings:
+                return []
+            overlap = np.bincount(np.concatenate(postings))
+            candidates = np.flatnonzero(overlap >= required)
+            if not len(candidates):
+                return []
+            overlap = overlap[candidates]
+            sizes = self._sizes[candidates]
+
+        # Coverage of the query first, then similarity of the whole name
+        coverage = overlap / len(query_grams)
+        similarity = overlap / (len(query_grams) + sizes - overlap)
+        score = coverage + similarity * 1e-3
+        if len(candidates) > limit:
+            top = np.argpartition(-score, limit - 1)[:limit]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((candidates[top], -score[top]))]
+        return [(int(candidates[i]), float(coverage[i])) for i in top]
+
+_build_lock = threading.Lock()
+
+def get_index():
+    """Return the current app's trigram index, building it from the products table on first use."""
+    extensions = current_app.extensions
+    index = extensions.get('trigram_index')
+    if index is None:
+        with _build_lock:
+            index = extensions.get('trigram_index')
+            if index is None:
+                rows = db.session.execute(
+                    db.select(Product.id, Product.product_name).where(Product.tombstoned_at.is_(None))
+                    .execution_options(yield_per=5000)
+                )
+                index = TrigramIndex.build(rows)
+                extensions['trigram_index'] = index
+    return index
+
+@products_changed.connect
+def _index_changed_products(app, product_ids, **extra):
+    index = app.extensions.get('trigram_index')
+    if index is None:
+        return  # Not built yet, it will read the fresh rows when it is
+    rows = db.session.execute(
+        db.select(Product.id, Product.product_name).where(Product.id.in_(product_ids), Product.tombstoned_at.is_(None))
+    )
+    for product_id, name in rows:
+        index.add(product_id, name)
+
+@products_deleted.connect
+def _unindex_deleted_products(app, product_ids, **extra):
+    index = app.extensions.get('trigram_index')
+    if index is not None:
+        for product_id in product_ids:
+            index.remove(product_id)
@@ -0,0 +1,16 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+def upsert(model, rows, key, columns):
+    """Insert `rows`, or overwrite `columns` of those whose `key` column already exists, in one statement.
+
+    Concurrent writers of the same new key cannot race each other into a
+    primary key violation the way a SELECT followed by an INSERT can.
+    """
+    insert = INSERTS[db.session.get_bind().dialect.name](model)
+    db.session.execute(
+        insert.on_conflict_do_update(index_elements=[key], set_={name: insert.excluded[name] for name in columns}),
+        rows
+    )
@@ -0,0 +1,62 @@
+import hashlib
+from datetime import datetime, timezone
+from flask import Response, request
+from models import db, TableVersion
+from services.upsert import INSERTS
+
+def bump(*tables):
+    """Advance the version of each table as part of the caller's transaction.
+
+    One upsert creates the rows of tables not seen before, so concurrent first
+    writes cannot collide. Writers call this right before their own commit:
+    the version rows stay locked until then, and no extra commit is made.
+    """
+    now = datetime.utcnow()
+    insert = INSERTS[db.session.get_bind().dialect.name](TableVersion)
+    db.session.execute(
+        insert.values([{"name": name, "version": 1, "updated_at": now} for name in sorted(set(tables))])
+        .on_conflict_do_update(
+            index_elements=['name'],
+            set_={"version": TableVersion.version + 1, "updated_at": insert.excluded.updated_at}
+        )
+    )
+
+def table_state(*tables):
+    """Return ({table: version}, last modified) for the tables, in one SELECT."""
+    rows = db.session.execute(
+        db.select(TableVersion.name, TableVersion.version, TableVersion.updated_at).where(TableVersion.name.in_(tables))
+    ).all()
+    versions = {name: 0 for name in tables}
+    versions.update({row.name: row.version for row in rows})
+    modified = [row.updated_at for row in rows if row.updated_at is not None]
+    return versions, max(modified) if modified else None
+
+def make_etag(*parts):
+    """A strong ETag for a representation identified by `parts` (versions, ids, query arguments)."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+
+def query_args():
+    """The request's query string in a canonical order, so argument order does not change ETags."""
+    return tuple(sorted(request.args.items(multi=True)))
+
+def _http_date(value):
+    return value.replace(microsecond=0, tzinfo=timezone.utc) if value is not None else None
+
+def is_fresh(etag, last_modified):
+    """Whether the client's cached copy is current: If-None-Match wins over If-Modified-Since."""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return _http_date(last_modified) <= request.if_modified_since
+    return False
+
+def conditional(etag, last_modified, build):
+    """Return 304 when the client is up to date, otherwise `build()`, with validators set on either.
+
+    `build` is only called on a miss, so an unchanged resource is never serialized.
+    """
+    response = Response(status=304) if is_fresh(etag, last_modified) else build()
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    return response
@@ -0,0 +1,152 @@
+import atexit
+import logging
+import queue
+import threading
+from datetime import datetime
+from flask import current_app
+from models import db, ProductSearch
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindWriter:
+    """Write-behind queue for rows of `model` that need not be written inline.
+
+    Requests enqueue a snapshot (a list of rows) and return straight away; a
+    background thread drains the queue and persists whole batches with one
+    multi-row INSERT. When the queue is full new snapshots are dropped and
+    counted rather than blocking the request.
+    """
+
+    model = None
+    name = 'write-behind'
+
+    def __init__(self, app, max_snapshots=10000, batch_size=500, flush_interval=1.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueued = self.dropped = self.written = self.failed = self.batches = 0
+        self._queue = queue.Queue(maxsize=max_snapshots)
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, rows):
+        """Queue one search's rows, returning False if they were dropped."""
+        try:
+            self._queue.put_nowait(rows)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("%s queue full, dropped %d rows (%d snapshots dropped so far)", self.name, len(rows), self.dropped)
+            return False
+        self.enqueued += 1
+        return True
+
+    def flush(self, timeout=0):
+        """Persist one batch of queued rows, waiting up to `timeout` seconds for the first snapshot."""
+        with self._flush_lock:
+            rows = []
+            try:
+                rows.extend(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+                while len(rows) < self.batch_size:
+                    rows.extend(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not rows:
+                return 0
+
+            with self.app.app_context():
+                try:
+                    self.persist(rows)
+                except Exception:
+                    db.session.rollback()
+                    self.failed += len(rows)
+                    logger.exception("%s failed to persist %d rows", self.name, len(rows))
+                    return 0
+            self.written += len(rows)
+            self.batches += 1
+            return len(rows)
+
+    def persist(self, rows):
+        """Write one batch of queued rows and commit; runs in an app context."""
+        db.session.execute(db.insert(self.model), rows)
+        db.session.commit()
+
+    def flush_all(self):
+        """Persist everything currently queued."""
+        while self.flush():
+            pass
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the background thread and persist whatever is still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush_all()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.flush(timeout=self.flush_interval)
+
+class SearchResultWriter(WriteBehindWriter):
+    """Write-behind queue for the ProductSearch rows a logged-in search produces."""
+
+    model = ProductSearch
+    name = 'search-result-writer'
+
+def get_writer():
+    """Return the current app's writer, configured by the SEARCH_WRITE_BEHIND_* settings."""
+    app = current_app._get_current_object()
+    writer = app.extensions.get('search_result_writer')
+    if writer is None:
+        writer = app.extensions.setdefault('search_result_writer', SearchResultWriter(
+            app,
+            max_snapshots=app.config.get('SEARCH_WRITE_BEHIND_QUEUE_SIZE', 10000),
+            batch_size=app.config.get('SEARCH_WRITE_BEHIND_BATCH_SIZE', 500),
+            flush_interval=app.config.get('SEARCH_WRITE_BEHIND_INTERVAL', 1.0)
+        ))
+        if app.config.get('SEARCH_WRITE_BEHIND', True):
+            writer.start()
+    return writer
+
+def save_search_results(user_id, query, results):
+    """Record a logged-in user's search results, in the background unless SEARCH_WRITE_BEHIND is off."""
+    created_at = datetime.utcnow()
+    rows = [{
+        "user_id": user_id,
+        "search_query": query,
+        "query_results": result,
+        "created_at": created_at,
+        "product_id": result["product_id"],
+        "product_name": result["product_name"],
+        "product_price": result["product_price"],
+        "product_rating": result["product_rating"],
+        "product_url": result["product_url"],
+        "delivery_cost": result["delivery_cost"],
+        "shop_name": result["shop_name"],
+        "payment_mode": result["payment_mode"],
+        "shop_id": result["shop_id"]
+    } for result in results]
+
+    writer = get_writer()
+    writer.enqueue(rows)
+    if not current_app.config.get('SEARCH_WRITE_BEHIND', True):
+        writer.flush_all()
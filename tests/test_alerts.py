@@ -0,0 +1,127 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Shop, User, AlertNotification
+from services.alerts import AlertIndex
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+    app.config['ALERT_WRITE_BEHIND'] = False  # Persist notifications inline
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    from views.alerts import alerts_bp
+    app.register_blueprint(product_bp)
+    app.register_blueprint(alerts_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com', is_admin=True),
+            User(username='shopper', email='shopper@example.com'),
+            Shop(name='Jumia', url='https://jumia.co.ke')
+        ])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+def test_index_finds_only_crossed_targets():
+    """Test that a drop triggers the alerts between the new and old price, and a rise none."""
+    index = AlertIndex()
+    for alert_id, target in enumerate([50.0, 80.0, 90.0, 100.0, 120.0], start=1):
+        index.add(alert_id, alert_id, 7, target)
+
+    assert [target for _, _, target in index.triggered(7, 100.0, 80.0)] == [80.0, 90.0]
+    assert index.triggered(7, 80.0, 100.0) == []
+    assert index.triggered(8, 100.0, 10.0) == []
+    assert [target for _, _, target in index.triggered(7, None, 95.0)] == [100.0, 120.0]
+
+    index.remove(2)
+    assert [target for _, _, target in index.triggered(7, 100.0, 80.0)] == [90.0]
+
+def test_price_drop_notifies_watchers_in_one_insert(app, client):
+    """Test that repricing a watched product queues notifications and writes them in one statement."""
+    admin, shopper = headers(app, 1), headers(app, 2)
+    client.post('/products', json={'product_name': 'Phone X', 'product_price': 100.0, 'shop_id': 1})
+    assert client.post('/alerts', json={'product_id': 1, 'target_price': 90.0}, headers=shopper).status_code == 201
+    assert client.post('/alerts', json={'product_id': 1, 'target_price': 95.0}, headers=admin).status_code == 201
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO alert_notifications'):
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        client.put('/products/1', json={'product_price': 85.0}, headers=admin)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert len(statements) == 1
+
+    # Already below both targets: a further drop does not cross them again
+    client.put('/products/1', json={'product_price': 80.0}, headers=admin)
+    with app.app_context():
+        assert AlertNotification.query.count() == 2
+
+    # Browsing the history does not mark anything read
+    assert [n['read'] for n in client.get('/alerts/notifications', headers=shopper).json['notifications']] == [False]
+    notifications = client.get('/alerts/notifications?unread=1', headers=shopper).json['notifications']
+    assert [(n['old_price'], n['new_price'], n['target_price'], n['product_name']) for n in notifications] == [
+        (100.0, 85.0, 90.0, 'Phone X')
+    ]
+    assert client.get('/alerts/notifications?unread=1', headers=shopper).json['notifications'] == []
+
+def test_alerts_follow_creates_moves_and_deletes(app, client):
+    """Test that the index picks up alert changes made through the API."""
+    admin, shopper = headers(app, 1), headers(app, 2)
+    client.post('/products', json={'product_name': 'Phone X', 'product_price': 100.0, 'shop_id': 1})
+    alert_id = client.post('/alerts', json={'product_id': 1, 'target_price': 50.0}, headers=shopper).json['id']
+
+    client.put('/products/1', json={'product_price': 70.0}, headers=admin)
+    assert client.get('/alerts/notifications', headers=shopper).json['notifications'] == []
+
+    # Posting again moves the same alert
+    assert client.post('/alerts', json={'product_id': 1, 'target_price': 80.0}, headers=shopper).json['id'] == alert_id
+    assert [a['target_price'] for a in client.get('/alerts', headers=shopper).json['alerts']] == [80.0]
+    client.put('/products/1', json={'product_price': 90.0}, headers=admin)
+    client.put('/products/1', json={'product_price': 75.0}, headers=admin)
+    assert len(client.get('/alerts/notifications', headers=shopper).json['notifications']) == 1
+
+    assert client.delete(f'/alerts/{alert_id}', headers=admin).status_code == 404  # Someone else's
+    assert client.delete(f'/alerts/{alert_id}', headers=shopper).status_code == 200
+    client.put('/products/1', json={'product_price': 90.0}, headers=admin)
+    client.put('/products/1', json={'product_price': 60.0}, headers=admin)
+    assert len(client.get('/alerts/notifications', headers=shopper).json['notifications']) == 1
+
+def test_alert_validation(app, client):
+    """Test that bad alerts are rejected."""
+    shopper = headers(app, 2)
+    assert client.post('/alerts', json={'product_id': 1}, headers=shopper).status_code == 400
+    assert client.post('/alerts', json={'product_id': 1, 'target_price': 'cheap'}, headers=shopper).status_code == 400
+    assert client.post('/alerts', json={'product_id': 'one', 'target_price': 10}, headers=shopper).status_code == 400
+    assert client.post('/alerts', json={'product_id': [1], 'target_price': 10}, headers=shopper).status_code == 400
+    assert client.post('/alerts', json={'product_id': 99, 'target_price': 10}, headers=shopper).status_code == 404
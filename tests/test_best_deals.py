@@ -0,0 +1,131 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from sqlalchemy import event
+from models import db, Product, Shop, BestDeal
+from services.best_deals import backfill_best_deals_command
+from services.signals import products_changed, products_deleted
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    app.register_blueprint(product_bp)
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+@pytest.fixture
+def offers(app):
+    """One phone listed by three shops under slightly different titles."""
+    with app.app_context():
+        shops = [Shop(name=name, url=f'https://{name.lower()}.example') for name in ['Jumia', 'Kilimall', 'Amazon']]
+        db.session.add_all(shops)
+        db.session.commit()
+        products = [
+            Product(product_name='Samsung Galaxy A15 128GB Black', product_price=18000.0, product_rating=4.1,
+                    delivery_cost=500.0, payment_mode='M-Pesa', shop_id=shops[0].id),
+            Product(product_name='Samsung Galaxy A15 (128 GB) Black', product_price=18200.0, product_rating=4.6,
+                    delivery_cost=0.0, payment_mode='M-Pesa, Card', shop_id=shops[1].id),
+            Product(product_name='SAMSUNG Galaxy A15 128GB, Black', product_price=17500.0, product_rating=None,
+                    delivery_cost=900.0, shop_id=shops[2].id)
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        products_changed.send(app, product_ids=[product.id for product in products])
+
+def test_best_deal_picks_each_winner(client, offers):
+    """Test that the cheapest delivered, top rated and best value offers are reported."""
+    response = client.get('/products/3/best-deal')
+    assert response.status_code == 200
+    deal = response.json
+    assert (deal['offer_count'], deal['shop_count']) == (3, 3)
+    # Amazon has the lowest price, but Kilimall is cheapest once delivery is added
+    assert deal['cheapest']['shop_name'] == 'Kilimall'
+    assert deal['cheapest']['landed_cost'] == 18200.0
+    assert deal['top_rated']['shop_name'] == 'Kilimall'
+    assert deal['best_value']['shop_name'] == 'Kilimall'
+
+    # Any listing of the product leads to the same row
+    assert client.get('/products/1/best-deal').json == deal
+
+def test_unknown_delivery_never_makes_the_cheapest(app, client, offers):
+    """Test that an offer with no delivery cost cannot win on landed cost, unless none is known."""
+    with app.app_context():
+        amazon = db.session.get(Product, 3)
+        amazon.product_price, amazon.delivery_cost = 17000.0, None
+        db.session.commit()
+        products_changed.send(app, product_ids=[3])
+    cheapest = client.get('/products/3/best-deal').json['cheapest']
+    assert (cheapest['shop_name'], cheapest['landed_cost']) == ('Kilimall', 18200.0)
+
+    with app.app_context():
+        for product_id in (1, 2):
+            db.session.get(Product, product_id).delivery_cost = None
+        db.session.commit()
+        products_changed.send(app, product_ids=[1, 2])
+    cheapest = client.get('/products/3/best-deal').json['cheapest']
+    assert (cheapest['shop_name'], cheapest['delivery_cost'], cheapest['landed_cost']) == ('Amazon', None, None)
+
+def test_best_deal_is_one_query(app, client, offers):
+    """Test that serving a best deal is a single SELECT."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        assert client.get('/products/2/best-deal').status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert len(statements) == 1
+
+def test_best_deal_follows_offer_changes(app, client, offers):
+    """Test that price changes and deletions move the winners without a rebuild."""
+    with app.app_context():
+        db.session.get(Product, 1).delivery_cost = 0.0
+        db.session.commit()
+        products_changed.send(app, product_ids=[1])
+    assert client.get('/products/1/best-deal').json['cheapest']['shop_name'] == 'Jumia'
+
+    with app.app_context():
+        db.session.delete(db.session.get(Product, 1))
+        db.session.delete(db.session.get(Product, 2))
+        db.session.commit()
+        products_deleted.send(app, product_ids=[1, 2])
+    deal = client.get('/products/3/best-deal').json
+    assert deal['cheapest']['shop_name'] == 'Amazon'
+    assert deal['top_rated'] is None
+
+def test_backfill_best_deals(app, client, offers):
+    """Test that the backfill command recreates missing rows."""
+    with app.app_context():
+        db.session.execute(db.delete(BestDeal))
+        db.session.commit()
+    assert client.get('/products/1/best-deal').status_code == 404
+
+    result = app.test_cli_runner().invoke(backfill_best_deals_command)
+    assert '1 rows written' in result.output
+    assert client.get('/products/1/best-deal').status_code == 200
@@ -0,0 +1,142 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Product, Shop, User
+from services.signals import products_changed
+from services.versions import bump, table_state
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    from views.shop import shop_bp
+    app.register_blueprint(product_bp)
+    app.register_blueprint(shop_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username='admin', email='admin@example.com', is_admin=True), Shop(name='Jumia', url='https://jumia.co.ke')])
+        db.session.commit()
+        db.session.add_all([Product(product_name=f'Phone {i}', product_price=100.0 + i, shop_id=1) for i in range(2)])
+        bump('products')
+        db.session.commit()
+        products_changed.send(app, product_ids=[1, 2])
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def change_price(app, product_id, price):
+    with app.app_context():
+        db.session.get(Product, product_id).product_price = price
+        bump('products')
+        db.session.commit()
+        products_changed.send(app, product_ids=[product_id])
+
+def test_product_list_answers_304_without_querying_products(app, client):
+    """Test that a matching If-None-Match costs one version lookup and returns no body."""
+    first = client.get('/products')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Last-Modified']
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        cached = client.get('/products', headers={'If-None-Match': etag})
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert cached.status_code == 304
+    assert cached.data == b''
+    assert cached.headers['ETag'] == etag
+    assert len(statements) == 1 and 'table_versions' in statements[0]
+
+    # Different query arguments are a different representation
+    assert client.get('/products?limit=1', headers={'If-None-Match': etag}).status_code == 200
+
+    change_price(app, 2, 90.0)
+    fresh = client.get('/products', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+
+def test_product_etag_follows_its_own_row(app, client):
+    """Test that a product's ETag changes when it does, and not when another product does."""
+    etag = client.get('/products/1').headers['ETag']
+    assert client.get('/products/1', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/products/1?fields=id', headers={'If-None-Match': etag}).status_code == 200
+
+    change_price(app, 2, 90.0)
+    assert client.get('/products/1', headers={'If-None-Match': etag}).status_code == 304
+
+    change_price(app, 1, 80.0)
+    response = client.get('/products/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['product_price'] == 80.0
+
+def test_if_modified_since(client):
+    """Test that Last-Modified can be sent back as If-Modified-Since."""
+    last_modified = client.get('/products/1').headers['Last-Modified']
+    assert client.get('/products/1', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get('/products/1', headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+
+def test_shop_list_changes_with_shop_and_product_writes(app, client):
+    """Test that the shop listing's ETag moves on shop writes and on product writes (its counts)."""
+    etag = client.get('/shops').headers['ETag']
+    assert client.get('/shops', headers={'If-None-Match': etag}).status_code == 304
+
+    change_price(app, 1, 80.0)
+    response = client.get('/shops', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    with app.app_context():
+        token = create_access_token(identity='1')
+    client.post('/shops', json={'name': 'Kilimall', 'url': 'https://kilimall.co.ke'}, headers={'Authorization': f'Bearer {token}'})
+    response = client.get('/shops', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [shop['name'] for shop in response.json] == ['Jumia', 'Kilimall']
+
+def test_bump_is_part_of_the_writers_transaction(app):
+    """Test that bump creates and advances version rows in one statement and never commits itself."""
+    with app.app_context():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            bump('price_alerts', 'products')
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        assert len(statements) == 1 and statements[0].startswith('INSERT INTO table_versions')
+        db.session.rollback()
+
+        versions, _ = table_state('price_alerts', 'products')
+        assert versions == {'price_alerts': 0, 'products': 1}
+        bump('price_alerts', 'products')
+        db.session.commit()
+        assert table_state('price_alerts', 'products')[0] == {'price_alerts': 1, 'products': 2}
@@ -0,0 +1,109 @@
+import csv
+import gzip
+import io
+import pytest
+import pyarrow.parquet as pq
+from click.testing import CliRunner
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from models import db, Product, Shop, User, PriceHistory
+from services.export import ExportStats, export_catalog_command, export_table
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+    app.config['EXPORT_CHUNK_SIZE'] = 2
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.export import export_bp
+    app.register_blueprint(export_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com', is_admin=True),
+            User(username='shopper', email='shopper@example.com'),
+            Shop(name='Jumia', url='https://jumia.co.ke')
+        ])
+        db.session.add_all([
+            Product(product_name=f'Phone {i}', product_price=100.0 + i, shop_id=1, product_url=f'https://jumia.co.ke/{i}')
+            for i in range(5)
+        ])
+        db.session.flush()
+        db.session.add(PriceHistory(product_id=1, price=100.0))
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+def test_export_reads_in_chunks_and_reports_rate(app):
+    """Test that an export yields one encoded piece per chunk and ends with its stats."""
+    with app.app_context():
+        pieces = list(export_table('products', 'csv', chunk_size=2))
+
+    stats = pieces.pop()
+    assert isinstance(stats, ExportStats)
+    assert len(pieces) == 3  # 5 rows in chunks of 2
+    assert stats.rows == 5
+    assert stats.bytes == sum(len(piece) for piece in pieces)
+    assert stats.rows_per_second > 0
+
+    rows = list(csv.DictReader(io.StringIO(b''.join(pieces).decode())))
+    assert [row['product_name'] for row in rows] == [f'Phone {i}' for i in range(5)]
+    assert rows[0]['product_price'] == '100.0'
+
+def test_admin_endpoint_streams_gzipped_csv(app, client):
+    """Test that admins can download a table as gzipped CSV."""
+    response = client.get('/admin/export/products?format=csv.gz', headers=headers(app, 1))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/gzip'
+    assert 'products.csv.gz' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode())))
+    assert len(rows) == 5
+
+def test_admin_endpoint_rejects_bad_requests(app, client):
+    """Test that non-admins, unknown tables and unknown formats are refused."""
+    assert client.get('/admin/export/products', headers=headers(app, 2)).status_code == 403
+    assert client.get('/admin/export/users', headers=headers(app, 1)).status_code == 400
+    assert client.get('/admin/export/products?format=xlsx', headers=headers(app, 1)).status_code == 400
+
+def test_cli_writes_one_file_per_table(app, tmp_path):
+    """Test that flask export-catalog writes each requested table and prints its rate."""
+    runner = CliRunner()
+    with app.app_context():
+        result = runner.invoke(export_catalog_command, [
+            '--table', 'products', '--table', 'price_history', '--format', 'csv', '--output-dir', str(tmp_path)
+        ])
+
+    assert result.exit_code == 0, result.output
+    assert 'products: 5 rows' in result.output
+    assert 'rows/s' in result.output
+    assert (tmp_path / 'price_history.csv').read_text().splitlines()[0] == 'id,product_id,price,recorded_at'
+
+def test_parquet_export_has_a_row_group_per_chunk(app):
+    """Test that parquet exports round-trip and keep chunks as row groups."""
+    with app.app_context():
+        data = b''.join(piece for piece in export_table('products', 'parquet', chunk_size=2) if isinstance(piece, bytes))
+
+    parquet = pq.ParquetFile(io.BytesIO(data))
+    assert parquet.metadata.num_rows == 5
+    assert parquet.metadata.num_row_groups == 3
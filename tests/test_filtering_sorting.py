@@ -0,0 +1,136 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from sqlalchemy import event
+from models import db, Product, Shop, ComparisonResult
+from services.comparison import backfill_comparisons_command, refresh_comparisons
+from services.signals import products_changed, products_deleted
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.filtering_sorting import filter_bp
+    app.register_blueprint(filter_bp)
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+@pytest.fixture
+def offers(app):
+    """The same phone sold by three shops, plus a product only one shop sells."""
+    with app.app_context():
+        shops = [Shop(name=name, url=f'https://{name.lower()}.example') for name in ['Jumia', 'Kilimall', 'Amazon']]
+        db.session.add_all(shops)
+        db.session.commit()
+        db.session.add_all([
+            Product(product_name='Phone X', product_price=100.0, product_rating=4.0, delivery_cost=10.0, shop_id=shops[0].id),
+            Product(product_name='Phone X', product_price=90.0, product_rating=3.5, delivery_cost=30.0, shop_id=shops[1].id),
+            Product(product_name='Phone X', product_price=130.0, product_rating=4.8, delivery_cost=None, shop_id=shops[2].id),
+            # A pricier duplicate listing, ignored in favour of Jumia's cheapest offer
+            Product(product_name='Phone X', product_price=150.0, product_rating=1.0, delivery_cost=0.0, shop_id=shops[0].id),
+            Product(product_name='Phone Case', product_price=5.0, product_rating=4.0, delivery_cost=1.0, shop_id=shops[0].id)
+        ])
+        db.session.commit()
+        products_changed.send(app, product_ids=[1, 2, 3, 4, 5])
+
+def test_filter_sort_compares_every_shop_pair(client, offers):
+    """Test that MB and CB are computed for each pair of shops selling the same product."""
+    response = client.get('/filter_sort?q=phone&sort_by=cb')
+    assert response.status_code == 200
+
+    pairs = {
+        (r['shop_x_name'], r['shop_y_name']): (round(r['marginal_benefit'], 2), r['cost_benefit'])
+        for r in response.json['results']
+    }
+    # Amazon's delivery cost is unknown, so nothing can be said about its landed cost
+    assert pairs == {
+        ('Jumia', 'Kilimall'): (0.5, -10.0),
+        ('Jumia', 'Amazon'): (-0.8, None),
+        ('Kilimall', 'Amazon'): (-1.3, None)
+    }
+    assert [r['cost_benefit'] for r in response.json['results']] == [-10.0, None, None]
+
+    by_mb = client.get('/filter_sort?q=phone&sort_by=mb').json['results']
+    assert [round(r['marginal_benefit'], 2) for r in by_mb] == [0.5, -0.8, -1.3]
+
+def test_filter_sort_reads_without_writing(app, client, offers):
+    """Test that a request is one SELECT against the maintained comparisons, with no INSERTs."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for _ in range(3):
+            assert client.get('/filter_sort?q=phone').status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert len(statements) == 3
+    assert all(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+
+    with app.app_context():
+        assert ComparisonResult.query.count() == 3
+
+def test_comparisons_follow_price_changes(app, client, offers):
+    """Test that a price change rewrites only the pairs involving that offer."""
+    with app.app_context():
+        untouched = db.session.get(ComparisonResult, 1).updated_at
+        kilimall = db.session.get(Product, 2)
+        kilimall.product_price = 70.0
+        db.session.commit()
+        products_changed.send(app, product_ids=[2])
+
+        assert db.session.get(ComparisonResult, 2).updated_at == untouched  # Jumia vs Amazon
+        assert refresh_comparisons(['Phone X']) == 0  # Nothing left to write
+
+    pairs = {(r['shop_x_name'], r['shop_y_name']): r['cost_benefit'] for r in client.get('/filter_sort?q=phone').json['results']}
+    assert pairs == {('Jumia', 'Kilimall'): 10.0, ('Jumia', 'Amazon'): None, ('Kilimall', 'Amazon'): None}
+
+def test_comparisons_drop_deleted_offers(app, client, offers):
+    """Test that deleting an offer removes its pairs."""
+    with app.app_context():
+        db.session.delete(db.session.get(Product, 1))
+        db.session.commit()
+        products_deleted.send(app, product_ids=[1], product_names=['Phone X'])
+
+    # Jumia's other listing takes its place
+    pairs = {(r['shop_x_name'], r['shop_y_name']): r['shop_x_cost'] for r in client.get('/filter_sort?q=phone').json['results']}
+    assert pairs == {('Jumia', 'Kilimall'): 150.0, ('Jumia', 'Amazon'): 150.0, ('Kilimall', 'Amazon'): 90.0}
+
+def test_backfill_rebuilds_comparisons(app, client, offers):
+    """Test that the backfill command recreates the table from the offers."""
+    with app.app_context():
+        db.session.execute(db.delete(ComparisonResult))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(backfill_comparisons_command)
+    assert '3 rows written' in result.output
+    assert len(client.get('/filter_sort?q=phone').json['results']) == 3
+
+def test_filter_sort_without_matches(client, offers):
+    """Test that an unknown product returns 404."""
+    response = client.get('/filter_sort?q=television')
+    assert response.status_code == 404
@@ -0,0 +1,123 @@
+import json
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Product, Shop, User
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+    app.config['PRODUCT_INGEST_BATCH_SIZE'] = 2
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    app.register_blueprint(product_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com', is_admin=True),
+            User(username='shopper', email='shopper@example.com'),
+            Shop(name='Jumia', url='https://jumia.co.ke')
+        ])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity=str(user_id))}'}
+
+def phone(url, price, **fields):
+    return dict({'product_name': 'Phone X', 'product_price': price, 'product_url': url, 'shop_id': 1}, **fields)
+
+def test_bulk_upsert_inserts_updates_and_reports_errors(app, client):
+    """Test that rows are upserted on (shop_id, product_url) with per-row errors."""
+    admin = headers(app, 1)
+    response = client.post('/products/bulk', json=[phone('/x', 100.0), phone('/y', 200.0)], headers=admin)
+    assert response.json['inserted'] == 2
+
+    response = client.post('/products/bulk', headers=admin, json=[
+        phone('/x', 90.0),                      # Price changed
+        phone('/y', 200.0),                     # Same as stored
+        phone('/z', 50.0),                      # New
+        {'product_name': 'No price', 'shop_id': 1},
+        phone('/w', 'cheap'),
+        phone('/v', 10.0, shop_id=99)
+    ])
+    report = response.json
+    assert response.status_code == 200
+    assert (report['received'], report['inserted'], report['updated'], report['unchanged'], report['failed']) == (6, 1, 1, 1, 3)
+    assert [error['row'] for error in report['errors']] == [3, 4, 5]
+    assert 'product_price' in report['errors'][0]['error']
+    assert report['errors'][2]['error'] == 'Unknown shop_id: 99'
+
+    with app.app_context():
+        prices = dict(db.session.execute(db.select(Product.product_url, Product.product_price)).all())
+    assert prices == {'/x': 90.0, '/y': 200.0, '/z': 50.0}
+
+def test_bulk_upsert_reads_ndjson_in_batches(app, client):
+    """Test that NDJSON is streamed and written with one statement per batch, not per row."""
+    lines = [json.dumps(phone(f'/{i}', 100.0 + i)) for i in range(4)] + ['{not json', '']
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO products '):
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.post(
+            '/products/bulk', data='\n'.join(lines), content_type='application/x-ndjson', headers=headers(app, 1)
+        )
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.json['inserted'] == 4
+    assert response.json['errors'][0]['row'] == 5
+    assert response.json['errors'][0]['error'].startswith('Invalid JSON')
+    assert len(statements) == 2  # Two batches of two
+    with app.app_context():
+        assert Product.query.count() == 4
+
+def test_bulk_upsert_requires_admin(app, client):
+    """Test that non-admins cannot import products."""
+    response = client.post('/products/bulk', json=[phone('/x', 1.0)], headers=headers(app, 2))
+    assert response.status_code == 403
+    assert client.post('/products/bulk', json={'product_name': 'x'}, headers=headers(app, 1)).status_code == 400
+
+def test_bulk_upsert_rejects_non_finite_numbers(app, client):
+    """Test that NaN and infinite prices, ratings and delivery costs are row errors, not stored values."""
+    lines = [
+        json.dumps(phone('/nan', 'nan')),
+        '{"product_name": "Phone X", "product_price": NaN, "product_url": "/nan-literal", "shop_id": 1}',
+        json.dumps(phone('/inf', 100.0, product_rating='inf')),
+        '{"product_name": "Phone X", "product_price": 100.0, "delivery_cost": -Infinity, "product_url": "/ninf", "shop_id": 1}',
+        json.dumps(phone('/ok', 100.0))
+    ]
+    response = client.post(
+        '/products/bulk', data='\n'.join(lines), content_type='application/x-ndjson', headers=headers(app, 1)
+    )
+
+    assert (response.json['inserted'], response.json['failed']) == (1, 4)
+    assert [error['error'].split(':')[0] for error in response.json['errors']] == [
+        'Invalid product_price', 'Invalid product_price', 'Invalid product_rating', 'Invalid delivery_cost'
+    ]
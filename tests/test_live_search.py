@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from models import db, Product, Shop
+from services.adapters import ShopAdapter, parse_number
+from services.fanout import LiveSearchEngine
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+def stand_in_shop(fixture=None, delay=0, status=200):
+    """Start a local HTTP server that plays a shop, serving a fixture page for every GET."""
+    body = b''
+    if fixture:
+        with open(os.path.join(FIXTURES, fixture), 'rb') as page:
+            body = page.read()
+
+    class Handler(BaseHTTPRequestHandler):
+        requests = []
+
+        def do_GET(self):
+            Handler.requests.append(self.path)
+            time.sleep(delay)
+            self.send_response(status)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    server.handler = Handler
+    return server
+
+@pytest.fixture
+def shops():
+    """Stand-in servers for the four shops, Alibaba being too slow to answer in time."""
+    servers = {
+        'Jumia': stand_in_shop('jumia_search.html'),
+        'Kilimall': stand_in_shop('kilimall_search.html'),
+        'Amazon': stand_in_shop(status=503),
+        'Alibaba': stand_in_shop('jumia_search.html', delay=1)
+    }
+    yield servers
+    for server in servers.values():
+        server.shutdown()
+
+@pytest.fixture
+def app(shops):
+    """Fixture to set up the Flask application with one Shop row per stand-in server."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+    app.config['LIVE_SEARCH_TIMEOUT'] = 0.3
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.search import search_bp
+    app.register_blueprint(search_bp)
+
+    with app.app_context():
+        db.create_all()
+        for name, server in shops.items():
+            db.session.add(Shop(name=name, url=f'http://127.0.0.1:{server.server_port}/'))
+        db.session.commit()
+
+    yield app
+
+    if 'live_search' in app.extensions:
+        app.extensions['live_search'].close()
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def test_live_search_returns_partial_results(client, shops):
+    """Test that slow and failing shops are reported while the others still answer."""
+    started = time.monotonic()
+    response = client.get('/search/live?q=phone')
+    assert time.monotonic() - started < 0.9
+
+    assert response.status_code == 200
+    statuses = {shop['shop_name']: shop['status'] for shop in response.json['shops']}
+    assert statuses == {'Jumia': 'ok', 'Kilimall': 'ok', 'Amazon': 'error', 'Alibaba': 'timeout'}
+
+    results = response.json['results']
+    assert [(r['shop_name'], r['product_price']) for r in results] == [
+        ('Jumia', 13999), ('Kilimall', 17950.0), ('Jumia', 18499.0)
+    ]
+    galaxy = results[2]
+    assert galaxy['product_rating'] == 4.3
+    assert galaxy['delivery_cost'] == 250.0
+    assert galaxy['payment_mode'] == 'Cash on Delivery, M-Pesa'
+
+    # Every shop was asked through its own search page
+    assert shops['Jumia'].handler.requests == ['/catalog/?q=phone']
+    assert shops['Amazon'].handler.requests == ['/s?k=phone']
+
+def test_live_search_writes_offers_back(client, app):
+    """Test that fresh offers are upserted into products without duplicating rows."""
+    client.get('/search/live?q=phone')
+    client.get('/search/live?q=phone')
+
+    with app.app_context():
+        products = Product.query.order_by(Product.product_price).all()
+        assert [(p.shop_name, p.product_name) for p in products] == [
+            ('Jumia', 'Tecno Spark 20'), ('Kilimall', 'Samsung Galaxy A15'), ('Jumia', 'Samsung Galaxy A15')
+        ]
+        assert products[0].product_url.endswith('/tecno-spark-20.html')
+
+def test_malformed_json_ld_items_are_skipped():
+    """Test that products with fields of the wrong type are dropped instead of failing the page."""
+    adapter = ShopAdapter(Shop(id=1, name='Jumia', url='https://www.jumia.co.ke'))
+    items = [
+        {"@type": "Product", "name": "Tecno Spark 20", "offers": "https://www.jumia.co.ke/offer"},
+        {"@type": "Product", "name": {"en": "Phone"}, "offers": {"price": "100"}},
+        {"@type": "Product", "name": "Phone", "offers": {"price": ["100"]}, "url": 7},
+        {"@type": "ItemList", "itemListElement": 3},
+        {"@type": "Product", "name": "Samsung Galaxy A15", "url": 7, "aggregateRating": "4.5", "offers": {
+            "price": "18,499", "shippingDetails": "free", "acceptedPaymentMethod": ["M-Pesa", {"@id": "card"}]
+        }},
+    ]
+    page = f'<script type="application/ld+json">{json.dumps(items)}</script>'
+
+    assert adapter.parse(page) == [{
+        "product_name": "Samsung Galaxy A15", "product_price": 18499.0, "product_rating": None,
+        "product_url": None, "delivery_cost": None, "payment_mode": "M-Pesa"
+    }]
+
+def test_parse_number_rejects_bools_and_non_finite_values():
+    """Test that JSON-LD true, NaN and Infinity are not taken as prices."""
+    assert parse_number("KSh 1,299.00") == 1299.0
+    assert parse_number(4.5) == 4.5
+    assert parse_number(True) is None
+    assert parse_number(float('nan')) is None
+    assert parse_number(float('inf')) is None
+
+def test_unexpected_adapter_errors_only_fail_their_shop():
+    """Test that an adapter raising something unforeseen is reported as that shop's error."""
+    class BrokenAdapter:
+        shop_id, shop_name = 1, 'Broken'
+
+        async def search(self, session, query):
+            raise AttributeError("'str' object has no attribute 'get'")
+
+    engine = LiveSearchEngine(timeout=1.0)
+    try:
+        [result] = engine.search([BrokenAdapter()], 'phone')
+    finally:
+        engine.close()
+
+    assert (result.status, result.offers) == ('error', [])
+    assert 'attribute' in result.error
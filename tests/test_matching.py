@@ -0,0 +1,169 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from models import db, Product, Shop, CanonicalProduct
+from services.matching import ClusterRefresher, MatchIndex, match_products_command, title_tokens
+from services.signals import products_changed, products_deleted
+from services.versions import bump
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.filtering_sorting import filter_bp
+    app.register_blueprint(filter_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Shop(name='Jumia', url='https://jumia.co.ke'), Shop(name='Amazon', url='https://amazon.com')])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def add_products(app, *listings):
+    """Add (name, price, shop_id) listings with free delivery and announce them like the views do."""
+    with app.app_context():
+        products = [
+            Product(product_name=name, product_price=price, delivery_cost=0.0, shop_id=shop_id)
+            for name, price, shop_id in listings
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        products_changed.send(app, product_ids=[product.id for product in products])
+        return [product.id for product in products]
+
+def canonical_ids(app, product_ids):
+    with app.app_context():
+        return [db.session.get(Product, product_id).canonical_product_id for product_id in product_ids]
+
+def test_title_tokens_normalize_listing_noise():
+    """Test that case, punctuation, units and filler words do not affect the tokens."""
+    assert title_tokens('NEW Samsung Galaxy A15 (128 GB) - Black, Free Shipping') == \
+        frozenset(['samsung', 'galaxy', 'a15', '128gb', 'black'])
+
+def test_match_index_checks_models_and_price():
+    """Test that similar titles match only when model numbers and price band agree."""
+    index = MatchIndex()
+    index.add(1, 'Samsung Galaxy A15 128GB Black', 18000, canonical_id=10)
+
+    assert index.match('SAMSUNG Galaxy A15 (128 GB, Black) Dual SIM', 17500)[0] == 10
+    assert index.match('Samsung Galaxy A25 128GB Black', 18000) is None
+    assert index.match('Samsung Galaxy A15 128GB Black', 180000) is None
+
+def test_listings_from_different_shops_share_a_canonical_product(app):
+    """Test that differently worded listings of one item are clustered, others are not."""
+    ids = add_products(
+        app,
+        ('Samsung Galaxy A15 128GB - Black', 18499.0, 1),
+        ('SAMSUNG Galaxy A15 (128 GB, Black) Dual SIM', 17999.0, 2),
+        ('Tecno Spark 20 128GB', 13999.0, 1)
+    )
+    first, second, third = canonical_ids(app, ids)
+    assert first == second
+    assert third not in (None, first)
+
+    # A later listing joins the existing cluster incrementally
+    [later] = add_products(app, ('Galaxy A15 128GB Black Samsung', 18200.0, 2))
+    assert canonical_ids(app, [later]) == [first]
+
+def test_filter_sort_compares_matched_listings(app, client):
+    """Test that comparisons no longer need identical names across shops."""
+    add_products(
+        app,
+        ('Samsung Galaxy A15 128GB - Black', 18499.0, 1),
+        ('SAMSUNG Galaxy A15 (128 GB, Black) Dual SIM', 17999.0, 2)
+    )
+    response = client.get('/filter_sort?q=galaxy')
+    assert response.status_code == 200
+    [pair] = response.json['results']
+    assert (pair['shop_x_name'], pair['shop_y_name'], pair['cost_benefit']) == ('Jumia', 'Amazon', 500.0)
+
+def test_clusters_follow_renames_and_deletes(app):
+    """Test that a renamed listing leaves its cluster and empty clusters are removed."""
+    ids = add_products(
+        app,
+        ('Samsung Galaxy A15 128GB Black', 18499.0, 1),
+        ('Samsung Galaxy A15 128GB Black', 17999.0, 2)
+    )
+    with app.app_context():
+        product = db.session.get(Product, ids[1])
+        product.product_name = 'Tecno Spark 20 128GB'
+        db.session.commit()
+        products_changed.send(app, product_ids=[ids[1]])
+    first, second = canonical_ids(app, ids)
+    assert first != second
+
+    with app.app_context():
+        db.session.delete(db.session.get(Product, ids[1]))
+        db.session.commit()
+        products_deleted.send(app, product_ids=[ids[1]])
+        assert db.session.get(CanonicalProduct, second) is None
+        assert CanonicalProduct.query.count() == 1
+
+def test_writes_are_matched_in_the_background(app):
+    """Test that with CLUSTER_WRITE_BEHIND a write only queues its products, and a batch's last event wins."""
+    app.config['CLUSTER_WRITE_BEHIND'] = True
+    refresher = app.extensions['cluster_refresher'] = ClusterRefresher(app)  # Flushed by hand, never started
+    ids = add_products(
+        app,
+        ('Samsung Galaxy A15 128GB Black', 18499.0, 1),
+        ('Samsung Galaxy A15 128GB Black', 17999.0, 2)
+    )
+    assert canonical_ids(app, ids) == [None, None]
+    assert refresher.stats()['queued'] == 1
+
+    # Hidden and seen again before the thread got to it
+    with app.app_context():
+        products_deleted.send(app, product_ids=[ids[1]])
+        products_changed.send(app, product_ids=[ids[1]])
+    refresher.flush_all()
+    first, second = canonical_ids(app, ids)
+    assert first == second is not None
+    with app.app_context():
+        assert CanonicalProduct.query.count() == 1
+
+def test_clusters_written_by_another_process_are_matched(app):
+    """Test that the index is reloaded when another worker has assigned canonical products since."""
+    add_products(app, ('Samsung Galaxy A15 128GB Black', 18499.0, 1))
+    with app.app_context():
+        # Another worker matches a listing this process never hears about
+        canonical = CanonicalProduct(name='Tecno Spark 20 128GB')
+        db.session.add(canonical)
+        db.session.flush()
+        db.session.add(Product(product_name='Tecno Spark 20 128GB', product_price=13999.0, shop_id=1, canonical_product_id=canonical.id))
+        bump('canonical_products')
+        db.session.commit()
+        theirs = canonical.id
+
+    [ours] = add_products(app, ('TECNO Spark 20 (128 GB)', 13799.0, 2))
+    assert canonical_ids(app, [ours]) == [theirs]
+    with app.app_context():
+        assert CanonicalProduct.query.count() == 2
+
+def test_match_products_command_reclusters_everything(app):
+    """Test that the command rebuilds the clusters from scratch."""
+    ids = add_products(
+        app,
+        ('Samsung Galaxy A15 128GB Black', 18499.0, 1),
+        ('Samsung Galaxy A15 128GB, Black', 17999.0, 2)
+    )
+    result = app.test_cli_runner().invoke(match_products_command)
+    assert 'Matched 2 products into 1 canonical products' in result.output
+    first, second = canonical_ids(app, ids)
+    assert first == second is not None
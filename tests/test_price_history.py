@@ -0,0 +1,141 @@
+from datetime import datetime
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Product, Shop, User, PriceHistory
+from services.price_history import record_prices
+from services.signals import prices_changed
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    app.register_blueprint(product_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username='admin', email='admin@example.com', is_admin=True), Shop(name='Jumia', url='https://jumia.co.ke')])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+def history(app, product_id):
+    with app.app_context():
+        return db.session.scalars(
+            db.select(PriceHistory.price).where(PriceHistory.product_id == product_id).order_by(PriceHistory.id)
+        ).all()
+
+def test_updates_record_only_real_price_changes(app, client, admin):
+    """Test that creating and repricing a product adds points, and re-saving the same price does not."""
+    changes = []
+
+    def receiver(app, **extra):
+        changes.extend(extra['changes'])
+
+    with prices_changed.connected_to(receiver):
+        client.post('/products', json={'product_name': 'Phone X', 'product_price': 100.0, 'shop_id': 1})
+        client.put('/products/1', json={'product_price': 90.0}, headers=admin)
+        client.put('/products/1', json={'product_price': 90.0}, headers=admin)
+        client.put('/products/1', json={'product_name': 'Phone X (2024)'}, headers=admin)
+
+    assert history(app, 1) == [100.0, 90.0]
+    assert changes == [(1, None, 100.0), (1, 100.0, 90.0)]
+
+def test_bulk_ingest_records_one_insert_per_batch(app, client, admin):
+    """Test that a bulk import writes every batch's history points in one INSERT."""
+    rows = [{'product_name': f'Phone {i}', 'product_price': 100.0 + i, 'product_url': f'/{i}', 'shop_id': 1} for i in range(5)]
+    client.post('/products/bulk', json=rows, headers=admin)
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO price_history'):
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        rows[0]['product_price'] = 50.0
+        rows[3]['product_price'] = 60.0
+        report = client.post('/products/bulk', json=rows, headers=admin).json
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert (report['updated'], report['unchanged']) == (2, 3)
+    assert len(statements) == 1
+    assert history(app, 1) == [100.0, 50.0]
+    assert history(app, 2) == [101.0]
+
+def test_history_is_written_in_the_callers_transaction(app):
+    """Test that recorded points roll back with the price change that caused them."""
+    with app.app_context():
+        product = Product(product_name='Phone X', product_price=100.0, shop_id=1)
+        db.session.add(product)
+        db.session.flush()
+        assert record_prices([product.id]) == [(product.id, None, 100.0)]
+        db.session.rollback()
+        assert PriceHistory.query.count() == 0
+
+def test_deleting_a_product_deletes_its_history(app, client, admin):
+    """Test that a product with history can still be deleted."""
+    client.post('/products', json={'product_name': 'Phone X', 'product_price': 100.0, 'shop_id': 1})
+    assert client.delete('/products/1', headers=admin).status_code == 200
+    with app.app_context():
+        assert PriceHistory.query.count() == 0
+
+def test_price_history_is_downsampled_per_bucket(app, client):
+    """Test that points are aggregated to min/max/avg/last per bucket within the range."""
+    with app.app_context():
+        db.session.add(Product(product_name='Phone X', product_price=80.0, shop_id=1))
+        db.session.add_all([
+            PriceHistory(product_id=1, price=price, recorded_at=datetime.fromisoformat(moment))
+            for moment, price in [
+                ('2026-01-01T08:00:00', 100.0), ('2026-01-01T12:00:00', 80.0), ('2026-01-01T20:00:00', 90.0),
+                ('2026-01-02T09:00:00', 70.0),
+                ('2026-01-05T09:00:00', 60.0)  # Outside the range
+            ]
+        ])
+        db.session.commit()
+
+    response = client.get('/products/1/price-history?from=2026-01-01&to=2026-01-03&resolution=day')
+    assert response.status_code == 200
+    assert response.json['points'] == [
+        {'bucket': '2026-01-01T00:00:00', 'min': 80.0, 'max': 100.0, 'avg': 90.0, 'last': 90.0, 'count': 3},
+        {'bucket': '2026-01-02T00:00:00', 'min': 70.0, 'max': 70.0, 'avg': 70.0, 'last': 70.0, 'count': 1}
+    ]
+
+    hourly = client.get('/products/1/price-history?from=2026-01-01&to=2026-01-03').json
+    assert hourly['resolution'] == 'hour'
+    assert len(hourly['points']) == 4
+    assert client.get('/products/1/price-history?from=2025-01-01&to=2026-01-03').json['resolution'] == 'day'
+
+def test_price_history_rejects_bad_arguments(client):
+    """Test that bad ranges and resolutions are a 400, and unknown products a 404."""
+    assert client.get('/products/1/price-history?from=yesterday').status_code == 400
+    assert client.get('/products/1/price-history?from=2026-02-01&to=2026-01-01').status_code == 400
+    assert client.get('/products/1/price-history?resolution=minute').status_code == 400
+    assert client.get('/products/1/price-history').status_code == 404
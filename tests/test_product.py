@@ -1,9 +1,10 @@
 import sys
 import os
+import json
 import pytest
 from flask import Flask
 from flask_jwt_extended import JWTManager, create_access_token
-from models import db, Product, Shop
+from models import db, Product, Shop, User
 
 # Fix sys.path for module resolution
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
@@ -114,3 +115,118 @@ def test_delete_product(client, init_db, auth_headers):
     response = client.delete('/api/products/1', headers=auth_headers)
     assert response.status_code == 200
     assert b"Product deleted successfully" in response.data
+
+
+def test_search_products_tolerates_typos(client, init_db):
+    """Test that a misspelled query still finds the product."""
+    response = client.get('/api/products/search?query=tst prodct')
+    assert response.status_code == 200
+    assert response.json['products'][0]['product_name'] == 'Test Product'
+
+def test_fuzzy_index_follows_product_writes(client, init_db, auth_headers):
+    """Test that the trigram index picks up products created after it was built."""
+    client.get('/api/products/search?query=anything')  # Builds the index
+    client.post('/api/products', json={
+        'product_name': 'Samsung Galaxy S21',
+        'product_price': 900.0,
+        'shop_id': 1
+    }, headers=auth_headers)
+
+    response = client.get('/api/products/search?query=samsng galxy')
+    assert response.status_code == 200
+    assert [p['product_name'] for p in response.json['products']] == ['Samsung Galaxy S21']
+
+@pytest.fixture
+def admin_headers(app):
+    """Generate a JWT token for an admin user."""
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        access_token = create_access_token(identity=admin.id)
+        return {'Authorization': f'Bearer {access_token}'}
+
+def test_search_cache_follows_price_changes(client, init_db, admin_headers):
+    """Test that a cached search never shows a price older than the latest update."""
+    response = client.get('/api/products/search?query=test')
+    assert response.json['products'][0]['product_price'] == 10.0
+
+    client.put('/api/products/1', json={'product_price': 8.5}, headers=admin_headers)
+
+    response = client.get('/api/products/search?query=test')
+    assert response.json['products'][0]['product_price'] == 8.5
+
+def test_get_all_products_paginates_with_cursor(client, init_db):
+    """Test walking the catalog page by page with next_cursor."""
+    for i in range(4):
+        client.post('/api/products', json={'product_name': f'Extra {i}', 'product_price': 5.0 + i, 'shop_id': 1})
+
+    names, cursor = [], None
+    while True:
+        url = '/api/products?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.json['products']) <= 2
+        names += [p['product_name'] for p in response.json['products']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            break
+
+    assert names == ['Test Product', 'Extra 0', 'Extra 1', 'Extra 2', 'Extra 3']
+
+def test_search_products_paginates_by_price(client, init_db):
+    """Test that search pages follow price order without repeating products."""
+    for price in [30.0, 10.0, 20.0]:
+        client.post('/api/products', json={'product_name': 'Test Gadget', 'product_price': price, 'shop_id': 1})
+
+    first = client.get('/api/products/search?query=test&limit=2').json
+    second = client.get(f"/api/products/search?query=test&limit=2&cursor={first['next_cursor']}").json
+
+    prices = [p['product_price'] for p in first['products'] + second['products']]
+    assert prices == [10.0, 10.0, 20.0, 30.0]
+    assert second['next_cursor'] is None
+
+def test_invalid_cursor_is_rejected(client, init_db):
+    """Test that a malformed cursor returns 400."""
+    response = client.get('/api/products?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+def test_get_all_products_streams_ndjson(client, init_db):
+    """Test that the whole catalog can be streamed as NDJSON."""
+    for i in range(3):
+        client.post('/api/products', json={'product_name': f'Extra {i}', 'product_price': 5.0, 'shop_id': 1})
+
+    for url, headers in [
+        ('/api/products?stream=1', {}),
+        ('/api/products', {'Accept': 'application/x-ndjson'})
+    ]:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert [line['product_name'] for line in lines] == ['Test Product', 'Extra 0', 'Extra 1', 'Extra 2']
+
+def test_search_products_ranks_by_weights(client, init_db):
+    """Test that w_* weights rank candidates by a weighted score instead of by price."""
+    for name, price, rating, delivery in [
+        ('Test Cheap', 5.0, 2.0, 300.0),
+        ('Test Loved', 40.0, 5.0, 0.0),
+        ('Test Middle', 20.0, 4.0, 100.0)
+    ]:
+        client.post('/api/products', json={
+            'product_name': name, 'product_price': price, 'product_rating': rating,
+            'delivery_cost': delivery, 'shop_id': 1
+        })
+
+    by_rating = client.get('/api/products/search?query=test&w_price=0&w_rating=1').json
+    assert [p['product_name'] for p in by_rating['products'][:2]] == ['Test Loved', 'Test Middle']
+    assert by_rating['products'][0]['score'] == 1.0
+    assert by_rating['next_cursor'] is None
+
+    by_price = client.get('/api/products/search?query=test&w_price=1&w_rating=0&w_delivery=0&limit=2').json
+    assert [p['product_name'] for p in by_price['products']] == ['Test Cheap', 'Test Product']
+
+def test_search_products_rejects_bad_weights(client, init_db):
+    """Test that negative or non-numeric weights return 400."""
+    assert client.get('/api/products/search?query=test&w_price=-1').status_code == 400
+    assert client.get('/api/products/search?query=test&w_rating=lots').status_code == 400
@@ -0,0 +1,133 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Product, Shop, User
+from services.versions import bump
+from services.record_cache import get_cache
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+    app.config['RECORD_CACHE_MAX_ENTRIES'] = 3
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    from views.shop import shop_bp
+    app.register_blueprint(product_bp)
+    app.register_blueprint(shop_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username='admin', email='admin@example.com', is_admin=True), Shop(name='Jumia', url='https://jumia.co.ke')])
+        db.session.commit()
+        db.session.add_all([Product(product_name=f'Phone {i}', product_price=100.0 + i, shop_id=1) for i in range(4)])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+def get_with_statements(app, client, url):
+    """Issue a GET and return (response, SQL statements executed)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return response, statements
+
+def cache_stats(app):
+    with app.app_context():
+        return get_cache().stats()
+
+def test_product_reads_are_cached_until_written(app, client, admin):
+    """Test that a repeated product read skips the database and a write invalidates it."""
+    first, statements = get_with_statements(app, client, '/products/1')
+    # The load, then the version check guarding the fill
+    assert first.json['product_price'] == 100.0 and len(statements) == 2
+
+    second, statements = get_with_statements(app, client, '/products/1?fields=product_price')
+    assert second.json == {'product_price': 100.0}
+    assert statements == []
+
+    client.put('/products/1', json={'product_price': 80.0}, headers=admin)
+    assert client.get('/products/1').json['product_price'] == 80.0
+    assert (cache_stats(app)['hits'], cache_stats(app)['misses']) == (1, 2)
+
+def test_multi_get_fills_misses_with_one_query(app, client):
+    """Test that ?ids= serves cached products and loads the rest with one IN query, in request order."""
+    client.get('/products/2')
+    response, statements = get_with_statements(app, client, '/products?ids=3,2,99,1&fields=id,product_name')
+    assert response.json == {
+        'products': [{'id': 3, 'product_name': 'Phone 2'}, {'id': 2, 'product_name': 'Phone 1'}, {'id': 1, 'product_name': 'Phone 0'}],
+        'missing': [99]
+    }
+    product_queries = [statement for statement in statements if 'FROM products' in statement]
+    assert len(product_queries) == 1 and ' IN ' in product_queries[0]
+
+    # A fourth record in a cache of three evicts the least recently used one
+    client.get('/products/4')
+    assert cache_stats(app)['evictions'] == 1
+    _, statements = get_with_statements(app, client, '/products/2')
+    assert len(statements) == 2
+    assert client.get('/products?ids=1,x').status_code == 400
+
+def test_shop_reads_are_cached_until_written(app, client, admin):
+    """Test that the shop detail is cached, lists its products and is invalidated by updates."""
+    response = client.get('/shops/1')
+    assert response.status_code == 200
+    assert [product['name'] for product in response.json['products']] == ['Phone 0', 'Phone 1', 'Phone 2', 'Phone 3']
+
+    client.put('/shops/1', json={'name': 'Jumia Kenya'}, headers=admin)
+    assert client.get('/shops/1').json['name'] == 'Jumia Kenya'
+    assert client.get('/shops/2').status_code == 404
+
+def test_fill_racing_a_write_is_not_kept(app, client):
+    """Test that a payload loaded before a concurrent write commits is not left in the cache."""
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Another request reprices product 1, commits and invalidates between our load and our fill
+        if 'FROM products' in statement and not raced:
+            raced.append(True)
+            with app.app_context():
+                db.session.get(Product, 1).product_price = 80.0
+                bump('products')
+                db.session.commit()
+                get_cache().delete('product:1')
+
+    raced = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    try:
+        assert client.get('/products/1').json['product_price'] == 100.0
+    finally:
+        event.remove(engine, 'after_cursor_execute', after_cursor_execute)
+
+    assert raced
+    assert client.get('/products/1').json['product_price'] == 80.0
@@ -0,0 +1,160 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Product, Shop, User, PriceHistory, PriceAlert, ComparisonResult, ShopStats
+from services import suggest
+from services.retention import tombstone_stale_products
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+    app.config['ALERT_WRITE_BEHIND'] = False
+    app.config['SHOP_DELETE_BATCH_SIZE'] = 2
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    from views.shop import shop_bp
+    app.register_blueprint(product_bp)
+    app.register_blueprint(shop_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com', is_admin=True),
+            Shop(name='Jumia', url='https://jumia.co.ke'),
+            Shop(name='Kilimall', url='https://kilimall.co.ke')
+        ])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+def crawl(client, admin, shop_id, names, partial=False):
+    """Import one crawl of a shop's listings through the bulk endpoint."""
+    rows = [{
+        'product_name': name, 'product_price': 100.0 + i, 'shop_id': shop_id,
+        'product_url': f"https://shop{shop_id}.example/{name.replace(' ', '-').lower()}"
+    } for i, name in enumerate(names)]
+    response = client.post('/products/bulk' + ('?partial=1' if partial else ''), json=rows, headers=admin)
+    assert response.status_code == 200
+
+def count(model, *criteria):
+    return db.session.scalar(db.select(db.func.count()).select_from(model).where(*criteria))
+
+def test_delete_shop_removes_its_rows_in_chunks(app, client, admin):
+    """Test that deleting a shop deletes products, history, alerts and comparisons a chunk at a time."""
+    names = ['Samsung Galaxy A15 128GB', 'Tecno Spark 20 Pro', 'Infinix Hot 40i', 'Oraimo FreePods 4', 'Nokia 105']
+    crawl(client, admin, 1, names)
+    crawl(client, admin, 2, names)
+    with app.app_context():
+        db.session.add(PriceAlert(user_id=1, product_id=1, target_price=50.0))
+        db.session.commit()
+        assert count(ComparisonResult) > 0
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.delete('/shops/1', headers=admin)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    assert response.json['products_deleted'] == 5
+    # Five products in chunks of two, and no whole product row is ever loaded
+    assert len([statement for statement in statements if statement.startswith('DELETE FROM products')]) == 3
+    assert not [statement for statement in statements if 'products.navigate_link' in statement]
+    with app.app_context():
+        assert db.session.get(Shop, 1) is None
+        assert count(Product, Product.shop_id == 1) == 0
+        assert count(PriceHistory) == 5  # Only the other shop's
+        assert count(PriceAlert) == 0
+        assert count(ComparisonResult) == 0
+        assert db.session.get(ShopStats, 1) is None
+    assert client.delete('/shops/1', headers=admin).status_code == 404
+
+def test_products_missing_from_recent_crawls_are_tombstoned(app, client, admin):
+    """Test that listings absent from the last N crawls are hidden, and come back when seen again."""
+    crawl(client, admin, 1, ['Phone A', 'Phone B', 'Phone C'])
+    crawl(client, admin, 1, ['Phone A', 'Phone B'])
+    crawl(client, admin, 1, ['Phone A'], partial=True)  # Not a full crawl, so it counts for nothing
+    with app.app_context():
+        assert tombstone_stale_products(crawls=2) == 0
+    crawl(client, admin, 1, ['Phone A'])
+    with app.app_context():
+        assert db.session.get(Shop, 1).crawl_count == 3
+        assert tombstone_stale_products(crawls=2) == 1  # Phone C, missing from crawls 2 and 3
+        assert tombstone_stale_products(crawls=2) == 0
+
+    listed = [product['product_name'] for product in client.get('/products').json['products']]
+    assert listed == ['Phone A', 'Phone B']
+    assert [product['product_name'] for product in client.get('/products/search?query=phone').json['products']] == listed
+    assert client.get('/shops/1').json['stats']['products_count'] == 2
+    assert client.get('/products/3').status_code == 200  # Hidden, not gone
+
+    crawl(client, admin, 1, ['Phone A', 'Phone B', 'Phone C'])
+    assert len(client.get('/products').json['products']) == 3
+    assert client.get('/shops/1').json['stats']['products_count'] == 3
+
+def test_products_created_after_crawls_are_not_stale(app, client, admin):
+    """Test that a product added by hand counts as seen in its shop's latest crawl."""
+    for _ in range(3):
+        crawl(client, admin, 1, ['Phone A'])
+    response = client.post('/products', json={'product_name': 'Phone B', 'product_price': 150.0, 'shop_id': 1})
+    assert response.status_code == 201
+
+    with app.app_context():
+        assert db.session.get(Product, response.json['id']).last_seen_crawl == 3
+        assert tombstone_stale_products(crawls=3) == 0
+    assert len(client.get('/products').json['products']) == 2
+
+def test_tombstoned_products_are_not_suggested(app, client, admin):
+    """Test that tombstoned names stay out of suggestions, after a rebuild and after an edit."""
+    crawl(client, admin, 1, ['Phone A', 'Phone C'])
+    crawl(client, admin, 1, ['Phone A'])
+    crawl(client, admin, 1, ['Phone A'])
+    with app.app_context():
+        assert tombstone_stale_products(crawls=2) == 1
+        app.extensions.pop('suggestion_index', None)
+        assert [term for term, _ in suggest.get_index().complete('phone')] == ['phone a']
+
+    client.put('/products/2', json={'product_price': 90.0}, headers=admin)
+    with app.app_context():
+        assert [term for term, _ in suggest.get_index().complete('phone')] == ['phone a']
+
+def test_archive_shop_hides_products_but_keeps_history(app, client, admin):
+    """Test that archiving tombstones every product of the shop and keeps their rows."""
+    crawl(client, admin, 1, ['Phone A', 'Phone B', 'Phone C'])
+    response = client.post('/shops/1/archive', headers=admin)
+
+    assert response.json['products_archived'] == 3
+    assert client.get('/products').json['products'] == []
+    assert client.get('/shops/1').json['stats']['products_count'] == 0
+    with app.app_context():
+        assert count(Product, Product.tombstoned_at.isnot(None)) == 3
+        assert count(PriceHistory) == 3
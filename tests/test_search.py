@@ -0,0 +1,307 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Product, Shop, User, ProductSearch
+from services.signals import products_changed
+from services.suggest import SuggestionIndex
+from services.write_behind import SearchResultWriter
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+    app.config['SEARCH_WRITE_BEHIND'] = False  # Persist search results inline
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.search import search_bp
+    from views.Search_history import search_history_bp
+    from views.shop import shop_bp
+    app.register_blueprint(search_bp)
+    app.register_blueprint(search_history_bp)
+    app.register_blueprint(shop_bp)
+
+    with app.app_context():
+        db.create_all()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def seed_products(app, count):
+    """Add `count` phones spread across two shops."""
+    with app.app_context():
+        shops = [Shop(name='Jumia', url='https://jumia.co.ke'), Shop(name='Kilimall', url='https://kilimall.co.ke')]
+        db.session.add_all(shops)
+        db.session.commit()
+        products = [Product(
+            product_name=f'Phone {i}',
+            product_price=100.0 + i,
+            product_rating=4.0,
+            delivery_cost=5.0,
+            shop_name=shops[i % 2].name,
+            shop_id=shops[i % 2].id
+        ) for i in range(count)]
+        db.session.add_all(products)
+        db.session.commit()
+        products_changed.send(app, product_ids=[product.id for product in products])
+
+def count_queries(app, client, url):
+    """Issue a GET and return (response, number of SQL statements executed)."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return response, len(statements)
+
+def test_search_returns_shop_details(client, app):
+    """Test that each result carries the shop selling it."""
+    seed_products(app, 2)
+    response = client.get('/search?q=phone')
+    assert response.status_code == 200
+    results = response.json['results']
+    assert {r['shop_name'] for r in results} == {'Jumia', 'Kilimall'}
+    assert all(r['shop_id'] for r in results)
+
+def test_search_no_results(client, app):
+    """Test searching for a product that does not exist."""
+    seed_products(app, 2)
+    response = client.get('/search?q=laptop')
+    assert response.status_code == 404
+
+def test_search_query_count_is_constant(app, client):
+    """Test that the number of SQL statements does not grow with the result size."""
+    seed_products(app, 3)
+    small_response, small_count = count_queries(app, client, '/search?q=phone')
+
+    seed_products(app, 40)
+    large_response, large_count = count_queries(app, client, '/search?q=phone')
+
+    assert len(small_response.json['results']) == 3
+    assert len(large_response.json['results']) == 43
+    assert small_count == large_count == 1
+
+def test_search_results_are_cached(app, client):
+    """Test that repeating an equivalent query is served without touching the database."""
+    seed_products(app, 3)
+    first, first_count = count_queries(app, client, '/search?q=phone')
+    again, again_count = count_queries(app, client, '/search?q=%20PHONE%20')
+
+    assert first_count == 1
+    assert again_count == 0
+    assert again.json == first.json
+
+def test_search_cache_invalidated_by_new_products(app, client):
+    """Test that a cached empty result is dropped once a matching product arrives."""
+    seed_products(app, 1)
+    assert client.get('/search?q=phone 1').status_code == 404
+
+    seed_products(app, 2)
+    response = client.get('/search?q=phone 1')
+    assert response.status_code == 200
+    assert [r['product_name'] for r in response.json['results']] == ['Phone 1']
+
+def test_search_matches_word_prefixes(client, app):
+    """Test that full-text search matches word prefixes in any order."""
+    with app.app_context():
+        shop = Shop(name='Jumia', url='https://jumia.co.ke')
+        db.session.add(shop)
+        db.session.commit()
+        db.session.add_all([
+            Product(product_name='Samsung Galaxy S21', product_price=900.0, shop_id=shop.id),
+            Product(product_name='Galaxy Buds', product_price=120.0, shop_id=shop.id),
+            Product(product_name='Smartphone Stand', product_price=10.0, shop_id=shop.id)
+        ])
+        db.session.commit()
+
+    response = client.get('/search?q=galaxy sams')
+    assert [r['product_name'] for r in response.json['results']] == ['Samsung Galaxy S21']
+
+    response = client.get('/search?q=GALAX')
+    assert len(response.json['results']) == 2
+
+def test_search_index_follows_renames(client, app):
+    """Test that the full-text index is kept in sync when a product is renamed."""
+    seed_products(app, 1)
+    with app.app_context():
+        product = Product.query.first()
+        product.product_name = 'Laptop Bag'
+        db.session.commit()
+        products_changed.send(app, product_ids=[product.id])
+
+    assert client.get('/search?q=phone').status_code == 404
+    assert client.get('/search?q=laptop').json['results'][0]['product_name'] == 'Laptop Bag'
+
+def test_search_pages_cover_every_result_once(app, client):
+    """Test that following next_cursor visits each result exactly once."""
+    seed_products(app, 5)
+    names, cursor = [], None
+    while True:
+        response = client.get('/search?q=phone&limit=2' + (f'&cursor={cursor}' if cursor else ''))
+        names += [r['product_name'] for r in response.json['results']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(names) == [f'Phone {i}' for i in range(5)]
+
+def test_search_pages_survive_catalog_writes(app, client):
+    """Test that a cursor still resumes in the right place after writes that change match ranks."""
+    seed_products(app, 5)
+    first = client.get('/search?q=phone&limit=2').json
+    assert [r['product_price'] for r in first['results']] == [100.0, 101.0]
+
+    # Longer and more numerous documents shift every bm25 score
+    with app.app_context():
+        db.session.add_all([
+            Product(product_name=f'Phone case for phone model {i} with long description', product_price=500.0 + i, shop_id=1)
+            for i in range(20)
+        ])
+        db.session.commit()
+
+    second = client.get(f"/search?q=phone&limit=3&cursor={first['next_cursor']}").json
+    assert [r['product_price'] for r in second['results']] == [102.0, 103.0, 104.0]
+
+def test_shop_rename_refreshes_cached_searches(app, client):
+    """Test that cached searches and skylines show a shop's new name after it is renamed."""
+    seed_products(app, 2)
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        token = create_access_token(identity=str(admin.id))
+    assert {r['shop_name'] for r in client.get('/search?q=phone').json['results']} == {'Jumia', 'Kilimall'}
+    assert {r['shop_name'] for r in client.get('/search/skyline?q=phone').json['results']} == {'Jumia'}
+
+    client.put('/shops/1', json={'name': 'Jumia Kenya'}, headers={'Authorization': f'Bearer {token}'})
+    assert {r['shop_name'] for r in client.get('/search?q=phone').json['results']} == {'Jumia Kenya', 'Kilimall'}
+    assert {r['shop_name'] for r in client.get('/search/skyline?q=phone').json['results']} == {'Jumia Kenya'}
+
+def test_logged_in_search_saves_results(app, client):
+    """Test that a registered user's results are recorded in product_searches."""
+    seed_products(app, 2)
+    with app.app_context():
+        user = User(username='shopper', email='shopper@example.com')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=user.id)
+
+    response = client.get('/search?q=phone', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+
+    with app.app_context():
+        saved = ProductSearch.query.order_by(ProductSearch.product_id).all()
+        assert [s.product_name for s in saved] == ['Phone 0', 'Phone 1']
+        assert all(s.user_id == user.id and s.search_query == 'phone' for s in saved)
+
+def test_write_behind_queue_is_bounded_and_batched(app):
+    """Test that a full queue drops snapshots and a flush writes them with one statement."""
+    writer = SearchResultWriter(app, max_snapshots=2)
+    row = {"search_query": "phone", "query_results": {}, "product_name": "Phone"}
+    assert writer.enqueue([row, row])
+    assert writer.enqueue([row])
+    assert not writer.enqueue([row])
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        assert writer.flush() == 3
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert len([s for s in statements if s.startswith('INSERT')]) == 1
+    assert writer.stats()["dropped"] == 1
+    with app.app_context():
+        assert ProductSearch.query.count() == 3
+
+def test_suggest_ranks_completions_by_frequency(app, client):
+    """Test that suggestions mix product names and popular queries, heaviest first."""
+    seed_products(app, 2)
+    with app.app_context():
+        user = User(username='shopper', email='shopper@example.com')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client.post('/save-search', json={'search_query': 'Phone  Case', 'user_id': user_id})
+    response = client.get('/search/suggest?prefix=PHO')
+    assert [s['text'] for s in response.json['suggestions']] == ['phone 0', 'phone 1', 'phone case']
+
+    # Searches recorded after the index is built are picked up incrementally
+    client.post('/save-search', json={'search_query': 'phone case', 'user_id': user_id})
+    client.post('/save-search', json={'search_query': 'phone case', 'user_id': user_id})
+    response = client.get('/search/suggest?prefix=phone c&limit=1')
+    assert response.json['suggestions'] == [{'text': 'phone case', 'weight': 3}]
+    assert client.get('/search/suggest?prefix=pho').json['suggestions'][0]['text'] == 'phone case'
+
+def test_suggest_requires_prefix(client):
+    """Test that an empty prefix or a limit below one is rejected."""
+    assert client.get('/search/suggest?prefix=').status_code == 400
+    assert client.get('/search/suggest?prefix=pho&limit=0').status_code == 400
+    assert client.get('/search/suggest?prefix=pho&limit=-1').status_code == 400
+
+def test_suggestion_index_clamps_negative_limits():
+    """Test that a negative limit gives no completions rather than slicing from the end."""
+    index = SuggestionIndex.build([('phone case', 3), ('phone cover', 2)], {})
+    assert index.complete('phone', -1) == []
+    assert index.complete('phone', 1) == [('phone case', 3)]
+
+def test_skyline_keeps_only_undominated_offers(app, client):
+    """Test that the skyline drops offers another offer beats on cost, rating and delivery."""
+    with app.app_context():
+        shop = Shop(name='Jumia', url='https://jumia.co.ke')
+        db.session.add(shop)
+        db.session.commit()
+        products = [
+            Product(product_name='Phone A', product_price=100.0, product_rating=4.0, delivery_cost=10.0, shop_id=shop.id),
+            Product(product_name='Phone B', product_price=120.0, product_rating=4.8, delivery_cost=0.0, shop_id=shop.id),
+            # Dearer, worse rated and dearer to deliver than Phone A
+            Product(product_name='Phone C', product_price=105.0, product_rating=3.9, delivery_cost=20.0, shop_id=shop.id),
+            # The cheapest price, but unrated and with unknown delivery it could cost anything landed
+            Product(product_name='Phone D', product_price=90.0, product_rating=None, delivery_cost=None, shop_id=shop.id),
+            # Unknown delivery too, but nothing is rated higher
+            Product(product_name='Phone E', product_price=95.0, product_rating=5.0, delivery_cost=None, shop_id=shop.id)
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        products_changed.send(app, product_ids=[product.id for product in products])
+
+    response = client.get('/search/skyline?q=phone')
+    assert response.status_code == 200
+    assert response.json['candidates'] == 5
+    assert [r['product_name'] for r in response.json['results']] == ['Phone A', 'Phone B', 'Phone E']
+    assert [r['landed_cost'] for r in response.json['results']] == [110.0, 120.0, None]
+
+    # A dominated offer that gets cheaper joins the front
+    with app.app_context():
+        db.session.get(Product, 3).product_price = 85.0
+        db.session.commit()
+        products_changed.send(app, product_ids=[3])
+    assert 'Phone C' in [r['product_name'] for r in client.get('/search/skyline?q=phone').json['results']]
+
+def test_skyline_requires_query(client):
+    """Test that an empty query is rejected."""
+    assert client.get('/search/skyline?q=').status_code == 400
@@ -0,0 +1,99 @@
+import json
+import numpy as np
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager
+from sqlalchemy import event
+from models import db, Product, Shop
+from services import serializers
+from services.shop_stats import refresh_shop_stats
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    from views.shop import shop_bp
+    app.register_blueprint(product_bp)
+    app.register_blueprint(shop_bp)
+
+    with app.app_context():
+        db.create_all()
+        shops = [Shop(name='Jumia', url='https://jumia.co.ke'), Shop(name='Kilimall', url='https://kilimall.co.ke')]
+        db.session.add_all(shops)
+        db.session.commit()
+        db.session.add_all([
+            Product(product_name=f'Phone {i}', product_price=100.0 + i, shop_name='Jumia', shop_id=shops[0].id)
+            for i in range(3)
+        ])
+        db.session.commit()
+        refresh_shop_stats([shop.id for shop in shops])
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+def test_fields_selects_product_columns(client):
+    """Test that ?fields= limits each product to the requested fields, in order."""
+    response = client.get('/products?fields=product_price,id&limit=2')
+    assert response.status_code == 200
+    assert response.json['products'] == [{'product_price': 100.0, 'id': 1}, {'product_price': 101.0, 'id': 2}]
+    assert list(response.json['products'][0]) == ['product_price', 'id']
+
+    # The cursor still works when its key was not asked for
+    page = client.get(f"/products?fields=product_name&limit=2&cursor={response.json['next_cursor']}").json
+    assert page['products'] == [{'product_name': 'Phone 2'}]
+
+    product = client.get('/products/2?fields=product_name,created_at').json
+    assert set(product) == {'product_name', 'created_at'}
+    assert 'navigate_link' in client.get('/products/2').json
+
+def test_unknown_fields_are_rejected(client):
+    """Test that a field that does not exist is a 400 naming it."""
+    response = client.get('/products?fields=id,password_hash')
+    assert response.status_code == 400
+    assert 'password_hash' in response.json['error']
+    assert client.get('/shops?fields=,').status_code == 400
+
+def test_shop_list_counts_products_in_one_query(app, client):
+    """Test that the shop listing is a single SELECT over shops, with product counts joined from shop_stats."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get('/shops')
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert len([statement for statement in statements if 'FROM shops' in statement]) == 1
+    assert [(shop['name'], shop['products_count']) for shop in response.json] == [('Jumia', 3), ('Kilimall', 0)]
+    assert client.get('/shops?fields=name').json == [{'name': 'Jumia'}, {'name': 'Kilimall'}]
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_dumps_encodes_numpy_scalars(monkeypatch, use_orjson):
+    """Test that NumPy scores encode the same with and without orjson installed."""
+    if use_orjson and serializers.orjson is None:
+        pytest.skip('orjson is not installed')
+    if not use_orjson:
+        monkeypatch.setattr(serializers, 'orjson', None)
+    body = json.loads(serializers.dumps({'score': np.float64(0.5), 'count': np.int64(3)}))
+    assert body == {'score': 0.5, 'count': 3}
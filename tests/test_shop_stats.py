@@ -0,0 +1,124 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from sqlalchemy import event
+from models import db, Shop, ShopStats, User
+from services.shop_stats import refresh_shop_stats
+
+@pytest.fixture
+def app():
+    """Fixture to set up the Flask application and database."""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['JWT_SECRET_KEY'] = 'test_jwt_secret_key'
+
+    db.init_app(app)
+    JWTManager(app)
+
+    from views.product import product_bp
+    from views.shop import shop_bp
+    app.register_blueprint(product_bp)
+    app.register_blueprint(shop_bp)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com', is_admin=True),
+            Shop(name='Jumia', url='https://jumia.co.ke'),
+            Shop(name='Kilimall', url='https://kilimall.co.ke')
+        ])
+        db.session.commit()
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    """Fixture to create a test client."""
+    return app.test_client()
+
+@pytest.fixture
+def admin(app):
+    with app.app_context():
+        return {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+def add_products(client, admin, prices, shop_id=1):
+    for i, price in enumerate(prices):
+        client.post('/products', json={
+            'product_name': f'Phone {i}', 'product_price': price, 'product_rating': 4.0 + i % 2, 'shop_id': shop_id
+        }, headers=admin)
+
+def test_product_writes_refresh_shop_stats(app, client, admin):
+    """Test that creating, repricing and deleting products keeps the shop's aggregates current."""
+    add_products(client, admin, [100.0, 200.0, 300.0])
+    with app.app_context():
+        stats = db.session.get(ShopStats, 1)
+        assert (stats.products_count, stats.min_price, stats.avg_price, stats.avg_rating) == (3, 100.0, 200.0, 4.33)
+        assert db.session.get(ShopStats, 2) is None
+
+    client.put('/products/1', json={'product_price': 50.0}, headers=admin)
+    client.delete('/products/3', headers=admin)
+    with app.app_context():
+        stats = db.session.get(ShopStats, 1)
+        assert (stats.products_count, stats.min_price, stats.avg_price) == (2, 50.0, 125.0)
+        # Nothing changed since, so nothing is rewritten
+        assert refresh_shop_stats([1, 2]) == 0
+
+def test_shop_list_reads_stats_without_touching_products(app, client, admin):
+    """Test that the shop listing joins shop_stats and never queries products."""
+    add_products(client, admin, [100.0, 300.0])
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get('/shops')
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert not [statement for statement in statements if 'FROM products' in statement]
+    jumia, kilimall = response.json
+    assert (jumia['products_count'], jumia['min_price'], jumia['avg_price']) == (2, 100.0, 200.0)
+    assert jumia['last_updated'] is not None
+    assert (kilimall['products_count'], kilimall['min_price']) == (0, None)
+
+def test_shop_detail_pages_through_products(client, admin):
+    """Test that the shop detail includes its stats and lists products a page at a time."""
+    add_products(client, admin, [100.0, 200.0, 300.0])
+
+    first = client.get('/shops/1?limit=2').json
+    assert first['stats']['products_count'] == 3
+    assert [product['id'] for product in first['products']] == [1, 2]
+    second = client.get(f"/shops/1?limit=2&cursor={first['next_cursor']}").json
+    assert [product['id'] for product in second['products']] == [3]
+    assert second['next_cursor'] is None
+    assert client.get('/shops/1?limit=0').status_code == 400
+
+def test_refresh_tolerates_a_concurrent_first_insert(app, client, admin):
+    """Test that a stats row another writer inserted after our read is overwritten, not a duplicate key."""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # Another request creates shop 1's row between our read of shop_stats and our write
+        if statement.startswith('INSERT INTO shop_stats') and not raced:
+            raced.append(True)
+            conn.exec_driver_sql("INSERT INTO shop_stats (shop_id, products_count) VALUES (1, 99)")
+
+    raced = []
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.post('/products', json={'product_name': 'Phone 0', 'product_price': 100.0, 'shop_id': 1})
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert raced and response.status_code == 201
+    with app.app_context():
+        assert db.session.get(ShopStats, 1).products_count == 1
@@ -1,7 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
 from models import db, SearchHistory
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.signals import searches_recorded
 
 search_history_bp = Blueprint('search_history', __name__)
 
@@ -25,6 +26,7 @@ def save_search():
     try:
         db.session.add(new_search)
         db.session.commit()
+        searches_recorded.send(current_app._get_current_object(), queries=[search_query])
         return jsonify({
             "message": "Search history saved successfully",
             "search_query": new_search.search_query,
@@ -4,4 +4,6 @@ from .filtering_sorting import *
 from .shop import *
 from .product import *
 from .search import *
-from .Search_history import *
\ No newline at end of file
+from .Search_history import *
+from .alerts import *
+from .export import *
\ No newline at end of file
@@ -0,0 +1,97 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import db, Product, PriceAlert, AlertNotification
+from services.alerts import delete_alert, set_alert
+from services.serializers import json_response
+
+alerts_bp = Blueprint('alerts', __name__)
+
+# Watch a product: notify me when its price drops to or below target_price
+@alerts_bp.route('/alerts', methods=['POST'])
+@jwt_required()
+def create_alert():
+    data = request.get_json() or {}
+    product_id = data.get('product_id')
+    target_price = data.get('target_price')
+    if product_id is None or target_price is None:
+        return jsonify({"error": "product_id and target_price are required"}), 400
+    try:
+        product_id = int(product_id)
+    except (TypeError, ValueError):
+        return jsonify({"error": "product_id must be an integer"}), 400
+    try:
+        target_price = float(target_price)
+    except (TypeError, ValueError):
+        return jsonify({"error": "target_price must be a number"}), 400
+    if target_price <= 0:
+        return jsonify({"error": "target_price must be positive"}), 400
+    if db.session.get(Product, product_id) is None:
+        return jsonify({"message": "Product not found"}), 404
+
+    alert = set_alert(int(get_jwt_identity()), product_id, target_price)
+    return jsonify({
+        "id": alert.id,
+        "product_id": alert.product_id,
+        "target_price": alert.target_price,
+        "created_at": alert.created_at.isoformat()
+    }), 201
+
+# The current user's alerts with each product's current price
+@alerts_bp.route('/alerts', methods=['GET'])
+@jwt_required()
+def get_alerts():
+    rows = db.session.execute(
+        db.select(
+            PriceAlert.id, PriceAlert.product_id, Product.product_name, Product.product_price,
+            PriceAlert.target_price, PriceAlert.created_at
+        ).join(Product, Product.id == PriceAlert.product_id)
+        .where(PriceAlert.user_id == int(get_jwt_identity())).order_by(PriceAlert.id)
+    ).all()
+    return json_response({"alerts": [{
+        "id": row.id,
+        "product_id": row.product_id,
+        "product_name": row.product_name,
+        "product_price": row.product_price,
+        "target_price": row.target_price,
+        "created_at": row.created_at.isoformat() if row.created_at else None
+    } for row in rows]})
+
+@alerts_bp.route('/alerts/<int:alert_id>', methods=['DELETE'])
+@jwt_required()
+def remove_alert(alert_id):
+    alert = db.session.get(PriceAlert, alert_id)
+    if alert is None or alert.user_id != int(get_jwt_identity()):
+        return jsonify({"message": "Alert not found"}), 404
+    delete_alert(alert)
+    return jsonify({"message": "Alert deleted successfully"}), 200
+
+# Price drops the current user was notified of, newest first; ?unread=1 for new ones only, which are then marked read
+@alerts_bp.route('/alerts/notifications', methods=['GET'])
+@jwt_required()
+def get_notifications():
+    user_id = int(get_jwt_identity())
+    query = db.select(AlertNotification).where(AlertNotification.user_id == user_id)
+    unread_only = request.args.get('unread') == '1'
+    if unread_only:
+        query = query.where(AlertNotification.read_at.is_(None))
+    notifications = db.session.scalars(query.order_by(AlertNotification.id.desc()).limit(100)).all()
+
+    body = {"notifications": [{
+        "id": notification.id,
+        "product_id": notification.product_id,
+        "product_name": notification.product_name,
+        "old_price": notification.old_price,
+        "new_price": notification.new_price,
+        "target_price": notification.target_price,
+        "created_at": notification.created_at.isoformat() if notification.created_at else None,
+        "read": notification.read_at is not None
+    } for notification in notifications]}
+
+    # Browsing the full history leaves new notifications unread
+    unread = [notification.id for notification in notifications if notification.read_at is None]
+    if unread_only and unread:
+        db.session.execute(
+            db.update(AlertNotification).where(AlertNotification.id.in_(unread)).values(read_at=db.func.now())
+        )
+        db.session.commit()
+    return json_response(body)
@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from models import User
+from services.export import CHUNK_SIZE, CONTENT_TYPES, stream_export
+
+export_bp = Blueprint('export', __name__)
+
+# Helper function to check if the user is an admin
+def is_admin():
+    user_id = get_jwt_identity()
+    user = User.query.get(user_id)
+    return user and user.is_admin
+
+# Download a whole table for analytics (Admin only), e.g. /admin/export/products?format=csv.gz
+@export_bp.route('/admin/export/<table>', methods=['GET'])
+@jwt_required()
+def export_table(table):
+    if not is_admin():
+        return jsonify({"error": "Only admins can export tables"}), 403
+
+    file_format = request.args.get('format', 'csv')
+    try:
+        body = stream_export(table, file_format, current_app.config.get('EXPORT_CHUNK_SIZE', CHUNK_SIZE))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+
+    return Response(
+        stream_with_context(body),
+        mimetype=CONTENT_TYPES[file_format],
+        headers={"Content-Disposition": f"attachment; filename={table}.{file_format}"}
+    )
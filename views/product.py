@@ -1,7 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import Product, User, db
+from services.fulltext import ranked_matches
+from services.signals import products_changed, products_deleted, prices_changed
+from services import ranking, trigram
+from services.price_history import parse_series_args, price_series, record_prices
+from services.best_deals import deal_for_product
+from services.ingest import ProductIngest, parse_ndjson
+from services.retention import mark_seen
+from services.search_cache import SearchResult, cached_search
+from services.pagination import keyset_page, parse_ids, parse_page_args
+from services import record_cache
+from services.serializers import PRODUCT_FIELDS, columns, json_response, parse_fields, serialize, serialize_all
+from services.versions import bump, conditional, make_etag, query_args, table_state
 from datetime import datetime
+import json
 
 # Define the Blueprint
 product_bp = Blueprint('product', __name__)
@@ -37,90 +50,234 @@ def add_product():
             created_at=datetime.utcnow()
         )
 
-        # Add the product to the database
+        # Add the product to the database, as seen in its shop's latest crawl so it is not stale on arrival
         db.session.add(new_product)
+        db.session.flush()
+        mark_seen([new_product.id])
+        changes = record_prices([new_product.id])
+        bump('products')
         db.session.commit()
+        products_changed.send(current_app._get_current_object(), product_ids=[new_product.id])
+        if changes:
+            prices_changed.send(current_app._get_current_object(), changes=changes)
 
         # Return the created product as JSON
-        return jsonify({
-            "id": new_product.id,
-            "product_name": new_product.product_name,
-            "product_price": new_product.product_price,
-            "product_rating": new_product.product_rating,
-            "product_url": new_product.product_url,
-            "delivery_cost": new_product.delivery_cost,
-            "shop_name": new_product.shop_name,
-            "payment_mode": new_product.payment_mode,
-            "navigate_link": new_product.navigate_link,
-            "shop_id": new_product.shop_id,
-            "created_at": new_product.created_at.isoformat()
-        }), 201
+        return jsonify(serialize(new_product, PRODUCT_FIELDS)), 201
 
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+def find_products(query, cursor, limit, fields):
+    """Run a product search for one page and return a SearchResult for the cache."""
+    fuzzy = False
+
+    # Cheapest first
+    matches = ranked_matches(query)
+    selected = columns(PRODUCT_FIELDS, fields, 'id', 'product_price')
+    products, next_cursor = keyset_page(
+        db.session.query(*selected).join(matches, matches.c.id == Product.id),
+        Product.product_price, Product.id, cursor, limit,
+        cursor_key=lambda product: (product.product_price, product.id)
+    )
+
+    # Nothing matched word for word, fall back to typo-tolerant trigram matching
+    # (a single page of the closest names)
+    if not products and cursor is None:
+        fuzzy = True
+        hits = trigram.get_index().search(query, limit=limit)
+        if hits:
+            by_id = {
+                product.id: product
+                for product in db.session.query(*selected).filter(Product.id.in_([product_id for product_id, _ in hits]))
+            }
+            products = [by_id[product_id] for product_id, _ in hits if product_id in by_id]
+
+    return SearchResult(
+        {"products": serialize_all(products, fields), "next_cursor": next_cursor}, 200,
+        [product.id for product in products], fuzzy
+    )
+
+def rank_products(query, weights, limit, fields):
+    """Score every matching product on the requested weights and return the best `limit`."""
+    matches = ranked_matches(query)
+    candidates = db.session.execute(
+        db.select(
+            Product.id,
+            Product.product_price,
+            Product.product_rating,
+            Product.delivery_cost,
+            ranking.payment_options(Product.payment_mode)
+        ).join(matches, matches.c.id == Product.id)
+    ).all()
+    best = ranking.rank(candidates, weights, limit)
+
+    scores = dict(best)
+    by_id = {
+        product.id: product
+        for product in db.session.query(*columns(PRODUCT_FIELDS, fields, 'id')).filter(Product.id.in_(scores))
+    }
+    products_list = [dict(serialize(by_id[product_id], fields), score=score) for product_id, score in best]
+
+    # Ranked results are a single top-k page
+    return SearchResult(
+        {"products": products_list, "next_cursor": None, "weights": weights}, 200,
+        list(scores)
+    )
+
+# Bulk create or update products (Admin only).
+# Takes a JSON array, or NDJSON (one product per line) sent as application/x-ndjson;
+# rows are upserted on (shop_id, product_url) and errors reported by array index or line number.
+# Each import counts as a full crawl of its shops unless sent with ?partial=1
+@product_bp.route('/products/bulk', methods=['POST'])
+@jwt_required()
+def bulk_upsert_products():
+    if not is_admin():
+        return jsonify({"message": "Only admins can import products"}), 403
+
+    ingest = ProductIngest(
+        batch_size=current_app.config.get('PRODUCT_INGEST_BATCH_SIZE', 1000),
+        crawl=request.args.get('partial') not in ('1', 'true')
+    )
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        # Read line by line so a large crawl is never held in memory whole
+        lines = (line.decode('utf-8', errors='replace') for line in request.stream)
+        for number, raw, error in parse_ndjson(lines):
+            ingest.add(number, raw, error)
+    else:
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({"error": "Expected a JSON array of products"}), 400
+        for index, raw in enumerate(data):
+            ingest.add(index, raw)
+
+    return jsonify(ingest.finish()), 200
+
 @product_bp.route('/products/search', methods=['GET'])
 def search_products():
     query = request.args.get('query', '').strip().lower()
     if not query:
         return jsonify({"message": "No search query provided"}), 400
 
-    products = Product.query.filter(Product.product_name.ilike(f"%{query}%")).order_by(Product.product_price.asc()).all()
+    try:
+        cursor, limit = parse_page_args(request.args)
+        weights = ranking.parse_weights(request.args)
+        fields = parse_fields(request.args, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # ?w_price=&w_rating=&w_delivery=&w_payment= ranks by a weighted score instead of by price
+    if weights is not None:
+        if cursor is not None:
+            return jsonify({"error": "cursor cannot be combined with ranking weights"}), 400
+        body, status = cached_search(
+            'products:ranked', query, lambda: rank_products(query, weights, limit, fields),
+            limit=limit, fields=','.join(fields), **{f"w_{name}": weight for name, weight in weights.items()}
+        )
+        return json_response(body, status)
+
+    body, status = cached_search(
+        'products', query, lambda: find_products(query, cursor, limit, fields),
+        cursor=request.args.get('cursor'), limit=limit, fields=','.join(fields)
+    )
+    return json_response(body, status)
+
+def wants_stream():
+    """True when the client asked for NDJSON via ?stream=1 or the Accept header."""
+    if request.args.get('stream') == '1':
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
 
-    products_list = [{
-        "id": product.id,
-        "product_name": product.product_name,
-        "product_price": product.product_price,
-        "product_rating": product.product_rating,
-        "product_url": product.product_url,
-        "delivery_cost": product.delivery_cost,
-        "shop_name": product.shop_name,
-        "payment_mode": product.payment_mode,
-        "created_at": product.created_at.isoformat() if product.created_at else None
-    } for product in products]
+def stream_products(fields):
+    """Yield the whole catalog as NDJSON, one product per line.
 
-    return jsonify(products_list), 200
+    Rows come from a server-side cursor in batches and are serialized one at a
+    time, so worker memory stays flat however large the catalog is.
+    """
+    rows = db.session.execute(
+        db.select(*columns(PRODUCT_FIELDS, fields)).where(Product.tombstoned_at.is_(None))
+        .order_by(Product.id).execution_options(stream_results=True, yield_per=1000)
+    )
+    for row in rows:
+        yield json.dumps(serialize(row, fields)) + "\n"
 
 # Fetch all products (Public access)
 @product_bp.route('/products', methods=['GET'])
 def get_all_products():
-    products = Product.query.all()
-    products_list = []
-    for product in products:
-        products_list.append({
-            "id": product.id,
-            "product_name": product.product_name,
-            "product_price": product.product_price,
-            "product_rating": product.product_rating,
-            "product_url": product.product_url,
-            "delivery_cost": product.delivery_cost,
-            "shop_name": product.shop_name,
-            "payment_mode": product.payment_mode,
-            "navigate_link": product.navigate_link,  # Include navigate_link
-            "created_at": product.created_at.isoformat() if product.created_at else None
-        })
-    return jsonify(products_list), 200
+    try:
+        fields = parse_fields(request.args, PRODUCT_FIELDS)
+        if wants_stream():
+            return Response(stream_with_context(stream_products(fields)), mimetype='application/x-ndjson')
+        cursor, limit = parse_page_args(request.args)
+        ids = parse_ids(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        if ids is not None:
+            # ?ids=1,2,3: cached products, with every miss loaded by one IN query
+            by_id = record_cache.get_products(ids)
+            return json_response({
+                "products": [{name: by_id[product_id][name] for name in fields} for product_id in ids if product_id in by_id],
+                "missing": [product_id for product_id in ids if product_id not in by_id]
+            })
+
+        products, next_cursor = keyset_page(
+            db.session.query(*columns(PRODUCT_FIELDS, fields, 'id')).filter(Product.tombstoned_at.is_(None)),
+            Product.id, Product.id, cursor, limit,
+            cursor_key=lambda product: (product.id, product.id)
+        )
+        return json_response({"products": serialize_all(products, fields), "next_cursor": next_cursor})
+
+    # Any product write bumps the table version, so an unchanged catalog is answered without querying it
+    versions, last_modified = table_state('products')
+    return conditional(make_etag('products', versions, query_args()), last_modified, build)
 
 # Fetch a single product by ID (Public access)
 @product_bp.route('/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
-    product = Product.query.get(product_id)
+    try:
+        fields = parse_fields(request.args, PRODUCT_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    product = record_cache.get_product(product_id)
     if product:
-        return jsonify({
-            "id": product.id,
-            "product_name": product.product_name,
-            "product_price": product.product_price,
-            "product_rating": product.product_rating,
-            "product_url": product.product_url,
-            "delivery_cost": product.delivery_cost,
-            "shop_name": product.shop_name,
-            "payment_mode": product.payment_mode,
-            "created_at": product.created_at.isoformat() if product.created_at else None
-        }), 200
+        updated_at = product['updated_at']
+        etag = make_etag('product', product_id, updated_at, fields)
+        last_modified = datetime.fromisoformat(updated_at) if updated_at else None
+        return conditional(etag, last_modified, lambda: json_response({name: product[name] for name in fields}))
     else:
         return jsonify({"message": "Product not found"}), 404
 
+# Where a product is cheapest delivered, best rated and best value across shops
+@product_bp.route('/products/<int:product_id>/best-deal', methods=['GET'])
+def get_best_deal(product_id):
+    deal = deal_for_product(product_id)
+    if deal is None:
+        return jsonify({"message": "No deals found for this product"}), 404
+    return jsonify(deal), 200
+
+# Price history downsampled to min/max/avg/last per bucket (Public access).
+# ?from=&to= take ISO dates (default: the last year); ?resolution= is hour, day or week
+@product_bp.route('/products/<int:product_id>/price-history', methods=['GET'])
+def get_price_history(product_id):
+    try:
+        start, end, resolution = parse_series_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if db.session.get(Product, product_id) is None:
+        return jsonify({"message": "Product not found"}), 404
+
+    return json_response({
+        "product_id": product_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "resolution": resolution,
+        "points": price_series(product_id, start, end, resolution)
+    })
+
 # Update a product (Admin only)
 @product_bp.route('/products/<int:product_id>', methods=['PUT'])
 @jwt_required()
@@ -157,20 +314,16 @@ def update_product(product_id):
     if payment_mode:
         product.payment_mode = payment_mode
 
+    db.session.flush()
+    changes = record_prices([product.id])
+    bump('products')
     db.session.commit()
+    products_changed.send(current_app._get_current_object(), product_ids=[product.id])
+    if changes:
+        prices_changed.send(current_app._get_current_object(), changes=changes)
     return jsonify({
         "message": "Product updated successfully",
-        "product": {
-            "id": product.id,
-            "product_name": product.product_name,
-            "product_price": product.product_price,
-            "product_rating": product.product_rating,
-            "product_url": product.product_url,
-            "delivery_cost": product.delivery_cost,
-            "shop_name": product.shop_name,
-            "payment_mode": product.payment_mode,
-            "created_at": product.created_at.isoformat() if product.created_at else None
-        }
+        "product": serialize(product, PRODUCT_FIELDS)
     }), 200
 
 # Delete a product (Admin only)
@@ -184,6 +337,10 @@ def delete_product(product_id):
     if not product:
         return jsonify({"message": "Product not found"}), 404
 
+    shop_id = product.shop_id
     db.session.delete(product)
+    db.session.flush()
+    bump('products')
     db.session.commit()
+    products_deleted.send(current_app._get_current_object(), product_ids=[product_id], shop_ids=[shop_id])
     return jsonify({"message": "Product deleted successfully"}), 200
\ No newline at end of file
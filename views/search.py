@@ -1,9 +1,63 @@
+import numpy as np
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Product, Shop, ProductSearch, User
+from models import db, Product, Shop
+from services.fulltext import ranked_matches
+from services.search_cache import SearchResult, cached_search
+from services.pagination import keyset_page, parse_page_args
+from services.write_behind import save_search_results
+from services import suggest
+from services.fanout import live_search
+from services.skyline import skyline
 
 search_bp = Blueprint('search', __name__)
 
+def find_offers(query, cursor, limit):
+    """Run the search query for one page and return a SearchResult for the cache."""
+    # Fetch every matching product together with the shop selling it in a single SELECT,
+    # projecting only the columns we return so no ORM objects are hydrated per row
+    matches = ranked_matches(query)
+    offers = db.session.query(
+        Product.id,
+        Product.product_name,
+        Product.product_price,
+        Product.product_rating,
+        Product.product_url,
+        Product.delivery_cost,
+        Product.payment_mode,
+        Shop.id.label('shop_id'),
+        Shop.name.label('shop_name')
+    ).join(matches, matches.c.id == Product.id).join(
+        Shop, Shop.id == Product.shop_id
+    )
+    # Cheapest first. A match's rank depends on the rest of the catalog (bm25 and
+    # ts_rank statistics), so it would move between pages; a price only moves with its row
+    rows, next_cursor = keyset_page(
+        offers, Product.product_price, Product.id, cursor, limit,
+        cursor_key=lambda row: (row.product_price, row.id)
+    )
+
+    if not rows and cursor is None:
+        return SearchResult({"message": "No products found."}, 404, [])
+
+    # Structuring the search results
+    search_results = [{
+        "product_id": row.id,
+        "product_name": row.product_name,
+        "product_price": row.product_price,
+        "product_rating": row.product_rating,
+        "product_url": row.product_url,
+        "delivery_cost": row.delivery_cost,
+        "shop_name": row.shop_name,
+        "payment_mode": row.payment_mode,
+        "shop_id": row.shop_id
+    } for row in rows]
+
+    return SearchResult(
+        {"results": search_results, "next_cursor": next_cursor}, 200, [row.id for row in rows],
+        shop_ids=[row.shop_id for row in rows]
+    )
+
 @search_bp.route('/search', methods=['GET'])
 @jwt_required(optional=True)  # Allows both authenticated and non-authenticated users
 def search_products():
@@ -13,53 +67,121 @@ def search_products():
     if not query:
         return jsonify({"error": "Please provide a search query."}), 400
 
-    # Fetch all products that match the search query
-    products = Product.query.filter(Product.product_name.ilike(f"%{query}%")).all()
-
-    if not products:
-        return jsonify({"message": "No products found."}), 404
-
-    search_results = []
-
-    for product in products:
-        # Fetch all shops selling this product
-        shops_selling_product = Shop.query.join(Product).filter(Product.id == product.id).all()
-
-        for shop in shops_selling_product:
-            shop_product = Product.query.filter_by(id=product.id, shop_id=shop.id).first()
-
-            if not shop_product:
-                continue  # Skip if shop-specific product details are missing
-
-            # Structuring the search result
-            product_data = {
-                "product_name": product.product_name,
-                "product_price": shop_product.product_price,
-                "product_rating": shop_product.product_rating,
-                "product_url": shop_product.product_url,
-                "delivery_cost": shop_product.delivery_cost,
-                "shop_name": shop.name,
-                "payment_mode": shop_product.payment_mode,
-                "shop_id": shop.id
-            }
-
-            search_results.append(product_data)
-
-            # **Save search result only for registered users**
-            if current_user_id:
-                search_entry = ProductSearch(
-                    user_id=current_user_id,  # Associate search history with the logged-in user
-                    product_name=product.product_name,
-                    product_price=shop_product.product_price,
-                    product_rating=shop_product.product_rating,
-                    product_url=shop_product.product_url,
-                    delivery_cost=shop_product.delivery_cost,
-                    shop_name=shop.name,
-                    payment_mode=shop_product.payment_mode,
-                    shop_id=shop.id
-                )
-                db.session.add(search_entry)
-
-    db.session.commit()
-
-    return jsonify({"results": search_results}), 200
+    try:
+        cursor, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    body, status = cached_search(
+        'search', query, lambda: find_offers(query, cursor, limit),
+        cursor=request.args.get('cursor'), limit=limit
+    )
+
+    # **Save search results only for registered users** (persisted in the background)
+    if current_user_id and status == 200:
+        save_search_results(current_user_id, query, body["results"])
+
+    return jsonify(body), status
+
+def find_skyline(query):
+    """Return the matching offers no other offer beats on landed cost, rating and delivery cost."""
+    matches = ranked_matches(query)
+    offers = db.session.query(
+        Product.id,
+        Product.product_name,
+        Product.product_price,
+        Product.product_rating,
+        Product.product_url,
+        Product.delivery_cost,
+        Product.payment_mode,
+        Shop.id.label('shop_id'),
+        Shop.name.label('shop_name')
+    ).join(matches, matches.c.id == Product.id).join(
+        Shop, Shop.id == Product.shop_id
+    ).filter(Product.product_price.isnot(None)).all()
+
+    if not offers:
+        return SearchResult({"message": "No products found."}, 404, [])
+
+    # Every criterion as a column to minimize; unknown ratings and delivery costs never win
+    price = np.array([offer.product_price for offer in offers], dtype=np.float64)
+    rating = np.array([offer.product_rating for offer in offers], dtype=np.float64)
+    delivery = np.nan_to_num(np.array([offer.delivery_cost for offer in offers], dtype=np.float64), nan=np.inf)
+    landed = price + delivery
+    front = skyline(np.column_stack([landed, np.nan_to_num(-rating, nan=np.inf), delivery]))
+    front = front[np.lexsort((-np.nan_to_num(rating[front], nan=-np.inf), landed[front]))]
+
+    results = [{
+        "product_id": offers[i].id,
+        "product_name": offers[i].product_name,
+        "product_price": offers[i].product_price,
+        "product_rating": offers[i].product_rating,
+        "product_url": offers[i].product_url,
+        "delivery_cost": offers[i].delivery_cost,
+        "landed_cost": float(landed[i]) if np.isfinite(landed[i]) else None,
+        "shop_name": offers[i].shop_name,
+        "payment_mode": offers[i].payment_mode,
+        "shop_id": offers[i].shop_id
+    } for i in front.tolist()]
+
+    # Tagged with every candidate: a dominated offer that gets cheaper can join the front
+    return SearchResult(
+        {"results": results, "candidates": len(offers)}, 200, [offer.id for offer in offers],
+        shop_ids=[offer.shop_id for offer in offers]
+    )
+
+@search_bp.route('/search/skyline', methods=['GET'])
+def search_skyline():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Please provide a search query."}), 400
+
+    # Only the offers worth considering: cheapest landed, best rated, cheapest delivery and the trade-offs between
+    body, status = cached_search('skyline', query, lambda: find_skyline(query))
+    return jsonify(body), status
+
+@search_bp.route('/search/suggest', methods=['GET'])
+def suggest_queries():
+    prefix = request.args.get('prefix', '')
+    if not prefix.strip():
+        return jsonify({"error": "Please provide a prefix."}), 400
+
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
+
+    completions = suggest.get_index().complete(prefix, limit)
+    return jsonify({
+        "prefix": prefix,
+        "suggestions": [{"text": text, "weight": weight} for text, weight in completions]
+    }), 200
+
+@search_bp.route('/search/live', methods=['GET'])
+def search_live():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Please provide a search query."}), 400
+
+    # Ask every shop right now; slow shops are reported instead of holding up the rest
+    shop_results = live_search(query)
+
+    results = [
+        dict(offer, shop_id=result.shop_id, shop_name=result.shop_name)
+        for result in shop_results for offer in result.offers
+    ]
+    results.sort(key=lambda offer: offer["product_price"])
+
+    return jsonify({
+        "results": results,
+        "shops": [{
+            "shop_id": result.shop_id,
+            "shop_name": result.shop_name,
+            "status": result.status,
+            "count": len(result.offers),
+            "elapsed_ms": result.elapsed_ms,
+            "error": result.error
+        } for result in shop_results]
+    }), 200
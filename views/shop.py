@@ -1,10 +1,27 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import Shop, User, db
+from models import Product, Shop, ShopStats, User, db
+from services.pagination import keyset_page, parse_page_args
+from services.serializers import SHOP_FIELDS, columns, json_response, parse_fields, serialize, serialize_all
+from services.retention import archive_shop as archive_shop_products, delete_shop as delete_shop_rows
+from services.shop_stats import get_stats
+from services.versions import bump, conditional, make_etag, query_args, table_state
+from services import record_cache, search_cache
 
 # Define the Blueprint
 shop_bp = Blueprint('shop', __name__)
 
+# The shop listing also reports each shop's product aggregates, read from the
+# maintained shop_stats table rather than computed per request
+SHOP_LIST_FIELDS = dict(
+    SHOP_FIELDS,
+    products_count=db.func.coalesce(ShopStats.products_count, 0),
+    min_price=ShopStats.min_price,
+    avg_price=ShopStats.avg_price,
+    avg_rating=ShopStats.avg_rating,
+    last_updated=ShopStats.last_updated,
+)
+
 # Helper function to check if the current user is an admin
 def is_admin():
     user_id = get_jwt_identity()
@@ -33,50 +50,58 @@ def create_shop():
     # Create a new shop
     new_shop = Shop(name=name, url=url)
     db.session.add(new_shop)
+    db.session.flush()
+    bump('shops')
     db.session.commit()
 
     return jsonify({
         "message": "Shop created successfully",
-        "shop": {
-            "id": new_shop.id,
-            "name": new_shop.name,
-            "url": new_shop.url
-        }
+        "shop": serialize(new_shop, SHOP_FIELDS)
     }), 201
 
 # Fetch all shops (Public access)
 # Fetch all shops (Public access)
 @shop_bp.route('/shops', methods=['GET'])
 def get_all_shops():
-    shops = Shop.query.all()
-    shops_list = []
-    for shop in shops:
-        # Use 'shop_products' relationship to get the products count
-        shops_list.append({
-            "id": shop.id,
-            "name": shop.name,
-            "url": shop.url,
-            "products_count": len(shop.shop_products)  # Correct attribute to access related products
-        })
-    return jsonify(shops_list), 200
+    try:
+        fields = parse_fields(request.args, SHOP_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        # One query; a shop's stats are a primary key join, never a scan of its products
+        shops = db.session.execute(
+            db.select(*columns(SHOP_LIST_FIELDS, fields)).select_from(Shop)
+            .outerjoin(ShopStats, ShopStats.shop_id == Shop.id).order_by(Shop.id)
+        )
+        return json_response(serialize_all(shops, fields))
 
+    versions, last_modified = table_state('shops')
+    return conditional(make_etag('shops', versions, query_args()), last_modified, build)
 
 
-# Fetch a single shop by ID (Public access)
+
+# Fetch a single shop by ID (Public access), with its stats and a page of its products
 @shop_bp.route('/shops/<int:shop_id>', methods=['GET'])
 def get_shop(shop_id):
-    shop = Shop.query.get(shop_id)
+    try:
+        cursor, limit = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    shop = record_cache.get_shop(shop_id)
     if shop:
-        return jsonify({
-            "id": shop.id,
-            "name": shop.name,
-            "url": shop.url,
-            "products": [{
-                "id": product.id,
-                "name": product.name,
-                "price": product.price
-            } for product in shop.products]  # Include related products
-        }), 200
+        products, next_cursor = keyset_page(
+            db.session.query(Product.id, Product.product_name, Product.product_price)
+            .filter(Product.shop_id == shop_id, Product.tombstoned_at.is_(None)),
+            Product.id, Product.id, cursor, limit,
+            cursor_key=lambda product: (product.id, product.id)
+        )
+        return json_response(dict(shop, stats=get_stats(shop_id), products=[{
+            "id": product.id,
+            "name": product.product_name,
+            "price": product.product_price
+        } for product in products], next_cursor=next_cursor))  # Include related products
     else:
         return jsonify({"message": "Shop not found"}), 404
 
@@ -101,14 +126,14 @@ def update_shop(shop_id):
     if url:
         shop.url = url
 
+    db.session.flush()
+    bump('shops')
     db.session.commit()
+    record_cache.invalidate_shop(shop_id)
+    search_cache.invalidate_shop(shop_id)
     return jsonify({
         "message": "Shop updated successfully",
-        "shop": {
-            "id": shop.id,
-            "name": shop.name,
-            "url": shop.url
-        }
+        "shop": serialize(shop, SHOP_FIELDS)
     }), 200
 
 # Delete a shop (Admin only)
@@ -118,10 +143,23 @@ def delete_shop(shop_id):
     if not is_admin():
         return jsonify({"message": "Only admins can delete shops"}), 403
 
-    shop = Shop.query.get(shop_id)
-    if not shop:
+    if db.session.get(Shop, shop_id) is None:
         return jsonify({"message": "Shop not found"}), 404
 
-    db.session.delete(shop)
-    db.session.commit()
-    return jsonify({"message": "Shop deleted successfully"}), 200
\ No newline at end of file
+    # Set-based and chunked: the shop's products are never loaded into the session
+    deleted = delete_shop_rows(shop_id, current_app.config.get('SHOP_DELETE_BATCH_SIZE', 1000))
+    record_cache.invalidate_shop(shop_id)
+    return jsonify({"message": "Shop deleted successfully", "products_deleted": deleted}), 200
+
+# Hide all of a shop's products but keep them and their price history (Admin only)
+@shop_bp.route('/shops/<int:shop_id>/archive', methods=['POST'])
+@jwt_required()
+def archive_shop(shop_id):
+    if not is_admin():
+        return jsonify({"message": "Only admins can archive shops"}), 403
+
+    if db.session.get(Shop, shop_id) is None:
+        return jsonify({"message": "Shop not found"}), 404
+
+    archived = archive_shop_products(shop_id, current_app.config.get('SHOP_DELETE_BATCH_SIZE', 1000))
+    return jsonify({"message": "Shop archived successfully", "products_archived": archived}), 200
\ No newline at end of file
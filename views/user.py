@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
 from models import User, db
+from services.serializers import USER_FIELDS, fetch_one, serialize
 from datetime import datetime
 
 # Define the Blueprint
@@ -51,14 +52,7 @@ def login():
         access_token = create_access_token(identity=user.id)
         return jsonify({
             "access_token": access_token,
-            "user": {
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "phone_number": user.phone_number,
-                "profile_picture": user.profile_picture,
-                "is_admin": user.is_admin
-            }
+            "user": serialize(user, ['id', 'username', 'email', 'phone_number', 'profile_picture', 'is_admin'])
         }), 200
     else:
         return jsonify({"message": "Invalid credentials"}), 401
@@ -68,18 +62,10 @@ def login():
 @jwt_required()
 def get_current_user():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = fetch_one(USER_FIELDS, USER_FIELDS, User.id == user_id)
 
     if user:
-        return jsonify({
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "phone_number": user.phone_number,
-            "profile_picture": user.profile_picture,
-            "is_admin": user.is_admin,
-            "created_at": user.created_at.isoformat() if user.created_at else None
-        }), 200
+        return jsonify(serialize(user, USER_FIELDS)), 200
     else:
         return jsonify({"message": "User not found"}), 404
 
@@ -87,18 +73,10 @@ def get_current_user():
 @user_bp.route('/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
-    user = User.query.get(user_id)
+    user = fetch_one(USER_FIELDS, USER_FIELDS, User.id == user_id)
 
     if user:
-        return jsonify({
-            "id": user.id,
-            "username": user.username,
-            "email": user.email,
-            "phone_number": user.phone_number,
-            "profile_picture": user.profile_picture,
-            "is_admin": user.is_admin,
-            "created_at": user.created_at.isoformat() if user.created_at else None
-        }), 200
+        return jsonify(serialize(user, USER_FIELDS)), 200
     else:
         return jsonify({"message": "User not found"}), 404
 